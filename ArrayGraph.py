@@ -0,0 +1,634 @@
+"""
+
+ArrayGraph
+- An alternative storage backend for a graph. Instead of Node and Port objects each holding there own lists of
+  ports and edges, every node, port and edge is a row in contiguous columns(array/bytearray). CSR(compressed sparse
+  row) indexes are built from the edge columns when they are needed after the structure has changed.
+- Nodes and ports are handed out as NodeView/PortView objects, which only hold the graph and a row index, and
+  read/write the columns. Views are created on demand, and are equal when they point at the same row.
+- Node classes are still used, for there port layout and there evaluate method. The evaluate method of the class
+  is called with the NodeView as self, so any node that only uses the Node API (ports, dirty, evaluateConnection)
+  evaluates unchanged. Nodes that are not detachable(eg. ContainerNode) can not be stored in an ArrayGraph.
+- Setting a value records the node as dirty, and the dirtiness is propagated downstream the next time the graph
+  is evaluated, or a node's dirty flag is read. With NumPy available, building the indexes, propagating dirtiness
+  and finding the heads/tails are vectorized over the columns.
+"""
+import array
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# type code of the index columns, 32 bit signed ints
+INDEX_TYPE = "i"
+
+
+class ArrayGraph(object):
+    def __init__(self):
+        """
+        classes: the node classes used in this graph, nodeClass indexes into this list
+        names: string table of port names, portName indexes into this list
+        nodeClass: class of each node
+        nodeDirty: dirty flag of each node
+        nodeFirstPort: first port of each node, the ports of a node are stored next to each other
+        nodePortCount: amount of ports stored next to each other for each node
+        portNode: node each port belongs to
+        portName: name of each port
+        portIsOutput: 1 if the port is an output port, 0 if it is an input port
+        portDirty: dirty flag of each port
+        portEdgeCount: amount of edges connected to each port
+        portValues: value of each port
+        portDefaults: default value of each port
+        edgeSource: output port of each edge
+        edgeDest: input port of each edge
+        _indexStale: True when the structure has changed, and the CSR indexes have to be rebuilt
+        _pendingDirty: nodes that have been set dirty, and still have to propagate it downstream
+        _extraPorts: ports added to a node after other nodes ports were added, so they are not next to the others
+        """
+        self.classes = []
+        self._classIndex = {}
+        self._layouts = {}
+        self.names = []
+        self._nameIndex = {}
+
+        self.nodeClass = array.array(INDEX_TYPE)
+        self.nodeDirty = bytearray()
+        self.nodeFirstPort = array.array(INDEX_TYPE)
+        self.nodePortCount = array.array(INDEX_TYPE)
+        self.portNode = array.array(INDEX_TYPE)
+        self.portName = array.array(INDEX_TYPE)
+        self.portIsOutput = bytearray()
+        self.portDirty = bytearray()
+        self.portEdgeCount = array.array(INDEX_TYPE)
+        self.portValues = []
+        self.portDefaults = []
+        self.edgeSource = array.array(INDEX_TYPE)
+        self.edgeDest = array.array(INDEX_TYPE)
+
+        self._indexStale = True
+        self._pendingDirty = []
+        self._extraPorts = {}
+        self._portEdgeOffsets = None
+        self._portEdges = None
+        self._downOffsets = None
+        self._downPorts = None
+        self._inDegree = None
+        self._outDegree = None
+        self._schedule = None
+        self._rank = None
+
+    @classmethod
+    def fromGraph(cls, graph):
+        """
+        Copies the nodes, ports, values and edges of a graph into a new ArrayGraph
+
+        Args:
+            graph (Graph): the graph to copy
+
+        Returns:
+            ArrayGraph: the new graph
+        """
+        arrayGraph = cls()
+        portIndex = {}
+        for node in graph.nodes:
+            nodeIndex = arrayGraph._addNode(type(node), node.dirty)
+            for isOutput, ports in ((0, node.portsIn), (1, node.portsOut)):
+                for port in ports:
+                    portIndex[port] = arrayGraph._addPort(nodeIndex, port.name, isOutput, port.value,
+                                                          port.defaultValue, port.dirty)
+        for node in graph.nodes:
+            for port in node.portsOut:
+                for edgePort in port.edges:
+                    if edgePort in portIndex:
+                        arrayGraph._addEdge(portIndex[port], portIndex[edgePort])
+        return arrayGraph
+
+    @property
+    def nodes(self):
+        """
+        Returns:
+            []: of NodeView, for every node in the graph
+        """
+        return [NodeView(self, index) for index in range(len(self.nodeClass))]
+
+    def createNode(self, classType):
+        """
+        Creates a node of the class type passed in. The class is only instantiated once, to find its port layout.
+
+        Returns:
+            NodeView: the newly created node
+        """
+        layout = self._layouts.get(classType)
+        if layout is None:
+            template = classType()
+            if not template.detachable:
+                raise ValueError("{} nodes can not be stored in an ArrayGraph".format(type(template).__name__))
+            layout = [(port.name, 0, port.value, port.defaultValue) for port in template.portsIn]
+            layout += [(port.name, 1, port.value, port.defaultValue) for port in template.portsOut]
+            self._layouts[classType] = layout
+
+        nodeIndex = self._addNode(classType, True)
+        for name, isOutput, value, defaultValue in layout:
+            self._addPort(nodeIndex, name, isOutput, value, defaultValue, False)
+        return NodeView(self, nodeIndex)
+
+    def _addNode(self, classType, dirty):
+        classIndex = self._classIndex.get(classType)
+        if classIndex is None:
+            classIndex = self._classIndex[classType] = len(self.classes)
+            self.classes.append(classType)
+        self.nodeClass.append(classIndex)
+        self.nodeDirty.append(1 if dirty else 0)
+        self.nodeFirstPort.append(len(self.portNode))
+        self.nodePortCount.append(0)
+        self._indexStale = True
+        return len(self.nodeClass) - 1
+
+    def _addPort(self, nodeIndex, name, isOutput, value, defaultValue, dirty):
+        nameIndex = self._nameIndex.get(name)
+        if nameIndex is None:
+            nameIndex = self._nameIndex[name] = len(self.names)
+            self.names.append(name)
+        self.portNode.append(nodeIndex)
+        self.portName.append(nameIndex)
+        self.portIsOutput.append(isOutput)
+        self.portDirty.append(1 if dirty else 0)
+        self.portEdgeCount.append(0)
+        self.portValues.append(value)
+        self.portDefaults.append(defaultValue)
+        self._indexStale = True
+
+        portIndex = len(self.portNode) - 1
+        if self.nodeFirstPort[nodeIndex] + self.nodePortCount[nodeIndex] == portIndex:
+            self.nodePortCount[nodeIndex] += 1
+        else:
+            self._extraPorts.setdefault(nodeIndex, []).append(portIndex)
+        return portIndex
+
+    def _addEdge(self, source, dest):
+        self.edgeSource.append(source)
+        self.edgeDest.append(dest)
+        self.portEdgeCount[source] += 1
+        self.portEdgeCount[dest] += 1
+        self._indexStale = True
+
+    def connect(self, port, destPort):
+        """
+        Create a connection between two ports, see Port.connect
+
+        Args:
+            port (int): index of the port connecting
+            destPort (int): index of the port it is connecting to
+
+        Returns:
+            bool: False if the connection failed, true if the connection was made successfully
+        """
+        if self.portEdgeCount[destPort]:
+            return False
+        if self.portIsOutput[port]:
+            self._addEdge(port, destPort)
+        else:
+            self._addEdge(destPort, port)
+        self.setPortDirty(destPort)
+        self.setPortDirty(port)
+        return True
+
+    def disconnect(self, port, discPort=None):
+        """
+        Disconnect a port from another port, if no port is given all the connections to the port are removed
+
+        Args:
+            port (int): index of the port disconnecting
+            discPort (int): index of the port to disconnect from
+        """
+        keepSource = array.array(INDEX_TYPE)
+        keepDest = array.array(INDEX_TYPE)
+        removed = []
+        for source, dest in zip(self.edgeSource, self.edgeDest):
+            if (source == port and (discPort is None or dest == discPort)) or \
+                    (dest == port and (discPort is None or source == discPort)):
+                removed.append((source, dest))
+            else:
+                keepSource.append(source)
+                keepDest.append(dest)
+        if not removed:
+            return
+
+        self.edgeSource = keepSource
+        self.edgeDest = keepDest
+        self._indexStale = True
+        for source, dest in removed:
+            self.portEdgeCount[source] -= 1
+            self.portEdgeCount[dest] -= 1
+            self.setPortDirty(source)
+            self.setPortDirty(dest)
+
+    def setPortValue(self, port, value):
+        self.portValues[port] = value
+        self.setPortDirty(port)
+
+    def setPortDirty(self, port):
+        self.portDirty[port] = 1
+        self.setNodeDirty(self.portNode[port])
+
+    def setNodeDirty(self, node):
+        """
+        Sets the node dirty, if the node was clean it is recorded, so its dirtiness is propagated downstream later
+        """
+        if not self.nodeDirty[node]:
+            self.nodeDirty[node] = 1
+            self._pendingDirty.append(node)
+
+    def propagateDirty(self):
+        """
+        Sets everything downstream of the nodes that have been set dirty, dirty as well
+        """
+        if not self._pendingDirty:
+            return
+        self._buildIndex()
+        seeds = self._pendingDirty
+        self._pendingDirty = []
+
+        if numpy is not None:
+            portDirty = numpy.frombuffer(self.portDirty, numpy.uint8)
+            nodeDirty = numpy.frombuffer(self.nodeDirty, numpy.uint8)
+            portNode = numpy.frombuffer(self.portNode, numpy.int32)
+            offsets = numpy.frombuffer(self._downOffsets, numpy.int32)
+            targets = numpy.frombuffer(self._downPorts, numpy.int32)
+            frontier = numpy.array(seeds, numpy.int32)
+            while frontier.size:
+                ports = _gather(offsets, targets, frontier)
+                portDirty[ports] = 1
+                nodes = portNode[ports]
+                frontier = numpy.unique(nodes[nodeDirty[nodes] == 0])
+                nodeDirty[frontier] = 1
+            return
+
+        offsets = self._downOffsets
+        targets = self._downPorts
+        stack = seeds
+        while stack:
+            node = stack.pop()
+            for position in range(offsets[node], offsets[node + 1]):
+                port = targets[position]
+                self.portDirty[port] = 1
+                edgeNode = self.portNode[port]
+                if not self.nodeDirty[edgeNode]:
+                    self.nodeDirty[edgeNode] = 1
+                    stack.append(edgeNode)
+
+    def _buildIndex(self):
+        """
+        Rebuilds the CSR indexes from the columns, if the structure has changed:
+            port -> connected ports, node -> downstream input ports
+        along with the in/out degree of each node, and the evaluation order of the nodes.
+        """
+        if not self._indexStale:
+            return
+        nodeCount = len(self.nodeClass)
+        portCount = len(self.portNode)
+        edgeSourceNode = _take(self.portNode, self.edgeSource)
+        edgeDestNode = _take(self.portNode, self.edgeDest)
+
+        self._portEdgeOffsets, self._portEdges = _buildCsr(portCount, self.edgeSource + self.edgeDest,
+                                                           self.edgeDest + self.edgeSource)
+        self._downOffsets, self._downPorts = _buildCsr(nodeCount, edgeSourceNode, self.edgeDest)
+        self._inDegree = _count(nodeCount, edgeDestNode)
+        self._outDegree = _count(nodeCount, edgeSourceNode)
+
+        # Kahn's algorithm, over the edges going into each node
+        inDegree = array.array(INDEX_TYPE, self._inDegree)
+        ready = [node for node in range(nodeCount - 1, -1, -1) if not inDegree[node]]
+        schedule = array.array(INDEX_TYPE)
+        while ready:
+            node = ready.pop()
+            schedule.append(node)
+            for position in range(self._downOffsets[node], self._downOffsets[node + 1]):
+                edgeNode = self.portNode[self._downPorts[position]]
+                inDegree[edgeNode] -= 1
+                if not inDegree[edgeNode]:
+                    ready.append(edgeNode)
+        if len(schedule) != nodeCount:
+            raise RuntimeError("Graph contains a cycle, and can not be compiled")
+        rank = array.array(INDEX_TYPE, bytes(4 * nodeCount))
+        for position, node in enumerate(schedule):
+            rank[node] = position
+
+        self._schedule = schedule
+        self._rank = rank
+        self._indexStale = False
+
+    def compile(self):
+        """
+        Returns:
+            []: of NodeView, in evaluation order
+        """
+        self._buildIndex()
+        return [NodeView(self, node) for node in self._schedule]
+
+    def getNetworkHeads(self):
+        """
+        Returns:
+            []: of NodeView, for every node with no connected outputs
+        """
+        self._buildIndex()
+        return [NodeView(self, node) for node in _zeros(self._outDegree)]
+
+    def getNetworkTails(self):
+        """
+        Returns:
+            []: of NodeView, for every node with no connected inputs
+        """
+        self._buildIndex()
+        return [NodeView(self, node) for node in _zeros(self._inDegree)]
+
+    def evaluate(self):
+        """
+        Propagates any pending dirtiness, and evaluates the dirty nodes in evaluation order
+        """
+        self.propagateDirty()
+        self._buildIndex()
+        if numpy is not None:
+            dirty = numpy.flatnonzero(numpy.frombuffer(self.nodeDirty, numpy.uint8))
+            rank = numpy.frombuffer(self._rank, numpy.int32)
+            nodes = dirty[numpy.argsort(rank[dirty])].tolist()
+        else:
+            nodes = [node for node in self._schedule if self.nodeDirty[node]]
+
+        for node in nodes:
+            if self.nodeDirty[node]:
+                NodeView(self, node).evaluate()
+
+
+class NodeView(object):
+    """
+    A node stored in an ArrayGraph, exposing the same API as Node
+    """
+    __slots__ = ("graph", "index")
+
+    def __init__(self, graph, index):
+        self.graph = graph
+        self.index = index
+
+    def __eq__(self, other):
+        return isinstance(other, NodeView) and other.graph is self.graph and other.index == self.index
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash((id(self.graph), self.index))
+
+    @property
+    def nodeClass(self):
+        return self.graph.classes[self.graph.nodeClass[self.index]]
+
+    @property
+    def type(self):
+        return self.nodeClass.__name__
+
+    @property
+    def dirty(self):
+        if self.graph._pendingDirty:
+            self.graph.propagateDirty()
+        return bool(self.graph.nodeDirty[self.index])
+
+    @dirty.setter
+    def dirty(self, val):
+        if val:
+            self.graph.setNodeDirty(self.index)
+        else:
+            self.graph.nodeDirty[self.index] = 0
+
+    def _ports(self, isOutput):
+        graph = self.graph
+        first = graph.nodeFirstPort[self.index]
+        ports = range(first, first + graph.nodePortCount[self.index])
+        if self.index in graph._extraPorts:
+            ports = list(ports) + graph._extraPorts[self.index]
+        return [PortView(graph, port) for port in ports if graph.portIsOutput[port] == isOutput]
+
+    @property
+    def portsIn(self):
+        return self._ports(0)
+
+    @property
+    def portsOut(self):
+        return self._ports(1)
+
+    @property
+    def inDegree(self):
+        self.graph._buildIndex()
+        return self.graph._inDegree[self.index]
+
+    @property
+    def outDegree(self):
+        self.graph._buildIndex()
+        return self.graph._outDegree[self.index]
+
+    def isConnected(self):
+        return self.inDegree > 0 or self.outDegree > 0
+
+    def getInputPort(self, name):
+        for port in self.portsIn:
+            if port.name == name:
+                return port
+        return None
+
+    def getOutputPort(self, name):
+        for port in self.portsOut:
+            if port.name == name:
+                return port
+        return None
+
+    def addInputPort(self, name, value=0.0):
+        return PortView(self.graph, self.graph._addPort(self.index, name, 0, value, value, False))
+
+    def addOutputPort(self, name):
+        return PortView(self.graph, self.graph._addPort(self.index, name, 1, None, None, False))
+
+    def evaluateConnection(self):
+        """
+        Pulls the values of the dirty connected input ports, from the ports they are connected to
+        """
+        graph = self.graph
+        graph._buildIndex()
+        offsets = graph._portEdgeOffsets
+        for port in self.portsIn:
+            index = port.index
+            if graph.portDirty[index]:
+                if offsets[index + 1] > offsets[index]:
+                    source = graph._portEdges[offsets[index]]
+                    NodeView(graph, graph.portNode[source]).evaluate()
+                    graph.setPortValue(index, graph.portValues[source])
+                graph.portDirty[index] = 0
+
+    def evaluate(self):
+        """
+        Runs the evaluate method of the node's class, with this view as the node
+        """
+        self.nodeClass.evaluate(self)
+
+    def __repr__(self):
+        return "{} > Input Ports: {}  OutputPorts:{}".format(self.type, len(self.portsIn), len(self.portsOut))
+
+
+class PortView(object):
+    """
+    A port stored in an ArrayGraph, exposing the same API as Port
+    """
+    __slots__ = ("graph", "index")
+
+    def __init__(self, graph, index):
+        self.graph = graph
+        self.index = index
+
+    def __eq__(self, other):
+        return isinstance(other, PortView) and other.graph is self.graph and other.index == self.index
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash((id(self.graph), self.index))
+
+    @property
+    def name(self):
+        return self.graph.names[self.graph.portName[self.index]]
+
+    @property
+    def node(self):
+        return NodeView(self.graph, self.graph.portNode[self.index])
+
+    @property
+    def value(self):
+        return self.graph.portValues[self.index]
+
+    @value.setter
+    def value(self, val):
+        self.graph.setPortValue(self.index, val)
+
+    @property
+    def defaultValue(self):
+        return self.graph.portDefaults[self.index]
+
+    @property
+    def dirty(self):
+        return bool(self.graph.portDirty[self.index])
+
+    @dirty.setter
+    def dirty(self, val):
+        self.graph.portDirty[self.index] = 1 if val else 0
+
+    @property
+    def edges(self):
+        graph = self.graph
+        graph._buildIndex()
+        offsets = graph._portEdgeOffsets
+        return [PortView(graph, graph._portEdges[position])
+                for position in range(offsets[self.index], offsets[self.index + 1])]
+
+    def isConnected(self):
+        return self.graph.portEdgeCount[self.index] > 0
+
+    def isSource(self):
+        return bool(self.graph.portIsOutput[self.index])
+
+    def isDestination(self):
+        return not self.graph.portIsOutput[self.index]
+
+    def setDirty(self):
+        self.graph.setPortDirty(self.index)
+
+    def connect(self, destPort):
+        return self.graph.connect(self.index, destPort.index)
+
+    def disconnect(self, discPort=None):
+        self.graph.disconnect(self.index, None if discPort is None else discPort.index)
+
+
+def _buildCsr(rowCount, rows, values):
+    """
+    Builds a CSR index, grouping the values by there row. Values keep there order within a row.
+
+    Args:
+        rowCount (int): amount of rows
+        rows (array): row of each value
+        values (array): the values
+
+    Returns:
+        tuple: offsets(array, rowCount + 1 long) and the grouped values(array). The values of row r are
+        values[offsets[r]:offsets[r + 1]]
+    """
+    offsets = array.array(INDEX_TYPE)
+    targets = array.array(INDEX_TYPE)
+    if numpy is not None:
+        rows = numpy.asarray(rows, numpy.int32)
+        order = numpy.argsort(rows, kind="stable")
+        counts = numpy.bincount(rows, minlength=rowCount)
+        offsets.frombytes(numpy.concatenate(([0], numpy.cumsum(counts))).astype(numpy.int32).tobytes())
+        targets.frombytes(numpy.asarray(values, numpy.int32)[order].tobytes())
+        return offsets, targets
+
+    offsets.frombytes(bytes(4 * (rowCount + 1)))
+    for row in rows:
+        offsets[row + 1] += 1
+    for row in range(rowCount):
+        offsets[row + 1] += offsets[row]
+    targets.frombytes(bytes(4 * len(rows)))
+    fill = offsets[:-1]
+    for row, value in zip(rows, values):
+        targets[fill[row]] = value
+        fill[row] += 1
+    return offsets, targets
+
+
+def _take(column, indices):
+    """
+    Returns:
+        array: column[index] for each index
+    """
+    if numpy is not None:
+        taken = array.array(INDEX_TYPE)
+        taken.frombytes(numpy.frombuffer(column, numpy.int32)[numpy.frombuffer(indices, numpy.int32)].tobytes())
+        return taken
+    return array.array(INDEX_TYPE, [column[index] for index in indices])
+
+
+def _count(rowCount, rows):
+    """
+    Returns:
+        array: the amount of times each row appears in rows
+    """
+    counts = array.array(INDEX_TYPE)
+    if numpy is not None:
+        counts.frombytes(numpy.bincount(numpy.frombuffer(rows, numpy.int32), minlength=rowCount)
+                         .astype(numpy.int32).tobytes())
+        return counts
+    counts.frombytes(bytes(4 * rowCount))
+    for row in rows:
+        counts[row] += 1
+    return counts
+
+
+def _zeros(column):
+    """
+    Returns:
+        []: the indices where the column is 0
+    """
+    if numpy is not None:
+        return numpy.flatnonzero(numpy.frombuffer(column, numpy.int32) == 0).tolist()
+    return [index for index, value in enumerate(column) if not value]
+
+
+def _gather(offsets, targets, rows):
+    """
+    Vectorized CSR lookup, returns all the values of the rows, concatenated
+    """
+    starts = offsets[rows]
+    lengths = offsets[rows + 1] - starts
+    total = int(lengths.sum())
+    if not total:
+        return targets[:0]
+    return targets[numpy.repeat(starts - numpy.cumsum(lengths) + lengths, lengths) + numpy.arange(total)]
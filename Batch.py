@@ -0,0 +1,206 @@
+"""
+
+Batch
+- Evaluates a graph for many rows of input values on a pool of worker processes, for CPU bound networks of python
+  nodes that threads can not speed up, as they share the GIL.
+- The graph is serialized once, and each worker process builds its own copy of it when it starts. After that only the
+  input and output values move between the processes, as float64 rows in multiprocessing.shared_memory buffers,
+  instead of pickling the nodes and ports for every batch.
+- Each worker evaluates a contiguous chunk of the rows, setting the inputs of one row and evaluating its copy of the
+  graph before moving onto the next, so only the nodes downstream of inputs that changed from the previous row are
+  evaluated again.
+- Input and output values have to be numbers. The runner works on a snapshot of the graph, changes made to the graph
+  after the runner is created are not seen by the workers.
+"""
+import array
+import concurrent.futures
+import multiprocessing.shared_memory as mSharedMemory
+import os
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+import Graph as mGraph
+import Serialize as mSerialize
+
+# the graph and ports of the worker process, built from the serialized graph by _initWorker
+_worker = None
+
+
+class BatchRunner(object):
+    def __init__(self, graph, inputs, outputs, processes=None, chunkSize=None):
+        """
+        inputs: the input ports each row sets the values of
+        outputs: the output ports each row reads the values of
+        chunkSize: amount of rows sent to a worker at a time, None splits the rows into 4 chunks per process
+        executor: the process pool the rows are evaluated on, each process has its own copy of the graph
+
+            with BatchRunner(graph, [sumNode.getInputPort("value1")], [negNode.getOutputPort("result")]) as runner:
+                rows = runner.map([(1.0,), (2.0,), (3.0,)])
+
+        Args:
+            graph (mGraph.Graph): the graph to evaluate
+            inputs ([]): of input ports, on nodes in the graph
+            outputs ([]): of output ports, on nodes in the graph
+            processes (int): amount of worker processes, defaults to the amount of CPUs
+            chunkSize (int): amount of rows sent to a worker at a time
+        """
+        self.inputs = list(inputs)
+        self.outputs = list(outputs)
+        self.processes = processes or os.cpu_count() or 1
+        self.chunkSize = chunkSize
+
+        # the graph is sent in the binary format of Graph.save, as pickling follows the edges of long chains of nodes
+        # recursively. The top level nodes keep there order, so the ports are found by there node's index
+        state = (mSerialize.dumps(graph),
+                 [_getPortKey(graph, port) for port in self.inputs],
+                 [_getPortKey(graph, port) for port in self.outputs])
+        self.executor = concurrent.futures.ProcessPoolExecutor(self.processes, initializer=_initWorker,
+                                                               initargs=(state,))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, excType, excValue, traceback):
+        self.close()
+
+    def close(self):
+        """
+        Shuts down the worker processes
+        """
+        self.executor.shutdown()
+
+    def map(self, rows):
+        """
+        Evaluates the graph for each row of input values
+
+        Args:
+            rows ([]): of rows, each row having a value for each of the input ports. Can be a (N, inputs) NumPy array
+
+        Returns:
+            []: of tuples, the values of the output ports for each row. A (N, outputs) NumPy array, when the rows
+            are a NumPy array
+        """
+        isArray = numpy is not None and isinstance(rows, numpy.ndarray)
+        if not isArray:
+            rows = list(rows)
+        count = len(rows)
+        if not count:
+            return numpy.empty((0, len(self.outputs))) if isArray else []
+
+        inCount = len(self.inputs)
+        outCount = len(self.outputs)
+        # shared memory can not be empty
+        inputMemory = mSharedMemory.SharedMemory(create=True, size=max(8, count * inCount * 8))
+        try:
+            outputMemory = mSharedMemory.SharedMemory(create=True, size=max(8, count * outCount * 8))
+            try:
+                _writeRows(inputMemory, rows, inCount, isArray)
+
+                chunkSize = self.chunkSize or max(1, -(-count // (self.processes * 4)))
+                futures = [self.executor.submit(_evaluateRows, inputMemory.name, outputMemory.name, start,
+                                                min(start + chunkSize, count))
+                           for start in range(0, count, chunkSize)]
+                for future in futures:
+                    future.result()
+
+                return _readRows(outputMemory, count, outCount, isArray)
+            finally:
+                outputMemory.close()
+                outputMemory.unlink()
+        finally:
+            inputMemory.close()
+            inputMemory.unlink()
+
+
+def _getPortKey(graph, port):
+    """
+    Returns:
+        tuple: the index of the port's node in the graph, True if it is an input port, and the name of the port
+
+    Raises:
+        ValueError: if the port is not on a node in the graph
+    """
+    for index, node in enumerate(graph.nodes):
+        if node is port.node:
+            return index, port.isDestination(), port.name
+    raise ValueError("Port {} is not on a node in the graph".format(port.name))
+
+
+def _writeRows(memory, rows, inCount, isArray):
+    if isArray:
+        values = numpy.ndarray((len(rows), inCount), dtype=numpy.float64, buffer=memory.buf)
+        values[:] = rows
+        del values
+        return
+    values = memory.buf.cast("d")
+    try:
+        for index, row in enumerate(rows):
+            if len(row) != inCount:
+                raise ValueError("Row {} has {} values, instead of one for each of the {} inputs".format(
+                    index, len(row), inCount))
+            values[index * inCount:(index + 1) * inCount] = array.array("d", row)
+    finally:
+        values.release()
+
+
+def _readRows(memory, count, outCount, isArray):
+    if isArray:
+        values = numpy.ndarray((count, outCount), dtype=numpy.float64, buffer=memory.buf)
+        rows = values.copy()
+        del values
+        return rows
+    values = memory.buf.cast("d")
+    try:
+        return [tuple(values[index * outCount:(index + 1) * outCount]) for index in range(count)]
+    finally:
+        values.release()
+
+
+def _initWorker(state):
+    """
+    Builds the worker's copy of the graph, once when the worker process starts
+    """
+    global _worker
+    data, inputKeys, outputKeys = state
+    graph = mSerialize.loads(data, mGraph.Graph)
+
+    def getPort(key):
+        index, isInput, name = key
+        node = graph.nodes[index]
+        return node.getInputPort(name) if isInput else node.getOutputPort(name)
+
+    _worker = (graph, [getPort(key) for key in inputKeys], [getPort(key) for key in outputKeys])
+
+
+def _evaluateRows(inputName, outputName, start, end):
+    """
+    Evaluates the worker's graph for the rows from start to end, reading the inputs from and writing the outputs to
+    the shared memory buffers
+    """
+    graph, inputPorts, outputPorts = _worker
+    inCount = len(inputPorts)
+    outCount = len(outputPorts)
+    inputMemory = mSharedMemory.SharedMemory(inputName)
+    outputMemory = mSharedMemory.SharedMemory(outputName)
+    inValues = inputMemory.buf.cast("d")
+    outValues = outputMemory.buf.cast("d")
+    try:
+        for row in range(start, end):
+            offset = row * inCount
+            for index, port in enumerate(inputPorts):
+                value = inValues[offset + index]
+                # inputs with the same value as the previous row, do not dirty there nodes
+                if port.value != value:
+                    port.value = value
+            graph.evaluate()
+            offset = row * outCount
+            for index, port in enumerate(outputPorts):
+                outValues[offset + index] = float(port.value)
+    finally:
+        inValues.release()
+        outValues.release()
+        inputMemory.close()
+        outputMemory.close()
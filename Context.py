@@ -0,0 +1,131 @@
+"""
+
+Context
+- An evaluation context holds its own port values and dirty nodes for a graph, so the same graph can be evaluated for
+  many sets of parameters(shots, variations, what-if runs) without changing the graph, or copying it.
+- While a context is active(with context.activate(), and while it is being evaluated), reading and setting port values
+  and node dirty flags in that thread or asyncio task goes to the context instead. Ports that have not been set in the
+  context read the graph's values, so a context only stores what is different.
+- The graph is read-only while contexts are in use: its structure and values are shared by all the contexts, so many
+  contexts can be evaluated at the same time on a thread pool, see Graph.evaluateContexts.
+- Early cutoff does not apply inside of contexts, as it relies on the dirty flags of the graph's ports.
+"""
+import contextlib
+import threading
+
+import Port as mPort
+
+# guards the count of active contexts
+_lock = threading.Lock()
+
+
+class EvaluationContext(object):
+    def __init__(self, graph, values=None):
+        """
+        graph: the graph the context holds values for, it is evaluated first, as contexts start from its values
+        values: the value of each port that is different in this context
+        dirtyNodes: the nodes that are dirty in this context
+
+        Args:
+            graph (mGraph.Graph): the graph to hold values for
+            values (dict): of port: value, to set in the context
+        """
+        graph.evaluate()
+        self.graph = graph
+        self.values = {}
+        self.dirtyNodes = set()
+        if values:
+            self.setValues(values)
+
+    @contextlib.contextmanager
+    def activate(self):
+        """
+        Context manager making this the active context of the current thread or task, while it is open
+
+            with context.activate():
+                port.value = 2.0
+        """
+        token = mPort.activeContext.set(self)
+        with _lock:
+            mPort.activeContexts += 1
+        try:
+            yield self
+        finally:
+            with _lock:
+                mPort.activeContexts -= 1
+            mPort.activeContext.reset(token)
+
+    def getValue(self, port):
+        """
+        Returns:
+            the value of the port in this context, the graph's value if it has not been set in the context
+        """
+        return self.values.get(port, port._value)
+
+    def setValues(self, values):
+        """
+        Sets the values of the ports in this context, dirtying everything downstream of them
+
+        Args:
+            values (dict): of port: value
+        """
+        for port, value in values.items():
+            self.setPortValue(port, value)
+
+    def setPortValue(self, port, value):
+        """
+        Sets the value of the port in this context, see Port.value. Output ports also copy the value to the ports
+        they are connected to, as the graph's ports are not pulled from inside of a context.
+
+        Args:
+            port (Port): the port to set
+            value: the value of the port
+        """
+        self.values[port] = value
+        if port.edges and port.isSource():
+            for edgePort in port.edges:
+                self.values[edgePort] = value
+        self.setNodeDirty(port.node, True)
+
+    def setNodeDirty(self, node, dirty):
+        """
+        Sets the dirty flag of the node in this context, see Node.dirty. Dirtying a clean node dirties everything
+        downstream of it.
+
+        Args:
+            node (mNode.Node): the node
+            dirty (bool): the dirty flag
+        """
+        if not dirty:
+            self.dirtyNodes.discard(node)
+            return
+        if node in self.dirtyNodes:
+            return
+
+        dirtyNodes = self.dirtyNodes
+        dirtyNodes.add(node)
+        stack = [node]
+        while stack:
+            for port in stack.pop().portsOut:
+                for edgePort in port.edges:
+                    edgeNode = edgePort.node
+                    if edgeNode not in dirtyNodes:
+                        dirtyNodes.add(edgeNode)
+                        stack.append(edgeNode)
+
+    def evaluate(self):
+        """
+        Evaluates the nodes that are dirty in this context, in the order of the graph's compiled schedule
+        """
+        graph = self.graph
+        with self.activate():
+            graph.compile()
+            nodes = sorted((node for node in self.dirtyNodes if node.graph is graph), key=graph._order.__getitem__)
+            graph._evaluateInOrder(nodes)
+
+    def reset(self):
+        """
+        Removes all the values set in this context, so it has the graph's values again
+        """
+        self.values = {}
+        self.dirtyNodes = set()
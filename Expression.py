@@ -0,0 +1,143 @@
+"""
+
+Expression
+- Compiles a network of arithmetic nodes into a single generated python function.
+- Each node becomes one line of the function, nodes computing the same expression share a single line,
+  and there is no port or dirty bookkeeping left when the function is called.
+- The generated function works on anything the nodes work on, scalars or NumPy arrays.
+
+Supported nodes: SumNode, SubtractNode, MultiplyNode, NegateNode and the ConstantNode/FloatNode/IntNode pass throughs.
+Containers of supported nodes are inlined, there ports are followed through to the nodes inside of them.
+"""
+import Node as mNode
+
+OPERATORS = {"SumNode": " + ", "SubtractNode": " - ", "MultiplyNode": " * "}
+PASS_THROUGH = ("ConstantNode", "FloatNode", "IntNode")
+
+
+def compileExpression(outputs, inputs=()):
+    """
+    Generates a function computing the values of the output ports, from the values of the input ports.
+    Any unconnected input port in the network that is not one of the inputs, is baked into the function
+    with the value it has when compiled.
+
+        function = compileExpression([negNode.getOutputPort("result")], [sumNode.getInputPort("value1")])
+        result, = function(2.0)
+
+    Args:
+        outputs ([]): of output ports, that the function returns the values of
+        inputs ([]): of input ports, that become the arguments of the function
+
+    Returns:
+        function: taking a value for each input port, and returning a tuple with a value for each output port.
+        The generated source is stored on the function as function.source
+    """
+    inputs = list(inputs)
+    variables = {}
+    for index, inputPort in enumerate(inputs):
+        variables[inputPort] = "i{}".format(index)
+
+    constants = []
+    expressions = {}
+    lines = []
+
+    def getArgument(port):
+        # the variable of the port the value comes from, unconnected inputs become constants
+        source = _getSource(port, variables)
+        if source not in variables:
+            variables[source] = "c{}".format(len(constants))
+            constants.append(source.value)
+        return variables[source]
+
+    for node in _getNodeOrder(outputs, variables):
+        args = [getArgument(inputPort) for inputPort in node.portsIn]
+
+        if node.type in PASS_THROUGH:
+            variables[node.portsOut[0]] = args[0]
+            continue
+        elif node.type == "SumNode":
+            # the sum node starts from 0, so the result is the same type as the node's
+            expression = "(0 + {})".format(" + ".join(args))
+        elif node.type in OPERATORS:
+            expression = "({})".format(OPERATORS[node.type].join(args))
+        elif node.type == "NegateNode":
+            expression = "(-{})".format(args[0])
+        else:
+            raise ValueError("{} nodes can not be compiled into an expression".format(node.type))
+
+        # nodes computing the same expression share the variable
+        variable = expressions.get(expression)
+        if variable is None:
+            variable = "v{}".format(len(lines))
+            lines.append("        {} = {}".format(variable, expression))
+            expressions[expression] = variable
+        variables[node.portsOut[0]] = variable
+
+    returns = "".join("{}, ".format(getArgument(outputPort)) for outputPort in outputs)
+    source = "\n".join([
+        "def factory({}):".format(", ".join("c{}".format(index) for index in range(len(constants)))),
+        "    def expression({}):".format(", ".join("i{}".format(index) for index in range(len(inputs)))),
+    ] + lines + [
+        "        return ({})".format(returns),
+        "    return expression",
+    ])
+
+    namespace = {}
+    exec(compile(source, "<pyGraph expression>", "exec"), namespace)
+    function = namespace["factory"](*constants)
+    function.source = source
+    return function
+
+
+def _getNodeOrder(outputs, variables):
+    """
+    Finds all the nodes the output ports read from, stopping at the input ports that are function arguments.
+
+    Args:
+        outputs ([]): of output ports
+        variables (dict): of the input ports that are function arguments
+
+    Returns:
+        []: of nodes, ordered so every node comes after the nodes it reads from
+    """
+    def getSource(port):
+        source = _getSource(port, variables)
+        return source.node if source.isSource() else None
+
+    nodes = [getSource(outputPort) for outputPort in outputs]
+    return mNode.getNodeOrder([node for node in nodes if node is not None], getSource)
+
+
+def _getSource(port, variables):
+    """
+    Finds the port a value comes from, following connections through the ports of containers.
+
+    Args:
+        port (Port): an input port, or an output port
+        variables (dict): of the input ports that are function arguments
+
+    Returns:
+        Port: the output port of the node computing the value, or the input port holding it(an unconnected input
+        or a function argument)
+
+    Raises:
+        ValueError: if the port is the output of a template instance, or of a container it is not connected inside of
+    """
+    while True:
+        if port.isSource():
+            if not hasattr(port, "internalEdges"):
+                return port
+            if not port.internalEdges:
+                # the internal nodes of a template are shared by all its instances, so they have no variables of there
+                # own for each instance
+                if getattr(port.node, "template", None) is not None:
+                    raise ValueError("Instances of container templates can not be compiled into an expression, "
+                                     "materialize them first")
+                raise ValueError("Container output {} is not connected inside of the container, and can not be "
+                                 "compiled into an expression".format(port.name))
+            # the output of a container, comes from the port inside the container connected to it
+            port = port.internalEdges[0]
+        elif port in variables or not port.isConnected():
+            return port
+        else:
+            port = port.edges[0]
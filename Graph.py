@@ -4,15 +4,79 @@ Graph
 - Is a container for Nodes and edges.
 - these nodes can be connected, with edges, or can be individual islands( nodes with edges, that are not all connected)
 
+ Islands are tracked with a union-find(disjoint set) index, that is updated as edges are added. Removing an edge
+ can split an island, which union-find can not undo, so the index is rebuilt the next time the islands are requested.
+ Islands share no nodes, so they can be evaluated at the same time on a thread or process pool.
+
  TODO:
  - setup two graph evaluation types, 1. Directional eg.ICE, 2. All Node Evaluating eg.Dependency Graph
- - a good way of finding islands in the nodes
 """
+import asyncio
+import collections
+import concurrent.futures
+import contextlib
+import inspect
+import math
+import time
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
 import Node as mNode
+import Port as mPort
+import Context as mContext
+import Expression as mExpression
+import Memo as mMemo
+import Profile as mProfile
+import Serialize as mSerialize
 
 class Graph(object):
     def __init__(self):
+        """
+        nodes: List of all the nodes in the graph
+        _schedule: cached topologically ordered list of nodes, built by compile(). None when the structure has changed
+        _heads: ordered set of nodes with no connected outputs, kept up to date as edges are added and removed
+        _tails: ordered set of nodes with no connected inputs
+        _islandParents: union-find parent of each node, the root node identifies the island
+        _islandsStale: True when an edge was removed, and the union-find index has to be rebuilt
+        _islands: cached list of islands, built by getIslands()
+        _levels: cached list of dependency levels, built by getLevels()
+        _order: position of each node in the compiled schedule
+        _downstream: cached list of the input ports each node's outputs are connected to, used to propagate dirtiness
+        _dirtyNodes: set of nodes that have been dirtied since they were last evaluated by the graph
+        _batchDepth: how many batch() blocks are currently open, dirty propagation is deferred while this is not 0
+        _pendingDirty: nodes dirtied during a batch, that still need to have there dirtiness propagated
+        memoCache: cache of node results used for all the nodes, see memoize(). None when results are not cached
+        _memoCaches: caches used for single nodes, instead of memoCache
+        _cutoffComparator: compares the old and new values of output ports, for early cutoff. None when disabled
+        _rewiredNodes: nodes created, connected, disconnected or loaded since early cutoff last evaluated them, they
+            are never cut off. Only tracked while early cutoff is enabled
+        _containerPlans: cached list of the internal nodes of each container, in evaluation order
+        profiler: Profile.Profiler recording the evaluation of the nodes, None when the graph is not being profiled
+        lazy: True when reading the value of an output port of a dirty node pulls it first, see setLazy()
+        """
         self.nodes = []
+        self._schedule = None
+        self._heads = collections.OrderedDict()
+        self._tails = collections.OrderedDict()
+        self._islandParents = {}
+        self._islandsStale = False
+        self._islands = None
+        self._levels = None
+        self._order = {}
+        self._downstream = {}
+        self._dirtyNodes = set()
+        self._batchDepth = 0
+        self._pendingDirty = []
+        self.memoCache = None
+        self._memoCaches = {}
+        self._cutoffComparator = None
+        self._rewiredNodes = set()
+        self._containerPlans = {}
+        self.profiler = None
+        self.lazy = False
 
     def createNode(self, classType):
         """
@@ -22,9 +86,426 @@ class Graph(object):
             mNode.Node: the newly created node
         """
         node = classType()
+        node.graph = self
         self.nodes.append(node)
+        self._islandParents[node] = node
+        self._dirtyNodes.add(node)
+        if self._cutoffComparator is not None:
+            self._rewiredNodes.add(node)
+        self.updateNodeIndex(node)
+        self.invalidate()
+        return node
+
+    def updateNodeIndex(self, node):
+        """
+        Updates the head and tail sets for the node, from the in/out degree counters on the node
+
+        Args:
+            node (mNode.Node): node whose connections have changed
+        """
+        self._downstream.pop(node, None)
+
+        if node.outDegree:
+            self._heads.pop(node, None)
+        else:
+            self._heads[node] = None
+
+        if node.inDegree:
+            self._tails.pop(node, None)
+        else:
+            self._tails[node] = None
+
+    def edgeAdded(self, port, otherPort):
+        """
+        Called by the ports when a connection has been made between them
+
+        Args:
+            port (Port): One end of the new edge
+            otherPort (Port): The other end of the new edge
+        """
+        for node in (port.node, otherPort.node):
+            if node.graph is self:
+                self.updateNodeIndex(node)
+        if port.node.graph is self and otherPort.node.graph is self:
+            self._unionIslands(port.node, otherPort.node)
+        self._addRewired(port, otherPort)
+        self.invalidate()
+
+    def edgeRemoved(self, port, otherPort):
+        """
+        Called by the ports when the connection between them has been removed
+
+        Args:
+            port (Port): One end of the removed edge
+            otherPort (Port): The other end of the removed edge
+        """
+        for node in (port.node, otherPort.node):
+            if node.graph is self:
+                self.updateNodeIndex(node)
+        self._islandsStale = True
+        self._addRewired(port, otherPort)
+        self.invalidate()
+
+    def _addRewired(self, port, otherPort):
+        """
+        Keeps the nodes of an edge that was added or removed from being cut off, see _cutOff
+        """
+        if self._cutoffComparator is not None:
+            for node in (port.node, otherPort.node):
+                if node.graph is self:
+                    self._rewiredNodes.add(node)
+
+    def invalidate(self):
+        """
+        Flags the compiled schedule as out of date, so it gets rebuilt the next time the graph is compiled.
+        This gets called when ever the structure of the graph changes (node created, ports connected or disconnected)
+        """
+        self._schedule = None
+        self._islands = None
+        self._levels = None
+        self._containerPlans = {}
+
+    def rebuildIndex(self):
+        """
+        Rebuilds the heads, tails, islands and dirty nodes of the graph from scratch. Used after nodes and edges
+        have been added in bulk, without going through createNode and Port.connect
+        """
+        self._heads = collections.OrderedDict()
+        self._tails = collections.OrderedDict()
+        self._downstream = {}
+        for node in self.nodes:
+            self.updateNodeIndex(node)
+        self._rebuildIslands()
+        self._dirtyNodes = set(node for node in self.nodes if node.dirty)
+        self._pendingDirty = []
+        if self._cutoffComparator is not None:
+            # the outputs of the loaded nodes were not computed by this graph
+            self._rewiredNodes.update(self._dirtyNodes)
+        self.invalidate()
+
+    def compile(self):
+        """
+        Builds a flat list of all the nodes in the graph, ordered so that every node comes after all the nodes
+        it is reading from. The schedule is cached, and only rebuilt when the structure of the graph changes.
+
+        Returns:
+            []: of nodes, in evaluation order
+        """
+        if self._schedule is None:
+            self._schedule = self._topologicalSort()
+            self._order = dict((node, index) for index, node in enumerate(self._schedule))
+        return self._schedule
+
+    def getDownstreamPorts(self, node):
+        """
+        Returns the input ports the node's outputs are connected to. The list is cached until the node's
+        connections change.
+
+        Args:
+            node (mNode.Node): a node in this graph
+
+        Returns:
+            []: of ports
+        """
+        ports = self._downstream.get(node)
+        if ports is None:
+            ports = [edgePort for port in node.portsOut for edgePort in port.edges]
+            self._downstream[node] = ports
+        return ports
+
+    def propagateDirty(self, node):
+        """
+        Called when a clean node in this graph becomes dirty. Walks everything downstream of the node in one
+        pass, setting the connected input ports and there nodes dirty. The walk stops at nodes that
+        are already dirty, as everything downstream of them is already dirty. All the nodes that get dirtied
+        are recorded, so evaluate only has to visit them.
+
+        While a batch is open the walk is deferred, until the batch is closed.
+
+        Args:
+            node (mNode.Node): the node that has just been set dirty
+        """
+        self._dirtyNodes.add(node)
+        if self._batchDepth:
+            self._pendingDirty.append(node)
+        else:
+            self._propagateDirty([node])
+
+    def _propagateDirty(self, stack):
+        """
+        Walks everything downstream of the nodes on the stack, see propagateDirty
+
+        Args:
+            stack ([]): of nodes that have been set dirty, the list is consumed
+        """
+        dirtyNodes = self._dirtyNodes
+        while stack:
+            for edgePort in self.getDownstreamPorts(stack.pop()):
+                edgePort.dirty = True
+                edgeNode = edgePort.node
+                if not edgeNode._dirty:
+                    if edgeNode.graph is self:
+                        edgeNode._dirty = True
+                        dirtyNodes.add(edgeNode)
+                        stack.append(edgeNode)
+                    else:
+                        edgeNode.dirty = True
+
+    @contextlib.contextmanager
+    def batch(self, evaluate=False):
+        """
+        Context manager that defers dirty propagation while port values are being set. When the outer most batch
+        closes, everything downstream of all the changed nodes is dirtied in a single walk.
+
+            with graph.batch():
+                nodeA.getInputPort("value").value = 1.0
+                nodeB.getInputPort("value").value = 2.0
+
+        Nodes downstream of the changed values are not dirty until the batch closes, so nodes should not be evaluated
+        inside the batch.
+
+        Args:
+            evaluate (bool): evaluate the graph when the batch closes
+        """
+        self._batchDepth += 1
+        try:
+            yield self
+        finally:
+            self._batchDepth -= 1
+            if not self._batchDepth:
+                pending = self._pendingDirty
+                self._pendingDirty = []
+                self._propagateDirty(pending)
+
+        if evaluate and not self._batchDepth:
+            self.evaluate()
+
+    def setValues(self, values, evaluate=False):
+        """
+        Sets the values of many ports in a single batch
+
+        Args:
+            values (dict): of port to value
+            evaluate (bool): evaluate the graph once the values have been set
+        """
+        with self.batch(evaluate):
+            for port, value in values.items():
+                port.value = value
+
+    def evaluateArrays(self, values, outputs):
+        """
+        Evaluates a batch of N samples in a single pass. Each input value is converted to a NumPy array(a scalar is
+        broadcast to all the samples), and the graph is evaluated once with the arrays flowing through the nodes.
+
+        Args:
+            values (dict): of port to an array of N values
+            outputs ([]): of ports to return the values of
+
+        Returns:
+            []: the value of each output port, an array of N values
+        """
+        if numpy is None:
+            raise ImportError("NumPy is required to evaluate arrays")
+        self.setValues(dict((port, numpy.asarray(value)) for port, value in values.items()), evaluate=True)
+        return [port.value for port in outputs]
+
+    def compileExpression(self, outputs, inputs=()):
+        """
+        Compiles the arithmetic nodes feeding the output ports into a single python function,
+        see Expression.compileExpression
+
+        Args:
+            outputs ([]): of output ports, that the function returns the values of
+            inputs ([]): of input ports, that become the arguments of the function
+
+        Returns:
+            function: taking a value for each input port, and returning a tuple with a value for each output port
+        """
+        return mExpression.compileExpression(outputs, inputs)
+
+    def save(self, path):
+        """
+        Saves the nodes, ports, edges and values of the graph to a binary file, see Serialize.save
+
+        Args:
+            path (str): path of the file to write
+        """
+        mSerialize.save(self, path)
+
+    @classmethod
+    def load(cls, path):
+        """
+        Loads a graph saved with save(), see Serialize.load
+
+        Args:
+            path (str): path of the file to read
+
+        Returns:
+            Graph: the loaded graph
+        """
+        return mSerialize.load(path, cls)
+
+    def saveJson(self, path):
+        """
+        Saves the graph as JSON lines, one record per node and edge, see Serialize.iterJson
+
+        Args:
+            path (str): path of the file to write
+        """
+        with open(path, "w") as fileHandle:
+            for line in mSerialize.iterJson(self):
+                fileHandle.write(line)
+                fileHandle.write("\n")
+
+    @classmethod
+    def loadJson(cls, path):
+        """
+        Loads a graph saved with saveJson(), reading the file a line at a time, see Serialize.readJson
+
+        Args:
+            path (str): path of the file to read
+
+        Returns:
+            Graph: the loaded graph
+        """
+        with open(path, "r") as fileHandle:
+            return mSerialize.readJson(fileHandle, cls)
+
+    def _topologicalSort(self):
+        """
+        Kahn's algorithm over the nodes of the graph.
+
+        Returns:
+            []: of nodes, in evaluation order
+        """
+        inDegree = {}
+        for node in self.nodes:
+            inDegree[node] = 0
+
+        downstream = {}
+        for node in self.nodes:
+            upstreamNodes = set()
+            for port in node.portsIn:
+                for edgePort in port.edges:
+                    if edgePort.node in inDegree:
+                        upstreamNodes.add(edgePort.node)
+            inDegree[node] = len(upstreamNodes)
+            for upstreamNode in upstreamNodes:
+                downstream.setdefault(upstreamNode, []).append(node)
+
+        ready = [node for node in self.nodes if inDegree[node] == 0]
+        ready.reverse()
+        schedule = []
+        while ready:
+            node = ready.pop()
+            schedule.append(node)
+            for downstreamNode in downstream.get(node, []):
+                inDegree[downstreamNode] -= 1
+                if inDegree[downstreamNode] == 0:
+                    ready.append(downstreamNode)
+
+        if len(schedule) != len(self.nodes):
+            raise RuntimeError("Graph contains a cycle, and can not be compiled")
+        return schedule
+
+    def getLevels(self):
+        """
+        Splits the compiled schedule into dependency levels(wavefronts). Nodes in a level only read from nodes in
+        the levels before it, so all the nodes of one level can be evaluated at the same time.
+
+        Returns:
+            [[]]: list of levels, each level being a list of nodes
+        """
+        if self._levels is None:
+            depths = {}
+            levels = []
+            for node in self.compile():
+                depth = 0
+                for port in node.portsIn:
+                    for edgePort in port.edges:
+                        upstreamDepth = depths.get(edgePort.node)
+                        if upstreamDepth is not None and upstreamDepth >= depth:
+                            depth = upstreamDepth + 1
+                depths[node] = depth
+                if depth == len(levels):
+                    levels.append([])
+                levels[depth].append(node)
+            self._levels = levels
+        return self._levels
+
+    def _findIsland(self, node):
+        """
+        Finds the root node of the island the node belongs to, halving the path to the root as it goes
+
+        Returns:
+            mNode.Node: the root node of the island
+        """
+        parents = self._islandParents
+        while parents[node] is not node:
+            parents[node] = parents[parents[node]]
+            node = parents[node]
         return node
 
+    def _unionIslands(self, node, otherNode):
+        """
+        Merges the islands of the two nodes into a single island
+        """
+        root = self._findIsland(node)
+        otherRoot = self._findIsland(otherNode)
+        if root is not otherRoot:
+            self._islandParents[otherRoot] = root
+
+    def _rebuildIslands(self):
+        """
+        Rebuilds the union-find index from all the edges in the graph
+        """
+        self._islandParents = {}
+        for node in self.nodes:
+            self._islandParents[node] = node
+        for node in self.nodes:
+            for port in node.portsOut:
+                for edgePort in port.edges:
+                    if edgePort.node.graph is self:
+                        self._unionIslands(node, edgePort.node)
+        self._islandsStale = False
+
+    def getIslands(self):
+        """
+        Returns all the islands(groups of nodes connected to each other) in the graph. The nodes of each island are
+        in evaluation order, and the islands are ordered by the order their first node was created
+
+        Returns:
+            [[]]: list of islands, each island being a list of nodes
+        """
+        if self._islands is None:
+            if self._islandsStale:
+                self._rebuildIslands()
+
+            islands = collections.OrderedDict()
+            for node in self.nodes:
+                islands[self._findIsland(node)] = []
+            for node in self.compile():
+                islands[self._findIsland(node)].append(node)
+            self._islands = list(islands.values())
+        return self._islands
+
+    def getIsland(self, node):
+        """
+        Returns the island the node belongs to
+
+        Args:
+            node (mNode.Node): a node in this graph
+
+        Returns:
+            []: of nodes, in evaluation order
+        """
+        islands = self.getIslands()
+        root = self._findIsland(node)
+        for island in islands:
+            if self._findIsland(island[0]) is root:
+                return island
+        return None
+
     def getNetworkHeads(self):
         """
         Returns the head nodes of all the networks(islands) in this graph
@@ -32,19 +513,7 @@ class Graph(object):
         Returns:
             []: of nodes
         """
-        nodesWithNoConnectedOutput = []
-
-        for node in self.nodes:
-            if not node.isConnected():
-                nodesWithNoConnectedOutput.append(node)
-            else:
-                connected = False
-                for port in node.portsOut:
-                    if port.isConnected():
-                        connected = True
-                if not connected:
-                    nodesWithNoConnectedOutput.append(node)
-        return nodesWithNoConnectedOutput
+        return list(self._heads)
 
     def getNetworkTails(self):
         """
@@ -53,20 +522,679 @@ class Graph(object):
         Returns:
             []: of nodes
         """
-        nodesWithNoConnectedInput = []
+        return list(self._tails)
 
-        for node in self.nodes:
-            if not node.isConnected():
-                nodesWithNoConnectedInput.append(node)
+    def evaluate(self, island=None):
+        """
+        Evaluates all the networks in the graph, by running the dirty nodes in the order of the compiled schedule.
+        As every node's inputs have already been evaluated by the time it is reached, there is no recursion
+        through the network, and clean nodes are never visited.
+
+        Args:
+            island ([]): Only evaluate this island, as returned by getIslands(). If None all nodes are evaluated
+        """
+        start = None if self.profiler is None else time.perf_counter()
+        if island is not None:
+            self._evaluateInOrder(island)
+        else:
+            self.compile()
+            nodes = sorted(self._dirtyNodes, key=self._order.__getitem__)
+            self._evaluateInOrder(nodes)
+            self._dirtyNodes = set(node for node in nodes if node.dirty)
+        if start is not None:
+            self.profiler.addSpan("Graph.evaluate", start, time.perf_counter() - start)
+
+    def pull(self, port):
+        """
+        Evaluates only what is needed for the value of a port: the port's node and the dirty nodes upstream of it.
+        The rest of the graph, other heads and islands are left dirty until they are evaluated or pulled.
+
+        Args:
+            port (Port): a port on a node in this graph, pulling an input port pulls the output port connected to it
+
+        Returns:
+            the value of the port
+        """
+        if port.node.graph is not self:
+            raise ValueError("Port {} is not on a node in this graph".format(port.name))
+        if port.edges and port.isDestination():
+            port = port.edges[0]
+        node = port.node
+        if not node._dirty:
+            return port._value
+        if node.graph is not self:
+            # the input is connected to a node outside of the graph, which pulls its own inputs
+            node.evaluate()
+            return port._value
+
+        start = None if self.profiler is None else time.perf_counter()
+        # the dirty nodes upstream of the node, clean nodes only have clean nodes upstream of them
+        cone = [node]
+        seen = set(cone)
+        stack = [node]
+        while stack:
+            for inPort in stack.pop().portsIn:
+                if inPort.edges:
+                    upstreamNode = inPort.edges[0].node
+                    if upstreamNode._dirty and upstreamNode.graph is self and upstreamNode not in seen:
+                        seen.add(upstreamNode)
+                        cone.append(upstreamNode)
+                        stack.append(upstreamNode)
+
+        self.compile()
+        cone.sort(key=self._order.__getitem__)
+        self._evaluateInOrder(cone)
+        self._dirtyNodes.difference_update([node for node in cone if not node._dirty])
+        if start is not None:
+            self.profiler.addSpan("Graph.pull", start, time.perf_counter() - start)
+        return port._value
+
+    def stream(self, inputs, outputs):
+        """
+        Generator evaluating the graph for each set of input values from an iterator(eg. animation frames or sensor
+        samples), yielding the values of the outputs for each of them. Only the inputs whose value changed from the
+        previous set are dirtied, and only the nodes the outputs need are evaluated, see pull. Nothing is kept from
+        one set to the next, so any length of sequence runs in the same memory.
+
+            for results in graph.stream(({valuePort: frame} for frame in frames), [resultPort]):
+                print(results[resultPort])
+
+        Args:
+            inputs (iterable): of dicts, of port: value
+            outputs ([]): of ports, to yield the values of
+
+        Returns:
+            generator: of dicts, of port: value, one for each dict of inputs
+        """
+        outputs = list(outputs)
+        for values in inputs:
+            with self.batch():
+                for port, value in values.items():
+                    if not valuesEqual(port.value, value):
+                        port.value = value
+            yield dict((port, self.pull(port)) for port in outputs)
+
+    def setLazy(self, enabled=True):
+        """
+        In a lazy graph, reading the value of an output port of a dirty node pulls it first(see pull), so the values
+        read are always up to date, and only what is read is evaluated. Ports are only checked for this while a graph
+        is lazy.
+
+        Args:
+            enabled (bool): True to make the graph lazy, False to read the values as they are
+        """
+        if enabled != self.lazy:
+            self.lazy = enabled
+            mPort.lazyGraphs += 1 if enabled else -1
+
+    async def evaluateAsync(self, island=None):
+        """
+        Evaluates the graph like evaluate(), on the running asyncio event loop, so nodes whose evaluate is a coroutine
+        (async def evaluate) can wait on I/O without blocking the other nodes. Each dirty node is a task, that awaits
+        the tasks of the nodes it reads from with asyncio.gather, so independent upstream nodes wait at the same time.
+
+            await graph.evaluateAsync()
+
+        Synchronous nodes are evaluated as normal, through evaluateNode, in the event loop's thread. Async nodes are
+        awaited directly, they are not memoized or profiled, and can not be inside of containers.
+
+        Args:
+            island ([]): Only evaluate this island, as returned by getIslands(). If None all nodes are evaluated
+        """
+        start = None if self.profiler is None else time.perf_counter()
+        if island is not None:
+            nodes = island
+        else:
+            self.compile()
+            nodes = sorted(self._dirtyNodes, key=self._order.__getitem__)
+
+        # output ports whose value was the same after there node was evaluated, for early cutoff
+        unchanged = set()
+        tasks = {}
+        for node in nodes:
+            if not node.dirty:
+                if self.profiler is not None:
+                    self.profiler.skip(node, mProfile.SKIP_CLEAN)
+                continue
+            upstream = set()
+            for port in node.portsIn:
+                if port.edges and port.edges[0].node in tasks:
+                    upstream.add(tasks[port.edges[0].node])
+            tasks[node] = asyncio.ensure_future(self._evaluateNodeAsync(node, upstream, unchanged))
+
+        try:
+            await asyncio.gather(*tasks.values())
+        except BaseException:
+            for task in tasks.values():
+                task.cancel()
+            raise
+        finally:
+            if island is None:
+                self._dirtyNodes = set(node for node in nodes if node.dirty)
+
+        if start is not None:
+            self.profiler.addSpan("Graph.evaluateAsync", start, time.perf_counter() - start)
+
+    async def _evaluateNodeAsync(self, node, upstream, unchanged):
+        """
+        Waits for the nodes the node reads from, then evaluates it
+
+        Args:
+            node (mNode.Node): a dirty node
+            upstream (set): tasks of the dirty nodes the node reads from
+            unchanged (set): output ports whose values did not change, see _evaluateInOrder
+        """
+        if upstream:
+            await asyncio.gather(*upstream)
+
+        comparator = self._cutoffComparator
+        if comparator is not None:
+            if self._cutOff(node, comparator, unchanged):
+                return
+            # read directly, as reading the outputs of a dirty node in a lazy graph would evaluate it
+            outValues = [port._value for port in node.portsOut]
+
+        # the upstream nodes have been evaluated, so the values are copied without evaluateConnection calling them
+        for port in node.portsIn:
+            if port.dirty:
+                if port.edges:
+                    port.value = port.edges[0].value
+                port.dirty = False
+
+        if inspect.iscoroutinefunction(node.evaluate):
+            await node.evaluate()
+        else:
+            self.evaluateNode(node)
+
+        if comparator is not None:
+            self._rewiredNodes.discard(node)
+            for port, value in zip(node.portsOut, outValues):
+                if comparator(value, port.value):
+                    unchanged.add(port)
+
+    def _evaluateInOrder(self, nodes):
+        """
+        Evaluates the dirty nodes, in the order given. With early cutoff, a node that is only dirty because of
+        connected inputs, whose values did not change when there nodes were evaluated, is cleaned without evaluating it.
+
+        Args:
+            nodes ([]): of nodes, every node comes after the nodes it reads from
+        """
+        comparator = self._cutoffComparator
+        if comparator is None:
+            for node in nodes:
+                if node.dirty:
+                    self.evaluateNode(node)
+                elif self.profiler is not None:
+                    self.profiler.skip(node, mProfile.SKIP_CLEAN)
+            return
+
+        # output ports whose value was the same after there node was evaluated
+        unchanged = set()
+        for node in nodes:
+            if not node.dirty:
+                if self.profiler is not None:
+                    self.profiler.skip(node, mProfile.SKIP_CLEAN)
+                continue
+            if self._cutOff(node, comparator, unchanged):
+                continue
+
+            # read directly, as reading the outputs of a dirty node in a lazy graph would evaluate it
+            outValues = [port._value for port in node.portsOut]
+            self.evaluateNode(node)
+            self._rewiredNodes.discard(node)
+            for port, value in zip(node.portsOut, outValues):
+                if comparator(value, port.value):
+                    unchanged.add(port)
+
+    def _cutOff(self, node, comparator, unchanged):
+        """
+        Early cutoff of a dirty node, cleaning it without evaluating it when each of its dirty inputs is connected to
+        an output whose value did not change, and already holds that value. Nodes that were created, connected or
+        disconnected since they were last evaluated are never cut off, as there outputs were not computed from there
+        current inputs.
+
+        Args:
+            node (mNode.Node): a dirty node, whose upstream nodes have been evaluated
+            comparator (function): compares two port values, see setEarlyCutoff
+            unchanged (set): output ports whose value was the same after there node was evaluated, the node's
+                outputs are added when it is cut off
+
+        Returns:
+            bool: True if the node was cleaned without evaluating it
+        """
+        if node in self._rewiredNodes:
+            return False
+        dirtyPorts = [port for port in node.portsIn if port.dirty]
+        if not dirtyPorts:
+            return False
+        for port in dirtyPorts:
+            if not port.edges:
+                return False
+            source = port.edges[0]
+            if source not in unchanged or not comparator(port._value, source._value):
+                return False
+
+        for port in dirtyPorts:
+            port.dirty = False
+        node.dirty = False
+        unchanged.update(node.portsOut)
+        if self.profiler is not None:
+            self.profiler.skip(node, mProfile.SKIP_CUTOFF)
+        return True
+
+    def setEarlyCutoff(self, enabled=True, comparator=None):
+        """
+        Dirtying a node dirties everything downstream of it, even when its outputs end up with the same values.
+        With early cutoff, evaluate() compares the values of each node's outputs before and after it is evaluated,
+        and the nodes reading only from outputs that did not change are cleaned without being evaluated.
+
+        Args:
+            enabled (bool): True to enable early cutoff, False to disable it
+            comparator (function): taking the old and new value of an output, and returning True when they are equal.
+                Defaults to valuesEqual, see getCloseComparator to compare floats and arrays with a tolerance
+        """
+        if not enabled:
+            self._cutoffComparator = None
+            self._rewiredNodes = set()
+            return
+        if self._cutoffComparator is None:
+            # rewiring is not tracked while early cutoff is disabled, and rewired nodes are always dirty
+            self._rewiredNodes = set(node for node in self.nodes if node.dirty)
+        self._cutoffComparator = comparator or valuesEqual
+
+    def evaluateNode(self, node):
+        """
+        Evaluates a single node, through the node's memo cache if it has one. Containers are evaluated with there
+        internal nodes inlined, see _evaluateContainer. The evaluation is recorded when the graph is being profiled.
+
+        Args:
+            node (mNode.Node): the node to evaluate
+
+        Returns:
+            bool: True if the node's outputs were restored from a memo cache
+        """
+        if self.profiler is not None:
+            return self.profiler.evaluate(node, self._evaluateNode)
+        return self._evaluateNode(node)
+
+    def _evaluateNode(self, node):
+        _checkSynchronous(node)
+        if not node.detachable and hasattr(node, "pushInputs"):
+            self._evaluateContainer(node)
+            return False
+
+        memoCache = self._memoCaches.get(node, self.memoCache)
+        if memoCache is None:
+            node.evaluate()
+            return False
+        return memoCache.evaluate(node)
+
+    @contextlib.contextmanager
+    def profile(self, profiler=None):
+        """
+        Context manager that records the evaluation of the nodes while it is open, see Profile.Profiler
+
+            with graph.profile() as profiler:
+                graph.evaluate()
+            print(profiler.getTable())
+
+        Args:
+            profiler (Profile.Profiler): profiler to record to, a new one is created if None
+
+        Returns:
+            Profile.Profiler: the profiler
+        """
+        previous = self.profiler
+        self.profiler = profiler or mProfile.Profiler()
+        try:
+            yield self.profiler
+        finally:
+            self.profiler = previous
+
+    def _evaluateContainer(self, node):
+        """
+        Evaluates a container, with the graph evaluating the internal nodes in a flat list, instead of the
+        container pulling on each of its outputs. Nested containers are inlined the same way, through evaluateNode,
+        so the internal nodes take part in memoization and early cutoff like any other node.
+
+        The list is cached until the structure of the graph changes. Internal nodes that were connected after the
+        list was built, are still evaluated by the container pulling on its outputs.
+
+        Args:
+            node (mNode.ContainerNode): a container in this graph
+        """
+        if not node.dirty:
+            return
+        if node.template is not None:
+            # the template's internal nodes are inlined, for each instance in turn
+            node.evaluateConnection()
+            node.template.evaluate(node, self._evaluateContainer)
+            return
+        plan = self._containerPlans.get(node)
+        if plan is None:
+            plan = self._containerPlans[node] = _getContainerPlan(node)
+        node.pushInputs()
+        self._evaluateInOrder(plan)
+        node.pullOutputs()
+
+    def memoize(self, size=1024, node=None):
+        """
+        Caches the results of the nodes, so evaluating a node with inputs it has been evaluated with before restores
+        its outputs instead of computing them again, see Memo.MemoCache
+
+        Args:
+            size (int): the maximum amount of results cached. None stops caching
+            node (mNode.Node): only cache the results of this node. If None the results of all the nodes are cached
+
+        Returns:
+            Memo.MemoCache: the cache, for its stats. None when caching was stopped
+        """
+        memoCache = None if size is None else mMemo.MemoCache(size)
+        if node is None:
+            self.memoCache = memoCache
+        elif memoCache is None:
+            self._memoCaches.pop(node, None)
+        else:
+            self._memoCaches[node] = memoCache
+        return memoCache
+
+    def evaluateIslands(self, executor):
+        """
+        Evaluates each island of the graph as a separate task on the executor, and waits for them all to finish.
+
+        With a ProcessPoolExecutor each island is sent to the worker process in the binary format of save(), as
+        pickling the nodes follows the edges of long chains recursively, and the resulting port values are copied
+        back onto the nodes in this graph. Instances of container templates have to be materialized first.
+
+        Args:
+            executor (concurrent.futures.Executor): thread or process pool to run the islands on
+        """
+        islands = [island for island in self.getIslands() if any(node.dirty for node in island)]
+
+        if isinstance(executor, concurrent.futures.ProcessPoolExecutor):
+            futures = [executor.submit(_evaluateIsland, mSerialize.dumps(self, island), _getDirtyFlags(island))
+                       for island in islands]
+            for island, future in zip(islands, futures):
+                _applyNodeStates(island, future.result())
+        else:
+            futures = [executor.submit(self.evaluate, island) for island in islands]
+            for future in futures:
+                future.result()
+
+    def evaluateLevels(self, executor):
+        """
+        Evaluates the graph one dependency level at a time, running all the dirty nodes of a level at the same
+        time on the executor, and waiting for the whole level to finish before starting the next one.
+
+        With a ProcessPoolExecutor the inputs of each node are pulled in this process, and a fresh node of the same
+        class is evaluated in the worker. Nodes that can not be evaluated detached from the graph(detachable is
+        False, eg. ContainerNode) are evaluated in this process. The memo caches are looked up and stored to in this
+        process, and early cutoff is applied between the levels, as when the graph is evaluated serially.
+
+        Args:
+            executor (concurrent.futures.Executor): thread or process pool to run the nodes on
+        """
+        detach = isinstance(executor, concurrent.futures.ProcessPoolExecutor)
+        comparator = self._cutoffComparator
+        # output ports whose value was the same after there node was evaluated, see _evaluateInOrder
+        unchanged = set()
+        for level in self.getLevels():
+            nodes = [node for node in level if node.dirty]
+            if comparator is not None:
+                nodes = [node for node in nodes if not self._cutOff(node, comparator, unchanged)]
+                outValues = [[port._value for port in node.portsOut] for node in nodes]
+
+            if len(nodes) < 2:
+                for node in nodes:
+                    self.evaluateNode(node)
+            elif detach:
+                self._evaluateDetachedNodes(executor, nodes)
             else:
-                connected = False
-                for port in node.portsIn:
-                    if port.isConnected():
-                        connected = True
-                if not connected:
-                    nodesWithNoConnectedInput.append(node)
-        return nodesWithNoConnectedInput
-
-    def evaluate(self):
-        for head in self.getNetworkHeads():
-            head.evaluate()
+                futures = [executor.submit(self.evaluateNode, node) for node in nodes]
+                for future in futures:
+                    future.result()
+
+            if comparator is not None:
+                for node, values in zip(nodes, outValues):
+                    self._rewiredNodes.discard(node)
+                    for port, value in zip(node.portsOut, values):
+                        if comparator(value, port._value):
+                            unchanged.add(port)
+
+    def _evaluateDetachedNodes(self, executor, nodes):
+        """
+        Evaluates the detachable nodes on the process pool, and the other nodes in this process. Nodes whose results
+        are restored from there memo cache are not sent to the pool.
+
+        Args:
+            executor (concurrent.futures.ProcessPoolExecutor): the process pool
+            nodes ([]): of dirty nodes, that do not read from each other
+        """
+        futures = []
+        for node in nodes:
+            if not node.detachable:
+                self.evaluateNode(node)
+                continue
+            memoCache = self._memoCaches.get(node, self.memoCache)
+            key = None
+            if memoCache is None:
+                node.evaluateConnection()
+            else:
+                restored, key = memoCache.restore(node)
+                if restored:
+                    continue
+            inputs = [(port.name, port.value) for port in node.portsIn]
+            futures.append((node, memoCache, key, executor.submit(_evaluateDetached, type(node), inputs)))
+        for node, memoCache, key, future in futures:
+            outValues, dirty = future.result()
+            for port, value in zip(node.portsOut, outValues):
+                port._value = value
+            node._dirty = dirty
+            if key is not None:
+                memoCache.store(key, outValues)
+
+    def createContext(self, values=None):
+        """
+        Creates an evaluation context, holding its own port values and dirty nodes for this graph, see
+        Context.EvaluationContext. The graph is evaluated first, as contexts start from its values.
+
+            context = graph.createContext({sumNode.getInputPort("value1"): 2.0})
+            context.evaluate()
+            result = context.getValue(negNode.getOutputPort("result"))
+
+        Args:
+            values (dict): of port: value, to set in the context
+
+        Returns:
+            Context.EvaluationContext: the context
+        """
+        return mContext.EvaluationContext(self, values)
+
+    def evaluateContexts(self, contexts, executor=None):
+        """
+        Evaluates many contexts of this graph, each as a separate task on the executor. The contexts share the graph,
+        so its structure and values must not change until they have finished.
+
+        Args:
+            contexts ([]): of Context.EvaluationContext, created for this graph
+            executor (concurrent.futures.Executor): thread pool to run the contexts on. If None the contexts are
+                evaluated one after another
+        """
+        if executor is None:
+            for context in contexts:
+                context.evaluate()
+            return
+        if isinstance(executor, concurrent.futures.ProcessPoolExecutor):
+            raise TypeError("Contexts share the graph's nodes, and can only be evaluated on a thread pool")
+        futures = [executor.submit(context.evaluate) for context in contexts]
+        for future in futures:
+            future.result()
+
+
+def _getContainerPlan(container):
+    """
+    Finds the internal nodes of the container that its outputs read from, stopping at the container's inputs.
+
+    Args:
+        container (mNode.ContainerNode): the container
+
+    Returns:
+        []: of internal nodes, ordered so every node comes after the nodes it reads from
+    """
+    def getSource(port):
+        if port.isConnected() and port.edges[0].node is not container:
+            return port.edges[0].node
+        return None
+
+    nodes = [port.internalEdges[0].node for port in container.portsOut
+             if port.internalEdges and port.internalEdges[0].node is not container]
+    return mNode.getNodeOrder(nodes, getSource)
+
+
+def valuesEqual(value, other):
+    """
+    Exact comparison of two port values, NumPy arrays are equal when they have the same type, shape and elements
+
+    Returns:
+        bool: True if the values are equal
+    """
+    if value is other:
+        return True
+    if type(value) is not type(other):
+        return False
+    if numpy is not None and isinstance(value, numpy.ndarray):
+        return value.shape == other.shape and value.dtype == other.dtype and bool(numpy.array_equal(value, other))
+    try:
+        return bool(value == other)
+    except (TypeError, ValueError):
+        # eg. lists of arrays, which can not be compared to a single bool
+        return False
+
+
+def getCloseComparator(relTolerance=1e-09, absTolerance=0.0):
+    """
+    Creates a comparator for early cutoff, that treats floats and NumPy arrays that are within a tolerance of each
+    other as equal. Other values are compared with valuesEqual.
+
+    Args:
+        relTolerance (float): relative tolerance
+        absTolerance (float): absolute tolerance
+
+    Returns:
+        function: taking two values, and returning True when they are close
+    """
+    def comparator(value, other):
+        if isinstance(value, float) and isinstance(other, float):
+            return math.isclose(value, other, rel_tol=relTolerance, abs_tol=absTolerance)
+        if numpy is not None and isinstance(value, numpy.ndarray) and isinstance(other, numpy.ndarray):
+            return value.shape == other.shape and bool(
+                numpy.allclose(value, other, rtol=relTolerance, atol=absTolerance))
+        return valuesEqual(value, other)
+    return comparator
+
+
+def _evaluateDetached(nodeClass, inputs):
+    """
+    Evaluates a new node of the class, with the input values given. Used by worker processes, so only the class
+    and values have to be sent to the worker, not the node and everything it is connected to.
+
+    Args:
+        nodeClass (type): class of the node to evaluate
+        inputs ([]): of (port name, value) for every input port
+
+    Returns:
+        tuple: the output port values, and the dirty flag of the node after evaluation
+    """
+    node = nodeClass()
+    _checkSynchronous(node)
+    for name, value in inputs:
+        port = node.getInputPort(name)
+        if port is None:
+            port = node.addInputPort(name)
+        port.value = value
+    node.evaluate()
+    return [port.value for port in node.portsOut], node.dirty
+
+
+def _getDirtyFlags(nodes):
+    """
+    Returns:
+        []: of the dirty flag of each node, and of its input ports
+    """
+    return [(node._dirty, [port.dirty for port in node.portsIn]) for node in nodes]
+
+
+def _evaluateIsland(data, dirtyFlags):
+    """
+    Evaluates an island in a worker process, from the island saved with Serialize.dumps. The dirty flags are restored
+    first, as loading dirties every node
+
+    Args:
+        data (bytes): the island, its nodes are in evaluation order
+        dirtyFlags ([]): see _getDirtyFlags
+
+    Returns:
+        []: state of each node, see _getNodeState
+    """
+    nodes = mSerialize.loads(data, Graph).nodes
+    for node, (dirty, portsDirty) in zip(nodes, dirtyFlags):
+        node._dirty = dirty
+        for port, portDirty in zip(node.portsIn, portsDirty):
+            port.dirty = portDirty
+    return _evaluateNodes(nodes)
+
+
+def _evaluateNodes(nodes):
+    """
+    Evaluates the nodes in order, used by worker processes which receive a copy of the nodes
+
+    Args:
+        nodes ([]): nodes in evaluation order
+
+    Returns:
+        []: state of each node, see _getNodeState
+    """
+    for node in nodes:
+        if node.dirty:
+            _checkSynchronous(node)
+            node.evaluate()
+    return [_getNodeState(node) for node in nodes]
+
+
+def _checkSynchronous(node):
+    """
+    Calling a coroutine evaluate method only creates the coroutine, so the node would never be evaluated
+
+    Raises:
+        TypeError: if the node's evaluate method is a coroutine
+    """
+    if inspect.iscoroutinefunction(node.evaluate):
+        raise TypeError("{} has a coroutine evaluate method, evaluate the graph with evaluateAsync instead".format(
+            type(node).__name__))
+
+
+def _getNodeState(node):
+    """
+    Returns:
+        tuple: input port values, input port dirty flags, output port values and the dirty flag of the node
+    """
+    return ([port.value for port in node.portsIn],
+            [port.dirty for port in node.portsIn],
+            [port.value for port in node.portsOut],
+            node.dirty)
+
+
+def _applyNodeStates(nodes, states):
+    """
+    Copies the states returned from a worker process back onto the nodes. The values are set directly, as the nodes
+    have already been evaluated, and must not be dirtied again.
+    """
+    for node, (inValues, inDirty, outValues, dirty) in zip(nodes, states):
+        for port, value, portDirty in zip(node.portsIn, inValues, inDirty):
+            port._value = value
+            port.dirty = portDirty
+        for port, value in zip(node.portsOut, outValues):
+            port._value = value
+        node._dirty = dirty
+
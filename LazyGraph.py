@@ -0,0 +1,133 @@
+"""
+
+LazyGraph
+- A graph that memory maps a file saved with Graph.save, and only creates the Node and Port objects of an island
+  when a node of that island is asked for, with getNode, or when the whole graph is evaluated.
+- An island is the smallest part of a graph that can be created on its own, as evaluating a node needs everything
+  upstream of it, and dirtying a node needs everything downstream of it.
+- Until then the nodes only exist as columns in the mapped file, so a worker evaluating a single island of a huge
+  file never parses or allocates the rest, and workers mapping the same file share its pages.
+- All the Graph methods work on the islands that have been created so far, evaluate() without an island creates
+  all of them first.
+"""
+import Graph as mGraph
+import Serialize as mSerialize
+
+
+class LazyGraph(mGraph.Graph):
+    def __init__(self, path):
+        """
+        graphFile: the memory mapped file
+        _loadedNodes: the nodes created so far, by there index in the file
+        _loadedPorts: the ports created so far, by there index in the file
+        _loadedIslands: the islands created so far, by there index in the file
+
+        Args:
+            path (str): path of a file saved with Graph.save
+        """
+        super(LazyGraph, self).__init__()
+        self.graphFile = mSerialize.mapFile(path)
+        self._loadedNodes = {}
+        self._loadedPorts = {}
+        self._loadedIslands = set()
+
+    def getNodeCount(self):
+        """
+        Returns:
+            int: the amount of nodes in the file, including the nodes inside of containers
+        """
+        return len(self.graphFile)
+
+    def getIslandCount(self):
+        """
+        Returns:
+            int: the amount of islands in the file
+        """
+        return self.graphFile.islandCount
+
+    def getNodeIsland(self, index):
+        """
+        Returns:
+            int: the index of the island the node is in, without creating it
+        """
+        return self.graphFile.nodeIsland[index]
+
+    def getNode(self, index):
+        """
+        Returns the node, creating the island it is in if it has not been created yet
+
+        Args:
+            index (int): index of the node in the file, in the order the nodes were saved
+
+        Returns:
+            mNode.Node: the node
+        """
+        node = self._loadedNodes.get(index)
+        if node is None:
+            self.loadIsland(self.graphFile.nodeIsland[index])
+            node = self._loadedNodes[index]
+        return node
+
+    def loadIsland(self, island):
+        """
+        Creates the nodes, ports and edges of an island, and adds them to the graph
+
+        Args:
+            island (int): index of the island in the file
+
+        Returns:
+            []: of the top level nodes of the island, in the order they were saved
+        """
+        graphFile = self.graphFile
+        nodes = []
+        for index in graphFile.getIslandNodes(island):
+            node = self._loadedNodes.get(index)
+            if node is None:
+                node = graphFile.createNode(index, self, self._loadedNodes, self._loadedPorts)
+            if node.graph is self:
+                nodes.append(node)
+        if island in self._loadedIslands:
+            return nodes
+
+        start, end = graphFile.getIslandEdges(island)
+        graphFile.connectPorts(start, end, self._loadedPorts)
+        for node in nodes:
+            self._islandParents[node] = node
+            self._dirtyNodes.add(node)
+            if self._cutoffComparator is not None:
+                self._rewiredNodes.add(node)
+            self.updateNodeIndex(node)
+        for node in nodes[1:]:
+            self._unionIslands(nodes[0], node)
+        self.invalidate()
+        self._loadedIslands.add(island)
+        return nodes
+
+    def loadAll(self):
+        """
+        Creates all the islands that have not been created yet
+        """
+        for island in range(self.graphFile.islandCount):
+            if island not in self._loadedIslands:
+                self.loadIsland(island)
+
+    def evaluate(self, island=None):
+        """
+        Evaluates the graph, see Graph.evaluate. When no island is given, all the islands are created first
+        """
+        if island is None:
+            self.loadAll()
+        super(LazyGraph, self).evaluate(island)
+
+    async def evaluateAsync(self, island=None):
+        if island is None:
+            self.loadAll()
+        await super(LazyGraph, self).evaluateAsync(island)
+
+    def evaluateIslands(self, executor):
+        self.loadAll()
+        super(LazyGraph, self).evaluateIslands(executor)
+
+    def evaluateLevels(self, executor):
+        self.loadAll()
+        super(LazyGraph, self).evaluateLevels(executor)
@@ -0,0 +1,160 @@
+"""
+
+Memo
+- A bounded least recently used cache of node results, keyed on the class of the node and the values of its inputs.
+- When a node with the same inputs as an earlier evaluation is evaluated, the outputs are restored from the cache
+  instead of calling the node's evaluate. Re-setting a port to a value it had before, or toggling between a few known
+  states(eg. scrubbing through an animation), then only costs hashing the inputs.
+- Only detachable nodes are cached, as there outputs only depend on there inputs. Nodes with an input value that can
+  not be hashed are evaluated as normal.
+- Values are never modified in place by the nodes, so the cached outputs are shared and not copied.
+"""
+import collections
+import hashlib
+import threading
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+class MemoCache(object):
+    def __init__(self, size=1024):
+        """
+        size: the maximum amount of results stored, the least recently used result is removed when it is full
+        hits: amount of evaluations restored from the cache
+        misses: amount of evaluations that called the node's evaluate
+        _results: the output values of each key, in least to most recently used order
+        _lock: the cache can be shared by nodes evaluating on different threads
+
+        Args:
+            size (int): the maximum amount of results stored
+        """
+        self.size = size
+        self.hits = 0
+        self.misses = 0
+        self._results = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._results)
+
+    def evaluate(self, node):
+        """
+        Evaluates the node, restoring its outputs from the cache when its inputs have been seen before
+
+        Args:
+            node (mNode.Node): a dirty node
+
+        Returns:
+            bool: True if the outputs were restored from the cache
+        """
+        if not node.detachable:
+            node.evaluate()
+            return False
+
+        restored, key = self.restore(node)
+        if restored:
+            return True
+        node.evaluate()
+        if key is not None:
+            self.store(key, [port.value for port in node.portsOut])
+        return False
+
+    def restore(self, node):
+        """
+        Pulls the connected inputs of the node, and restores its outputs from the cache when its inputs have been seen
+        before. Used when the node is evaluated somewhere else, eg. in a worker process, see store.
+
+        Args:
+            node (mNode.Node): a dirty detachable node
+
+        Returns:
+            tuple: True if the outputs were restored, and the key to store the node's results with. The key is None
+            when an input value can not be hashed
+        """
+        # pull the values of the connected inputs, so the key is made from the values the node will evaluate with
+        node.evaluateConnection()
+        try:
+            key = (type(node), tuple((port.name, getKey(port.value)) for port in node.portsIn))
+        except TypeError:
+            return False, None
+
+        with self._lock:
+            outValues = self._results.get(key)
+            if outValues is not None:
+                self._results.move_to_end(key)
+                self.hits += 1
+            else:
+                self.misses += 1
+
+        if outValues is None:
+            return False, key
+        for port, value in zip(node.portsOut, outValues):
+            port.value = value
+        node.dirty = False
+        return True, key
+
+    def store(self, key, outValues):
+        """
+        Stores the results of a node, see restore
+
+        Args:
+            key (tuple): the key returned by restore
+            outValues ([]): the values of the node's output ports
+        """
+        with self._lock:
+            self._results[key] = tuple(outValues)
+            while len(self._results) > self.size:
+                self._results.popitem(last=False)
+
+    def clear(self):
+        """
+        Removes all the stored results, and resets the stats
+        """
+        with self._lock:
+            self._results.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def getStats(self):
+        """
+        Returns:
+            dict: of the hits, misses, hit rate, and the amount of results stored
+        """
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hitRate": self.hits / float(lookups) if lookups else 0.0,
+            "size": len(self._results),
+            "maxSize": self.size,
+        }
+
+
+def getKey(value):
+    """
+    Converts a port value to a hashable key. The type is part of the key, so 1 and 1.0 are different keys, lists and
+    dicts are converted to tuples, and NumPy arrays are keyed on a digest of there data.
+
+    Args:
+        value: a port value
+
+    Returns:
+        tuple: the key
+
+    Raises:
+        TypeError: if the value can not be hashed
+    """
+    valueType = type(value)
+    if valueType in (list, tuple):
+        return valueType, tuple(getKey(item) for item in value)
+    if valueType is dict:
+        return valueType, frozenset((getKey(name), getKey(item)) for name, item in value.items())
+    if numpy is not None and valueType is numpy.ndarray:
+        if value.dtype.hasobject:
+            raise TypeError("Arrays of objects can not be hashed")
+        return valueType, value.dtype.str, value.shape, hashlib.sha1(value.tobytes()).digest()
+    hash(value)
+    return valueType, value
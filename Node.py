@@ -1,5 +1,85 @@
+"""
+Port values are usually scalars, but the arithmetic nodes also accept NumPy arrays, evaluating a whole batch of
+samples in a single pass with broadcasting. Operations never modify there input values in place, as the arrays
+are shared with the ports they came from.
+"""
+import threading
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
 import Port as port
+
+class PortLayout(object):
+    """
+    Maps the names of a node's ports to there index in portsIn/portsOut, so ports can be found by name in constant
+    time. The layout of the ports a node creates in __init__ is shared by all the nodes of the same class, so the
+    lookup tables do not cost memory per node. Adding a port to a node with a shared layout gives the node its own
+    copy first, after that ports are added to the copy in place.
+    """
+    __slots__ = ("inputs", "outputs", "shared")
+
+    def __init__(self, inputs=None, outputs=None):
+        """
+        inputs: dict of input port name to index
+        outputs: dict of output port name to index
+        shared: True when the layout is used by many nodes, and must not be changed
+        """
+        self.inputs = inputs if inputs is not None else {}
+        self.outputs = outputs if outputs is not None else {}
+        self.shared = False
+
+    def copy(self):
+        """
+        Returns:
+            PortLayout: a layout with the same ports, that is not shared
+        """
+        return PortLayout(dict(self.inputs), dict(self.outputs))
+
+    def __getstate__(self):
+        return self.inputs, self.outputs, self.shared
+
+    def __setstate__(self, state):
+        self.inputs, self.outputs, self.shared = state
+
+
+def shareLayout(layouts, key, layout):
+    """
+    Returns the layout stored in layouts for the key if it has the same ports as this layout, so the nodes can share
+    it. If there is no layout stored for the key yet, this layout is stored and becomes shared
+
+    Args:
+        layouts (dict): of the shared layouts
+        key: eg. the class of the node
+        layout (PortLayout): the layout of a node
+
+    Returns:
+        PortLayout: the layout the node should use
+    """
+    sharedLayout = layouts.get(key)
+    if sharedLayout is None:
+        layout.shared = True
+        layouts[key] = layout
+        return layout
+    if sharedLayout.inputs == layout.inputs and sharedLayout.outputs == layout.outputs:
+        return sharedLayout
+    return layout
+
+# the shared layout of the ports each node class creates in __init__
+_classLayouts = {}
+
 class Node(object):
+    # nodes use slots instead of a __dict__, to keep the memory used by large graphs down. Subclasses that add
+    # attributes should declare them in there own __slots__
+    __slots__ = ("type", "id", "graph", "name", "portsIn", "portsOut", "inDegree", "outDegree", "_dirty",
+                 "_portLayout")
+
+    # True if a new instance of the node, given the same input values, produces the same outputs. Nodes that
+    # keep state outside of there ports must set this to False, so they are not evaluated detached from the graph
+    detachable = True
+
     def __init__(self):
         """
         type: The type of node that this node is.
@@ -8,16 +88,26 @@ class Node(object):
         portsIn: List of input ports
         portsOut: List of output ports
         dirty: if the node has had some values updated on it, then it gets flagged as dirty
+        graph: The graph this node was created in, None if the node was created outside of a graph
+        inDegree: The number of edges connected to the input ports
+        outDegree: The number of edges connected to the output ports
+        _portLayout: PortLayout mapping the names of the ports to there index in portsIn/portsOut, shared with the
+            other nodes of the same class until a port is added
         """
         self.type = ""
         self.id = -1
+        self.graph = None
         self.name = ""
         self.portsIn = []
         self.portsOut = []
+        self.inDegree = 0
+        self.outDegree = 0
         self._dirty = True
+        self._portLayout = PortLayout()
 
         self.initInputPorts()
         self.initOutputPorts()
+        self._portLayout = shareLayout(_classLayouts, type(self), self._portLayout)
 
 
     """
@@ -32,17 +122,48 @@ class Node(object):
     """
     @property
     def dirty(self):
+        if port.activeContexts:
+            context = port.activeContext.get()
+            if context is not None:
+                return self in context.dirtyNodes
         return self._dirty
 
     @dirty.setter
     def dirty(self, val):
+        if port.activeContexts:
+            context = port.activeContext.get()
+            if context is not None:
+                context.setNodeDirty(self, val)
+                return
         # if setting the node to be dirty, all conncted nodes up stream must be have there
-        # connected inputs set to dirty as well.
-        if self._dirty == False and val:
-            for port in self.portsOut:
+        # connected inputs set to dirty as well. Nodes in a graph let the graph do this, so it can track the dirty nodes
+        if val and not self._dirty:
+            self._dirty = True
+            if self.graph is not None:
+                self.graph.propagateDirty(self)
+            else:
+                self.propagateDirty()
+        else:
+            self._dirty = val
+
+    def propagateDirty(self):
+        """
+        Sets all the ports and nodes downstream of this node dirty. Nodes that belong to a graph are handed over to the
+        graph.
+        """
+        # a stack, as recursing through long chains of nodes hits the recursion limit
+        stack = [self]
+        while stack:
+            for port in stack.pop().portsOut:
                 for edgePort in port.edges:
-                    edgePort.setDirty()
-        self._dirty = val
+                    edgePort.dirty = True
+                    edgeNode = edgePort.node
+                    if not edgeNode._dirty:
+                        if edgeNode.graph is None:
+                            edgeNode._dirty = True
+                            stack.append(edgeNode)
+                        else:
+                            edgeNode.dirty = True
 
     def initInputPorts(self):
         """
@@ -66,6 +187,9 @@ class Node(object):
 
         This method executes the node, reading the inputs and performing what ever computations on the inputs,
         then sends it to the output ports
+
+        Nodes that wait on I/O can define it as a coroutine(async def evaluate) instead, these nodes have to be
+        evaluated with Graph.evaluateAsync
         """
         pass
 
@@ -79,16 +203,16 @@ class Node(object):
         Returns:
              Port: The port with the matching name
         """
-        for port in self.portsIn:
-            if port.name == name:
-                return port
-        return None
+        index = self._portLayout.inputs.get(name)
+        if index is None:
+            return None
+        return self.portsIn[index]
 
     def getOutputPort(self, name):
-        for port in self.portsOut:
-            if port.name == name:
-                return port
-        return None
+        index = self._portLayout.outputs.get(name)
+        if index is None:
+            return None
+        return self.portsOut[index]
 
     def addInputPort(self, name, value=0.0):
         """
@@ -98,25 +222,41 @@ class Node(object):
             name(str): The name of the port
             value(float): The value of the port
         Returns:
-            Port: The newly created port
+            Port: The newly created port, None if the node already has an input port with this name
+        """
+        if name in self._portLayout.inputs:
+            return None
+        return self._appendInputPort(port.Port(name, self, value))
+
+    def addOutputPort(self, name):
+        if name in self._portLayout.outputs:
+            return None
+        return self._appendOutputPort(port.Port(name, self))
+
+    def _getOwnLayout(self):
+        """
+        Returns:
+            PortLayout: the node's layout, copied first if it is shared with other nodes
         """
-        newPort = port.Port(name, self, value)
+        if self._portLayout.shared:
+            self._portLayout = self._portLayout.copy()
+        return self._portLayout
+
+    def _appendInputPort(self, newPort):
+        self._getOwnLayout().inputs[newPort.name] = len(self.portsIn)
         self.portsIn.append(newPort)
         return newPort
 
-    def addOutputPort(self, name):
-        newPort = port.Port(name, self)
+    def _appendOutputPort(self, newPort):
+        self._getOwnLayout().outputs[newPort.name] = len(self.portsOut)
         self.portsOut.append(newPort)
         return newPort
 
     def isConnected(self):
         """
-        Checks all ports to see if any are connected, if a connection is found, then returns true
+        Checks if any of the ports are connected, using the edge counters kept up to date by the ports
         """
-        for port in self.portsIn + self.portsOut:
-            if port.isConnected():
-                return True
-        return False
+        return self.inDegree > 0 or self.outDegree > 0
 
     def evaluateConnection(self):
         for port in self.portsIn:
@@ -126,12 +266,68 @@ class Node(object):
                     port.value = port.edges[0].value
                 port.dirty = False
 
+    def __getstate__(self):
+        """
+        The graph is not pickled with the node, so a node(or an island of nodes) can be sent to another process
+        without taking the rest of the graph with it.
+        """
+        state = {}
+        for cls in type(self).__mro__:
+            for name in cls.__dict__.get("__slots__", ()):
+                if hasattr(self, name):
+                    state[name] = getattr(self, name)
+        state.update(getattr(self, "__dict__", {}))
+        state["graph"] = None
+        return state
+
+    def __setstate__(self, state):
+        for name, value in state.items():
+            setattr(self, name, value)
+
     def __repr__(self):
         return "{} > Input Ports: {}  OutputPorts:{}".format(self.type, len(self.portsIn), len(self.portsOut))
 
+def isArray(value):
+    """
+    Returns:
+        bool: True if the value is a NumPy array
+    """
+    return numpy is not None and isinstance(value, numpy.ndarray)
+
+
+def getNodeOrder(nodes, getSource):
+    """
+    Finds all the nodes the nodes given read from, following there inputs back to the nodes they read from
+
+    Args:
+        nodes ([]): of the nodes to start from
+        getSource (function): taking an input port, and returning the node it reads from, None to stop at the port
+
+    Returns:
+        []: of nodes, ordered so every node comes after the nodes it reads from
+    """
+    order = []
+    visited = set()
+    stack = [(node, False) for node in reversed(nodes)]
+    while stack:
+        node, expanded = stack.pop()
+        if expanded:
+            order.append(node)
+            continue
+        if node in visited:
+            continue
+        visited.add(node)
+        stack.append((node, True))
+        for inputPort in reversed(node.portsIn):
+            source = getSource(inputPort)
+            if source is not None:
+                stack.append((source, False))
+    return order
+
 # CONSTANT NODES
 
 class SumNode(Node):
+    __slots__ = ()
     def __init__(self):
         super(SumNode,self).__init__()
         self.type = self.__class__.__name__
@@ -154,11 +350,12 @@ class SumNode(Node):
 
             sum = 0
             for port in self.portsIn:
-                sum += port.value
+                sum = sum + port.value
             self.portsOut[0].value = sum
             self.dirty=False
 
 class NegateNode(Node):
+    __slots__ = ()
     def __init__(self):
         super(NegateNode, self).__init__()
         self.type = self.__class__.__name__
@@ -177,6 +374,7 @@ class NegateNode(Node):
             self.dirty=False
 
 class SubtractNode(Node):
+    __slots__ = ()
     def __init__(self):
         super(SubtractNode, self).__init__()
         self.type = self.__class__.__name__
@@ -199,12 +397,13 @@ class SubtractNode(Node):
             # all the dirty and updating of the ports to outside of this function
             value = self.portsIn[0].value
             for port in self.portsIn[1:]:
-                value -= port.value
+                value = value - port.value
 
             self.portsOut[0].value = value
             self.dirty = False
 
 class MultiplyNode(Node):
+    __slots__ = ()
     def __init__(self):
         super(MultiplyNode, self).__init__()
         self.type = self.__class__.__name__
@@ -224,13 +423,14 @@ class MultiplyNode(Node):
             self.evaluateConnection()
             val = self.portsIn[0].value
             for port in self.portsIn[1:]:
-                val *= port.value
+                val = val * port.value
 
             self.portsOut[0].value = val
             self.dirty = False
 
 #======== CONSTANTS ==========
 class ConstantNode(Node):
+    __slots__ = ()
     def __init__(self):
         super(ConstantNode, self).__init__()
         self.type = self.__class__.__name__
@@ -244,29 +444,47 @@ class ConstantNode(Node):
         self.addOutputPort(name="result")
 
     def evaluate(self):
-        self.portsOut[0].value = self.portsIn[0].value
+        # only evaluates the node if it is dirty, cleaning the node so that it will dirty the nodes it is
+        # connected to the next time its value is changed
+        if self.dirty:
+            self.evaluateConnection()
+            self.portsOut[0].value = self.portsIn[0].value
+            self.dirty = False
 
 class ArrayNode(ConstantNode):
+    __slots__ = ()
     def __init__(self):
         super(ConstantNode, self).__init__()
         self.type = self.__class__.__name__
 
+    def evaluate(self):
+        # outputs the value as a NumPy array, when NumPy is available
+        if self.dirty:
+            self.evaluateConnection()
+            value = self.portsIn[0].value
+            self.portsOut[0].value = value if numpy is None else numpy.asarray(value)
+            self.dirty = False
+
 class IntNode(ConstantNode):
+    __slots__ = ()
     def __init__(self):
         super(ConstantNode, self).__init__()
         self.type = self.__class__.__name__
 
 class FloatNode(ConstantNode):
+    __slots__ = ()
     def __init__(self):
         super(ConstantNode, self).__init__()
         self.type = self.__class__.__name__
 
 class MatrixNode(ConstantNode):
+    __slots__ = ()
     def __init__(self):
         super(ConstantNode, self).__init__()
         self.type = self.__class__.__name__
 
 class ScalarToVector(ConstantNode):
+    __slots__ = ()
     def __init__(self):
         super(ConstantNode, self).__init__()
         self.type = self.__class__.__name__
@@ -278,9 +496,18 @@ class ScalarToVector(ConstantNode):
         self.addInputPort(name="z")
 
     def evaluate(self):
-        self.portsOut[0].value = [self.portsIn[0].value, self.portsIn[1].value, self.portsIn[2].value]
+        if self.dirty:
+            self.evaluateConnection()
+            values = [self.portsIn[0].value, self.portsIn[1].value, self.portsIn[2].value]
+            if isArray(values[0]) or isArray(values[1]) or isArray(values[2]):
+                # a batch of N samples becomes a (N,3) array
+                self.portsOut[0].value = numpy.stack(numpy.broadcast_arrays(*values), axis=-1)
+            else:
+                self.portsOut[0].value = values
+            self.dirty = False
 
 class VectorToScalar(ConstantNode):
+    __slots__ = ()
     def __init__(self):
         super(ConstantNode, self).__init__()
         self.type = self.__class__.__name__
@@ -294,9 +521,16 @@ class VectorToScalar(ConstantNode):
         self.addOutputPort(name="z")
 
     def evaluate(self):
-        self.portsOut[0].value = self.portsIn[0].value[0]
-        self.portsOut[1].value = self.portsIn[0].value[1]
-        self.portsOut[2].value = self.portsIn[0].value[2]
+        if self.dirty:
+            self.evaluateConnection()
+            vector = self.portsIn[0].value
+            if isArray(vector):
+                # a (N,3) array of vectors, becomes three arrays of N samples
+                vector = (vector[..., 0], vector[..., 1], vector[..., 2])
+            self.portsOut[0].value = vector[0]
+            self.portsOut[1].value = vector[1]
+            self.portsOut[2].value = vector[2]
+            self.dirty = False
 
 
 """
@@ -319,32 +553,94 @@ Internal input and output Ports, that the contained nodes will connect to,
 to access data from outside the container, and send data outside of the container
 When a port is added to this node, an opposite port with the same name will be added 
 to the internal ports.
+
+Templates:
+A container can be turned into a ContainerTemplate, and instanced many times. The instances only have there own ports,
+and share the template's internal nodes, which are evaluated with the input values of each instance in turn.
 """
 #TODO: Add some checks to make sure when you remove a node, it is no longer connected to any node inside of the container
 class ContainerNode(Node):
-    internalNodes = []
+    __slots__ = ("internalNodes", "template")
+    detachable = False
 
     def __init__(self):
+        """
+        internalNodes: the nodes inside of this container
+        template: the ContainerTemplate this container is an instance of, None if it has its own internal nodes
+        """
+        self.internalNodes = []
+        self.template = None
         super(ContainerNode, self).__init__()
         self.type = self.__class__.__name__
 
     def evaluate(self):
         if self.dirty:
-            self.evaluateConnection()
+            if self.template is not None:
+                self.evaluateConnection()
+                self.template.evaluate(self)
+                return
+            self.pushInputs()
+            self.pullOutputs()
+
+    def pushInputs(self):
+        """
+        Pulls the values of the container's inputs, and copies them to the internal nodes connected to them
+        """
+        self.evaluateConnection()
 
-            # evaluate internal connections
-            for port in self.portsIn:
-                for edge in port.internalEdges:
-                    edge.value = port.value
-                    edge.dirty = False
-                    port.dirty = False
-
-            for port in self.portsOut:
-                port.internalEdges[0].node.evaluate()
-                port.value = port.internalEdges[0].value
+        # evaluate internal connections
+        for port in self.portsIn:
+            for edge in port.internalEdges:
+                edge.value = port.value
+                edge.dirty = False
                 port.dirty = False
 
-            self.dirty = False
+    def pullOutputs(self):
+        """
+        Evaluates the internal nodes connected to the container's outputs, and copies there values to the outputs.
+        When the internal nodes have already been evaluated(eg. by the graph, see Graph.evaluateNode), this only
+        copies the values.
+        """
+        for port in self.portsOut:
+            port.internalEdges[0].node.evaluate()
+            port.value = port.internalEdges[0].value
+            port.dirty = False
+
+        self.dirty = False
+
+    def materialize(self):
+        """
+        Gives an instance of a template its own copy of the template's internal nodes, so they can be edited without
+        changing the other instances. The instance keeps its ports, connections and values.
+
+        The internal nodes are created again from there class, ports and values, as when a saved graph is loaded.
+        """
+        template = self.template
+        if template is None:
+            return
+
+        # the ports of the template's nodes, to the ports of there copies
+        ports = dict(zip(template.container.portsIn + template.container.portsOut, self.portsIn + self.portsOut))
+        nodes = []
+        stack = [(self, template.container)]
+        while stack:
+            container, templateContainer = stack.pop()
+            for node in templateContainer.internalNodes:
+                copyNode = _copyNode(node, ports)
+                container.internalNodes.append(copyNode)
+                nodes.append(node)
+                if getattr(node, "internalNodes", None):
+                    stack.append((copyNode, node))
+
+        for templatePort in template.container.portsIn + template.container.portsOut:
+            for edgePort in templatePort.internalEdges:
+                ports[templatePort].addEdge(ports[edgePort])
+        for node in nodes:
+            for templatePort in node.portsIn + node.portsOut:
+                for edgePort in templatePort.edges + getattr(templatePort, "internalEdges", []):
+                    ports[templatePort].addEdge(ports[edgePort])
+        self.template = None
+        self.dirty = True
 
     def addNode(self, node):
         self.internalNodes.append(node)
@@ -358,11 +654,112 @@ class ContainerNode(Node):
         self.internalNodes.remove(node)
 
     def addInputPort(self, name, value=0.0):
-        newPort = port.ContainerPort(name, self, value)
-        self.portsIn.append(newPort)
-        return newPort
+        if name in self._portLayout.inputs:
+            return None
+        return self._appendInputPort(port.ContainerPort(name, self, value))
 
     def addOutputPort(self, name):
-        newPort = port.ContainerPort(name, self)
-        self.portsOut.append(newPort)
-        return newPort
\ No newline at end of file
+        if name in self._portLayout.outputs:
+            return None
+        return self._appendOutputPort(port.ContainerPort(name, self))
+
+
+def _copyNode(node, ports):
+    """
+    Creates a node of the same class, with the same name, ports and values, but no connections
+
+    Args:
+        node (Node): the node to copy
+        ports (dict): the ports of the node are added to it, with there copies
+    """
+    copyNode = type(node)()
+    copyNode.name = node.name
+    copyNode._dirty = node._dirty
+    if getattr(node, "template", None) is not None:
+        copyNode.template = node.template
+    for port in node.portsIn:
+        ports[port] = _copyPort(port, copyNode.getInputPort(port.name) or copyNode.addInputPort(port.name))
+    for port in node.portsOut:
+        ports[port] = _copyPort(port, copyNode.getOutputPort(port.name) or copyNode.addOutputPort(port.name))
+    return copyNode
+
+
+def _copyPort(port, copyPort):
+    copyPort._value = port._value
+    copyPort.defaultValue = port.defaultValue
+    copyPort.dirty = port.dirty
+    return copyPort
+
+
+class ContainerTemplate(object):
+    """
+    An internal network shared by many container instances. The template takes over a container, which must not be
+    edited afterwards, and creates instances of it with the same ports. Creating an instance only creates its ports,
+    so the memory used scales with the instances x ports, not the instances x internal nodes.
+
+        template = ContainerTemplate(container)
+        instance = graph.createNode(template)
+
+    The internal nodes are evaluated for one instance at a time, with the instance's input values, and the results
+    are copied to the instance's outputs.
+    """
+    def __init__(self, container):
+        """
+        container: the container holding the internal nodes
+        lock: stops instances evaluating on different threads from sharing the internal nodes at the same time
+        layouts: the port layout shared by the instances
+
+        Args:
+            container (ContainerNode): container to create the template from
+        """
+        self.container = container
+        self.lock = threading.Lock()
+        self.layouts = {}
+
+    def __call__(self):
+        # templates can be passed to Graph.createNode like a node class
+        return self.instantiate()
+
+    def __getstate__(self):
+        return self.container
+
+    def __setstate__(self, container):
+        self.container = container
+        self.lock = threading.Lock()
+        self.layouts = {}
+
+    def instantiate(self):
+        """
+        Returns:
+            ContainerNode: a new instance of the template, with ports matching the template's container
+        """
+        node = ContainerNode()
+        node.template = self
+        for templatePort in self.container.portsIn:
+            node.addInputPort(templatePort.name, templatePort.defaultValue)
+        for templatePort in self.container.portsOut:
+            node.addOutputPort(templatePort.name)
+        # the instances share a single layout
+        node._portLayout = shareLayout(self.layouts, None, node._portLayout)
+        return node
+
+    def evaluate(self, instance, evaluateContainer=None):
+        """
+        Evaluates the internal nodes with the input values of the instance, and copies the results to the outputs of
+        the instance. The instance's inputs must already have been pulled.
+
+        Args:
+            instance (ContainerNode): instance of this template
+            evaluateContainer (function): evaluates the template's container, defaults to ContainerNode.evaluate
+        """
+        with self.lock:
+            for instancePort, templatePort in zip(instance.portsIn, self.container.portsIn):
+                templatePort.value = instancePort.value
+            if evaluateContainer is None:
+                self.container.evaluate()
+            else:
+                evaluateContainer(self.container)
+            for instancePort, templatePort in zip(instance.portsOut, self.container.portsOut):
+                instancePort.value = templatePort.value
+                instancePort.dirty = False
+        instance.dirty = False
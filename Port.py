@@ -1,4 +1,17 @@
+import contextvars
+
+# the EvaluationContext(see Context.py) active in the current thread or task. Port values and node dirty flags are read
+# from and written to the active context, instead of the ports and nodes. activeContexts counts the contexts active
+# in any thread, so the values are only looked up in a context when one is active somewhere
+activeContext = contextvars.ContextVar("activeContext", default=None)
+activeContexts = 0
+# amount of graphs where reading an output port of a dirty node pulls it first, see Graph.setLazy
+lazyGraphs = 0
+
 class Port(object):
+    # ports use slots instead of a __dict__, as large graphs have millions of them
+    __slots__ = ("name", "node", "_value", "defaultValue", "edges", "dirty")
+
     def __init__(self, name="port", node=None, defaultValue=None):
         """
         :param name:
@@ -18,10 +31,23 @@ class Port(object):
 
     @property
     def value(self):
+        if activeContexts:
+            context = activeContext.get()
+            if context is not None:
+                return context.getValue(self)
+        if lazyGraphs:
+            node = self.node
+            if node._dirty and node.graph is not None and node.graph.lazy and self.isSource():
+                return node.graph.pull(self)
         return self._value
 
     @value.setter
     def value(self, val):
+        if activeContexts:
+            context = activeContext.get()
+            if context is not None:
+                context.setPortValue(self, val)
+                return
         self._value = val
         self.setDirty()
 
@@ -31,13 +57,57 @@ class Port(object):
         return False
 
     def isSource(self):
-        pass
+        """
+        Returns:
+            bool: True if this is an output port of its node
+        """
+        return self.node.getOutputPort(self.name) is self
 
     def isDestination(self):
-        pass
+        """
+        Returns:
+            bool: True if this is an input port of its node
+        """
+        return self.node.getInputPort(self.name) is self
 
     def addEdge(self, port):
         self.edges.append(port)
+        self.countEdge(1)
+
+    def removeEdge(self, port):
+        self.edges.remove(port)
+        self.countEdge(-1)
+
+    def countEdge(self, amount):
+        """
+        Keeps the in/out degree counters of the node up to date, as edges are added and removed from this port
+
+        Args:
+            amount (int): 1 when an edge was added, -1 when an edge was removed
+        """
+        if self.isSource():
+            self.node.outDegree += amount
+        else:
+            self.node.inDegree += amount
+
+    def structureChanged(self, port, connected):
+        """
+        Informs the graphs that own this port, and the port it was connected to/disconnected from,
+        that the structure of the graph has changed.
+
+        Args:
+            port (Port): The other port of the edge that was added or removed
+            connected (bool): True if the edge was added, False if it was removed
+        """
+        graphs = []
+        for node in (self.node, port.node):
+            if node is not None and node.graph is not None and node.graph not in graphs:
+                graphs.append(node.graph)
+        for graph in graphs:
+            if connected:
+                graph.edgeAdded(self, port)
+            else:
+                graph.edgeRemoved(self, port)
 
     def setDirty(self):
         """
@@ -61,6 +131,7 @@ class Port(object):
 
         self.addEdge(destPort)
         destPort.addEdge(self)
+        self.structureChanged(destPort, True)
         # as the port has been connected, the connected node has to be updated
         destPort.setDirty()
         self.setDirty()
@@ -75,20 +146,23 @@ class Port(object):
         Args:
             discPort (Port): The port we will be disconnecting from
         """
-
         if discPort is None:
-            for port in self.edges:
-                port.disconnect(self)
-                port.setDirty()
-            self.edges = []
+            ports = list(self.edges)
+        elif discPort in self.edges:
+            ports = [discPort]
         else:
-            for port in self.edges:
-                if port == discPort:
-                    self.edges.remove(port)
-                    port.disconnect(self)
-                    port.setDirty()
+            return
+
+        for port in ports:
+            self.removeEdge(port)
+            port.removeEdge(self)
+            self.structureChanged(port, False)
+            port.setDirty()
+            self.setDirty()
 
 class ContainerPort(Port):
+    __slots__ = ("internalEdges",)
+
     def __init__(self, name="port", node=None, defaultValue=None):
         super(ContainerPort, self).__init__(name, node, defaultValue)
         self.internalEdges = []
@@ -99,6 +173,14 @@ class ContainerPort(Port):
             #self.value = port.value
         else:
             self.edges.append(port)
+            self.countEdge(1)
+
+    def removeEdge(self, port):
+        if port in self.internalEdges:
+            self.internalEdges.remove(port)
+        else:
+            self.edges.remove(port)
+            self.countEdge(-1)
 
     def isConnected(self):
         if len(self.edges):
@@ -120,6 +202,7 @@ class ContainerPort(Port):
 
         self.addEdge(destPort)
         destPort.addEdge(self)
+        self.structureChanged(destPort, True)
         # as the port has been connected, the connected node has to be updated
         destPort.setDirty()
 
@@ -127,22 +210,16 @@ class ContainerPort(Port):
 
     def disconnect(self, discPort=None):
         """
-        Disconnect this port from another port. If no port is given, then disconnects all connection to this port
-        As each edge(connection) has two ports and each port stores the port it is connected to, we have to remove the each port
-        from storing one another
+        Disconnect this port from another port, the port can be on a node inside the container, or outside of it.
+        If no port is given, then disconnects all connection outside of the container
 
         Args:
             discPort (Port): The port we will be disconnecting from
         """
-
-        if discPort is None:
-            for port in self.edges:
-                port.disconnect(self)
-                port.setDirty()
-            self.edges = []
+        if discPort is not None and discPort in self.internalEdges:
+            self.removeEdge(discPort)
+            discPort.removeEdge(self)
+            self.structureChanged(discPort, False)
+            discPort.setDirty()
         else:
-            for port in self.edges:
-                if port == discPort:
-                    self.edges.remove(port)
-                    port.disconnect(self)
-                    port.setDirty()
+            super(ContainerPort, self).disconnect(discPort)
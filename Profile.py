@@ -0,0 +1,222 @@
+"""
+
+Profile
+- Records how the nodes of a graph are evaluated: the number of times each node was evaluated, the time spent in it
+  (cumulative, and self time without the nodes evaluated inside of it, eg. the internal nodes of a container), how
+  many evaluations were restored from a memo cache, and how many times it was skipped, as it was clean or cut off.
+- Every evaluation and Graph.evaluate call is recorded as an event, giving the evaluation order, which can be
+  exported as Chrome trace events(chrome://tracing, or https://ui.perfetto.dev).
+- A graph only calls the profiler while one is set on it(graph.profiler, or with graph.profile()), when there is no
+  profiler the cost is checking for one.
+"""
+import json
+import os
+import threading
+import time
+
+# why a node was skipped
+SKIP_CLEAN = "clean"
+SKIP_CUTOFF = "cutoff"
+
+
+class NodeStats(object):
+    __slots__ = ("node", "label", "calls", "totalTime", "selfTime", "cacheHits", "cleanSkips", "cutoffSkips")
+
+    def __init__(self, node, label):
+        """
+        node: the node the stats are for
+        label: name of the node in the table and trace
+        calls: amount of times the node was evaluated
+        totalTime: seconds spent evaluating the node, including the nodes evaluated inside of it
+        selfTime: seconds spent evaluating the node, without the nodes evaluated inside of it
+        cacheHits: amount of evaluations restored from a memo cache
+        cleanSkips: amount of times the node was scheduled, but was not evaluated as it was clean
+        cutoffSkips: amount of times the node was cleaned without being evaluated, by early cutoff
+        """
+        self.node = node
+        self.label = label
+        self.calls = 0
+        self.totalTime = 0.0
+        self.selfTime = 0.0
+        self.cacheHits = 0
+        self.cleanSkips = 0
+        self.cutoffSkips = 0
+
+    def toDict(self):
+        return {
+            "node": self.label,
+            "type": self.node.type,
+            "calls": self.calls,
+            "totalTime": self.totalTime,
+            "selfTime": self.selfTime,
+            "cacheHits": self.cacheHits,
+            "cleanSkips": self.cleanSkips,
+            "cutoffSkips": self.cutoffSkips,
+        }
+
+
+class Profiler(object):
+    def __init__(self, trace=True):
+        """
+        trace: True to record an event for every evaluation, for the evaluation order and the Chrome trace.
+            The stats are recorded either way
+        stats: NodeStats of each node, in the order the nodes were first seen
+        events: list of (node or name, start, duration, thread id)
+        _start: time the profiler was created, events are relative to it
+        _local: the stack of nested evaluations, for each thread
+        _lock: evaluations can be recorded from many threads
+
+        Args:
+            trace (bool): record an event for every evaluation
+        """
+        self.trace = trace
+        self.stats = {}
+        self.events = []
+        self._start = time.perf_counter()
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def _getStats(self, node):
+        stats = self.stats.get(node)
+        if stats is None:
+            label = "{}#{}".format(node.name or node.type, len(self.stats))
+            stats = self.stats[node] = NodeStats(node, label)
+        return stats
+
+    def evaluate(self, node, function):
+        """
+        Calls function(node), recording the time spent in it
+
+        Args:
+            node (mNode.Node): the node being evaluated
+            function (function): evaluates the node, returning True if the node was restored from a memo cache
+
+        Returns:
+            the result of the function
+        """
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        stack.append(0.0)
+        result = False
+        start = time.perf_counter()
+        try:
+            result = function(node)
+        finally:
+            duration = time.perf_counter() - start
+            # the time of the nested evaluations, is taken off the self time of this one
+            childTime = stack.pop()
+            if stack:
+                stack[-1] += duration
+            with self._lock:
+                stats = self._getStats(node)
+                stats.calls += 1
+                stats.totalTime += duration
+                stats.selfTime += duration - childTime
+                if result:
+                    stats.cacheHits += 1
+                if self.trace:
+                    self.events.append((node, start - self._start, duration, threading.get_ident()))
+        return result
+
+    def skip(self, node, reason):
+        """
+        Records that a scheduled node was not evaluated
+
+        Args:
+            node (mNode.Node): the node that was skipped
+            reason (str): SKIP_CLEAN or SKIP_CUTOFF
+        """
+        with self._lock:
+            stats = self._getStats(node)
+            if reason == SKIP_CUTOFF:
+                stats.cutoffSkips += 1
+            else:
+                stats.cleanSkips += 1
+
+    def addSpan(self, name, start, duration):
+        """
+        Records an event that is not a node evaluation, eg. Graph.evaluate
+
+        Args:
+            name (str): name of the event
+            start (float): time.perf_counter() when the event started
+            duration (float): seconds the event took
+        """
+        if self.trace:
+            with self._lock:
+                self.events.append((name, start - self._start, duration, threading.get_ident()))
+
+    def clear(self):
+        """
+        Removes all the recorded stats and events
+        """
+        with self._lock:
+            self.stats = {}
+            self.events = []
+
+    def getEvaluationOrder(self):
+        """
+        Returns:
+            []: of the nodes, in the order they were evaluated. Only recorded when trace is True
+        """
+        events = sorted(self.events, key=lambda event: event[1])
+        return [event[0] for event in events if not isinstance(event[0], str)]
+
+    def getRows(self, sortBy="selfTime"):
+        """
+        Args:
+            sortBy (str): key to sort the rows by, largest first
+
+        Returns:
+            []: of dicts, the stats of each node
+        """
+        rows = [stats.toDict() for stats in self.stats.values()]
+        rows.sort(key=lambda row: row[sortBy], reverse=True)
+        return rows
+
+    def getTable(self, sortBy="selfTime", limit=None):
+        """
+        Returns the stats of each node as a text table, with the times in milliseconds
+
+        Args:
+            sortBy (str): key to sort the rows by, largest first
+            limit (int): only include this many rows
+
+        Returns:
+            str: the table
+        """
+        rows = self.getRows(sortBy)[:limit]
+        lines = ["{:<24} {:<16} {:>8} {:>12} {:>12} {:>10} {:>10} {:>10}".format(
+            "Node", "Type", "Calls", "Total(ms)", "Self(ms)", "CacheHits", "Clean", "Cutoff")]
+        for row in rows:
+            lines.append("{:<24} {:<16} {:>8} {:>12.3f} {:>12.3f} {:>10} {:>10} {:>10}".format(
+                row["node"], row["type"], row["calls"], row["totalTime"] * 1000.0, row["selfTime"] * 1000.0,
+                row["cacheHits"], row["cleanSkips"], row["cutoffSkips"]))
+        return "\n".join(lines)
+
+    def getChromeTrace(self):
+        """
+        Returns:
+            dict: of the events in the Chrome trace event format, with the times in microseconds
+        """
+        pid = os.getpid()
+        traceEvents = []
+        for item, start, duration, threadId in self.events:
+            if isinstance(item, str):
+                event = {"name": item, "cat": "graph", "args": {}}
+            else:
+                event = {"name": self._getStats(item).label, "cat": "node", "args": {"type": item.type}}
+            event.update({"ph": "X", "ts": start * 1e6, "dur": duration * 1e6, "pid": pid, "tid": threadId})
+            traceEvents.append(event)
+        return {"traceEvents": traceEvents, "displayTimeUnit": "ms"}
+
+    def saveChromeTrace(self, path):
+        """
+        Saves the events as a Chrome trace event JSON file
+
+        Args:
+            path (str): path of the file to write
+        """
+        with open(path, "w") as fileHandle:
+            json.dump(self.getChromeTrace(), fileHandle)
@@ -0,0 +1,697 @@
+"""
+
+Serialize
+- Saves a graph to a compact binary file, and loads it back.
+- The file is made of named sections, each one a column of values for every node, port or edge. Columns are read in
+  place from the file data(a memoryview cast to the column type), so nothing is parsed up front.
+- Nodes are stored by the module and name of there class, with the nodes inside of containers stored after the
+  container, pointing back to it as there parent.
+- Port values that are floats are stored in a float column, any other value is pickled. Values are only decoded when
+  there port is created.
+- The nodes and edges of each island are indexed, so a single island can be created from the file without reading
+  the rest of it. A file can be memory mapped with mapFile, for LazyGraph.
+- Graphs can also be written as JSON lines(NDJSON), one record per node or edge, for storage that can be read and
+  diffed. The records are written and read one at a time through generators, so the whole document is never held in
+  memory.
+
+File layout(little endian, sections are aligned to 8 bytes):
+    header:         MAGIC, version(uint32), section count(uint32)
+    section table:  name(8 bytes), offset(uint64), length(uint64) for each section
+    sections:       the data of each section
+"""
+import array
+import base64
+import importlib
+import itertools
+import json
+import mmap
+import pickle
+import struct
+import sys
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+MAGIC = b"PYGRAPH\0"
+VERSION = 1
+
+HEADER = struct.Struct("<8sII")
+SECTION = struct.Struct("<8sQQ")
+ALIGNMENT = 8
+
+# value kinds
+VALUE_NONE = 0
+VALUE_FLOAT = 1
+VALUE_PICKLE = 2
+
+
+def save(graph, path):
+    """
+    Saves the graph to a file
+
+    Args:
+        graph (Graph): the graph to save
+        path (str): path of the file to write
+    """
+    with open(path, "wb") as fileHandle:
+        fileHandle.write(dumps(graph))
+
+
+def dumps(graph, nodes=None):
+    """
+    Args:
+        graph (Graph): the graph to save
+        nodes ([]): only save these top level nodes, and the edges between them, eg. an island of the graph.
+            Defaults to all the nodes of the graph
+
+    Returns:
+        bytes: the graph in the binary format written by save
+    """
+    strings = StringTable()
+    nodeModule = array.array("i")
+    nodeClass = array.array("i")
+    nodeName = array.array("i")
+    nodeParent = array.array("i")
+    nodeFirstPort = array.array("i")
+    nodeInputs = array.array("i")
+    nodeOutputs = array.array("i")
+    portName = array.array("i")
+    portNode = []
+    values = []
+    defaults = []
+
+    topNodes = graph.nodes if nodes is None else nodes
+    nodes = []
+    for index, node, parent in _iterNodes(topNodes):
+        nodes.append(node)
+        nodeModule.append(strings.add(type(node).__module__))
+        nodeClass.append(strings.add(type(node).__name__))
+        nodeName.append(strings.add(node.name))
+        nodeParent.append(parent)
+        nodeFirstPort.append(len(portNode))
+        nodeInputs.append(len(node.portsIn))
+        nodeOutputs.append(len(node.portsOut))
+        for port in node.portsIn + node.portsOut:
+            portName.append(strings.add(port.name))
+            portNode.append(index)
+            values.append(port._value)
+            defaults.append(port.defaultValue)
+
+    portIndex = {}
+    for node in nodes:
+        for port in node.portsIn + node.portsOut:
+            portIndex[port] = len(portIndex)
+
+    # every edge is stored once, from the port with the lowest index
+    edges = []
+    for port, index in portIndex.items():
+        for edgePort in port.edges + getattr(port, "internalEdges", []):
+            edgeIndex = portIndex.get(edgePort)
+            if edgeIndex is not None and index < edgeIndex:
+                edges.append((index, edgeIndex))
+
+    # islands, the nodes inside a container are in the same island as the container
+    islandParents = list(range(len(nodes)))
+    for index, parent in enumerate(nodeParent):
+        if parent >= 0:
+            _unionIslands(islandParents, parent, index)
+    for port, edgePort in edges:
+        _unionIslands(islandParents, portNode[port], portNode[edgePort])
+
+    islandIndex = {}
+    nodeIsland = array.array("i")
+    for index in range(len(nodes)):
+        nodeIsland.append(islandIndex.setdefault(_findIsland(islandParents, index), len(islandIndex)))
+
+    islandNodes = [[] for i in range(len(islandIndex))]
+    for index, island in enumerate(nodeIsland):
+        islandNodes[island].append(index)
+    islandEdges = [[] for i in range(len(islandIndex))]
+    for port, edgePort in edges:
+        islandEdges[nodeIsland[portNode[port]]].append((port, edgePort))
+
+    edgeColumn = array.array("i", itertools.chain.from_iterable(itertools.chain.from_iterable(islandEdges)))
+    sections = strings.toSections() + [
+        (b"NMODULE", _toBytes(nodeModule)),
+        (b"NCLASS", _toBytes(nodeClass)),
+        (b"NNAME", _toBytes(nodeName)),
+        (b"NPARENT", _toBytes(nodeParent)),
+        (b"NFIRST", _toBytes(nodeFirstPort)),
+        (b"NINPUTS", _toBytes(nodeInputs)),
+        (b"NOUTPUTS", _toBytes(nodeOutputs)),
+        (b"NISLAND", _toBytes(nodeIsland)),
+        (b"PNAME", _toBytes(portName)),
+        # the edges are ordered by island, ISTART/IEDGES index into INODES/EDGES for each island
+        (b"EDGES", _toBytes(edgeColumn)),
+        (b"INODES", _toBytes(array.array("i", itertools.chain.from_iterable(islandNodes)))),
+        (b"ISTART", _toBytes(_offsets(islandNodes))),
+        (b"IEDGES", _toBytes(_offsets(islandEdges))),
+    ]
+    sections += _encodeValues(b"V", values)
+    sections += _encodeValues(b"D", defaults)
+
+    chunks = [HEADER.pack(MAGIC, VERSION, len(sections))]
+    offset = HEADER.size + SECTION.size * len(sections)
+    for name, data in sections:
+        chunks.append(SECTION.pack(name, offset, len(data)))
+        offset += _align(len(data))
+    for name, data in sections:
+        chunks.append(data)
+        chunks.append(b"\0" * (_align(len(data)) - len(data)))
+    return b"".join(chunks)
+
+
+def load(path, graphClass):
+    """
+    Loads a graph from a file. The nodes and edges are added in bulk, without going through Graph.createNode
+    and Port.connect, and the graph's indexes are built once at the end.
+
+    Args:
+        path (str): path of the file to read
+        graphClass (type): class of the graph to create
+
+    Returns:
+        Graph: the loaded graph
+    """
+    with open(path, "rb") as fileHandle:
+        return loads(fileHandle.read(), graphClass)
+
+
+def loads(data, graphClass):
+    """
+    Creates a graph from the bytes returned by dumps, see load
+
+    Args:
+        data (bytes): the graph in the binary format
+        graphClass (type): class of the graph to create
+
+    Returns:
+        Graph: the loaded graph
+    """
+    graphFile = GraphFile(data)
+    graph = graphClass()
+    nodes = [None] * len(graphFile)
+    ports = [None] * graphFile.portCount
+    for index in range(len(graphFile)):
+        graphFile.createNode(index, graph, nodes, ports)
+    graphFile.connectPorts(0, graphFile.edgeCount, ports)
+    graph.rebuildIndex()
+    return graph
+
+
+def mapFile(path):
+    """
+    Memory maps a saved graph, the pages of the file are only read when a column is accessed, and are shared with
+    any other process mapping the same file through the OS page cache
+
+    Args:
+        path (str): path of the file to map
+
+    Returns:
+        GraphFile: reading from the mapped file
+    """
+    with open(path, "rb") as fileHandle:
+        data = mmap.mmap(fileHandle.fileno(), 0, access=mmap.ACCESS_READ)
+    return GraphFile(data)
+
+
+class GraphFile(object):
+    """
+    Reads the columns of a saved graph, and creates the nodes, ports and edges from them on request
+    """
+    def __init__(self, data):
+        """
+        Args:
+            data (bytes): the file contents, any object supporting the buffer protocol(eg. mmap)
+        """
+        sections = readSections(data)
+        self.strings = StringColumn(sections)
+        self.nodeModule = _column("i", sections[b"NMODULE"])
+        self.nodeClass = _column("i", sections[b"NCLASS"])
+        self.nodeName = _column("i", sections[b"NNAME"])
+        self.nodeParent = _column("i", sections[b"NPARENT"])
+        self.nodeFirstPort = _column("i", sections[b"NFIRST"])
+        self.nodeInputs = _column("i", sections[b"NINPUTS"])
+        self.nodeOutputs = _column("i", sections[b"NOUTPUTS"])
+        self.nodeIsland = _column("i", sections[b"NISLAND"])
+        self.portName = _column("i", sections[b"PNAME"])
+        self.edges = _column("i", sections[b"EDGES"])
+        self.islandNodes = _column("i", sections[b"INODES"])
+        self.islandStart = _column("i", sections[b"ISTART"])
+        self.islandEdges = _column("i", sections[b"IEDGES"])
+        self.values = ValueColumn(sections, b"V")
+        self.defaults = ValueColumn(sections, b"D")
+        self.portCount = len(self.portName)
+        self.edgeCount = len(self.edges) // 2
+        self.islandCount = len(self.islandStart) - 1
+        self._classes = {}
+
+    def __len__(self):
+        return len(self.nodeClass)
+
+    def getIslandNodes(self, island):
+        """
+        Returns:
+            []: of the node indices in the island, containers come before the nodes inside of them
+        """
+        return self.islandNodes[self.islandStart[island]:self.islandStart[island + 1]]
+
+    def getIslandEdges(self, island):
+        """
+        Returns:
+            (int, int): range of the edges of the island, to pass to connectPorts
+        """
+        return self.islandEdges[island], self.islandEdges[island + 1]
+
+    def createNode(self, index, graph, nodes, ports):
+        """
+        Creates a node with its ports and values. Top level nodes are added to the graph, and nodes inside a
+        container are added to the container, which has to have been created first.
+
+        Args:
+            index (int): index of the node in the file
+            graph (Graph): graph the node is added to
+            nodes (list/dict): of the created nodes, by index. The new node is added to it
+            ports (list/dict): of the created ports, by index. The new ports are added to it
+
+        Returns:
+            Node: the created node
+        """
+        key = (self.nodeModule[index], self.nodeClass[index])
+        cls = self._classes.get(key)
+        if cls is None:
+            cls = self._classes[key] = getNodeClass(self.strings[key[0]], self.strings[key[1]])
+
+        node = cls()
+        node.name = self.strings[self.nodeName[index]]
+        nodes[index] = node
+        parent = self.nodeParent[index]
+        if parent < 0:
+            node.graph = graph
+            graph.nodes.append(node)
+        else:
+            nodes[parent].addNode(node)
+
+        portIndex = self.nodeFirstPort[index]
+        for isOutput, count in ((False, self.nodeInputs[index]), (True, self.nodeOutputs[index])):
+            for i in range(count):
+                port = _getPort(node, self.strings[self.portName[portIndex]], isOutput)
+                port._value = self.values[portIndex]
+                port.defaultValue = self.defaults[portIndex]
+                ports[portIndex] = port
+                portIndex += 1
+        return node
+
+    def connectPorts(self, start, end, ports):
+        """
+        Adds the edges between the created ports, without going through Port.connect
+
+        Args:
+            start (int): first edge to add
+            end (int): edge to stop at
+            ports (list/dict): of the created ports, by index
+        """
+        edges = self.edges
+        for edgeIndex in range(start, end):
+            port = ports[edges[2 * edgeIndex]]
+            edgePort = ports[edges[2 * edgeIndex + 1]]
+            port.addEdge(edgePort)
+            edgePort.addEdge(port)
+            # values may have been saved before they were pulled, so connected inputs pull again
+            if port.isDestination():
+                port.dirty = True
+            if edgePort.isDestination():
+                edgePort.dirty = True
+
+
+def iterJson(graph):
+    """
+    Generates the JSON lines of the graph, a header, then a record for each node, then a record for each edge.
+    Nodes are numbered in the order they are written, and edges refer to the ports by node number, direction and name:
+
+        {"format": "pyGraph", "version": 1}
+        {"node": 0, "module": "pyGraph.Node", "class": "SumNode", "name": "node", "parent": null,
+         "inputs": [{"name": "value1", "value": 2.0, "default": 0.0}, ...], "outputs": [...]}
+        {"edge": [[0, "out", "result"], [1, "in", "value"]]}
+
+    Args:
+        graph (Graph): the graph to write
+
+    Returns:
+        generator: of JSON strings, one per line(without the line ending)
+    """
+    yield json.dumps({"format": "pyGraph", "version": VERSION})
+
+    nodeIndex = {}
+    for index, node, parent in _iterNodes(graph.nodes):
+        nodeIndex[node] = index
+        yield json.dumps({
+            "node": index,
+            "module": type(node).__module__,
+            "class": type(node).__name__,
+            "name": node.name,
+            "parent": None if parent < 0 else parent,
+            "inputs": [_portRecord(port) for port in node.portsIn],
+            "outputs": [_portRecord(port) for port in node.portsOut],
+        })
+
+    # every edge is written once, from the end that sorts first
+    for index, node, parent in _iterNodes(graph.nodes):
+        for direction, ports in (("in", node.portsIn), ("out", node.portsOut)):
+            for port in ports:
+                key = [index, direction, port.name]
+                for edgePort in port.edges + getattr(port, "internalEdges", []):
+                    edgeIndex = nodeIndex.get(edgePort.node)
+                    if edgeIndex is None:
+                        continue
+                    edgeKey = [edgeIndex, "out" if edgePort.isSource() else "in", edgePort.name]
+                    if key < edgeKey:
+                        yield json.dumps({"edge": [key, edgeKey]})
+
+
+def readJson(lines, graphClass):
+    """
+    Creates a graph from the JSON lines written by iterJson. Each line is read and applied before the next one, and
+    the graph's indexes are built once at the end.
+
+    Args:
+        lines (iterable): of JSON strings, eg. an open file
+        graphClass (type): class of the graph to create
+
+    Returns:
+        Graph: the read graph
+    """
+    graph = graphClass()
+    nodes = []
+    classes = {}
+    for line in lines:
+        if not line.strip():
+            continue
+        record = json.loads(line)
+        if "node" in record:
+            key = (record["module"], record["class"])
+            cls = classes.get(key)
+            if cls is None:
+                cls = classes[key] = getNodeClass(*key)
+
+            node = cls()
+            node.name = record["name"]
+            nodes.append(node)
+            if record["parent"] is None:
+                node.graph = graph
+                graph.nodes.append(node)
+            else:
+                nodes[record["parent"]].addNode(node)
+
+            for isOutput, ports in ((False, record["inputs"]), (True, record["outputs"])):
+                for portRecord in ports:
+                    port = _getPort(node, portRecord["name"], isOutput)
+                    port._value = _decodeJsonValue(portRecord["value"])
+                    port.defaultValue = _decodeJsonValue(portRecord["default"])
+        elif "edge" in record:
+            port, edgePort = [
+                _getPort(nodes[index], name, direction == "out") for index, direction, name in record["edge"]]
+            port.addEdge(edgePort)
+            edgePort.addEdge(port)
+            # values may have been saved before they were pulled, so connected inputs pull again
+            for endPort in (port, edgePort):
+                if endPort.isDestination():
+                    endPort.dirty = True
+        elif record.get("format") != "pyGraph":
+            raise ValueError("Not a pyGraph JSON record: {}".format(line))
+        elif record["version"] > VERSION:
+            raise ValueError("pyGraph JSON version {} is not supported".format(record["version"]))
+
+    graph.rebuildIndex()
+    return graph
+
+
+def _portRecord(port):
+    return {"name": port.name, "value": _encodeJsonValue(port._value), "default": _encodeJsonValue(port.defaultValue)}
+
+
+def _encodeJsonValue(value):
+    """
+    Converts a port value to something JSON can store. Lists, numbers, strings, booleans and None are stored as they
+    are, other values are stored as a dict tagged with there type: tuples and NumPy arrays as lists, dicts as a list
+    of items, and anything else is pickled.
+    """
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    if isinstance(value, list):
+        return [_encodeJsonValue(item) for item in value]
+    if isinstance(value, tuple):
+        return {"tuple": [_encodeJsonValue(item) for item in value]}
+    if isinstance(value, dict):
+        return {"dict": [[_encodeJsonValue(key), _encodeJsonValue(item)] for key, item in value.items()]}
+    if numpy is not None and isinstance(value, (numpy.ndarray, numpy.generic)):
+        return {"array": value.tolist(), "dtype": str(value.dtype)}
+    return {"pickle": base64.b64encode(pickle.dumps(value, pickle.HIGHEST_PROTOCOL)).decode("ascii")}
+
+
+def _decodeJsonValue(value):
+    """
+    Converts a value stored by _encodeJsonValue back
+    """
+    if isinstance(value, list):
+        return [_decodeJsonValue(item) for item in value]
+    if not isinstance(value, dict):
+        return value
+    if "tuple" in value:
+        return tuple(_decodeJsonValue(item) for item in value["tuple"])
+    if "dict" in value:
+        return dict((_decodeJsonValue(key), _decodeJsonValue(item)) for key, item in value["dict"])
+    if "array" in value:
+        if numpy is None:
+            raise ImportError("NumPy is required to read array values")
+        return numpy.asarray(value["array"], dtype=value["dtype"])
+    return pickle.loads(base64.b64decode(value["pickle"]))
+
+
+def _iterNodes(nodes):
+    """
+    Generates all the nodes, with the contents of a container straight after the container
+
+    Args:
+        nodes ([]): the top level nodes, eg. graph.nodes
+
+    Returns:
+        generator: of (index, node, index of the container the node is in or -1)
+    """
+    index = 0
+    stack = [(node, -1) for node in reversed(nodes)]
+    while stack:
+        node, parent = stack.pop()
+        if getattr(node, "template", None) is not None:
+            raise ValueError("Instances of a container template can not be saved, materialize() them first")
+        yield index, node, parent
+        for internalNode in reversed(getattr(node, "internalNodes", [])):
+            stack.append((internalNode, index))
+        index += 1
+
+
+def getNodeClass(moduleName, className):
+    """
+    Returns:
+        type: the node class, importing its module if needed
+    """
+    module = sys.modules.get(moduleName)
+    if module is None:
+        module = importlib.import_module(moduleName)
+    return getattr(module, className)
+
+
+def _getPort(node, name, isOutput):
+    """
+    Returns the port of the node with this name, creating it if the node class does not create it
+    """
+    if isOutput:
+        return node.getOutputPort(name) or node.addOutputPort(name)
+    return node.getInputPort(name) or node.addInputPort(name)
+
+
+def readSections(data):
+    """
+    Reads the section table of a file
+
+    Args:
+        data (bytes): the file contents, any object supporting the buffer protocol(eg. mmap)
+
+    Returns:
+        dict: of section name to a memoryview of the section data
+    """
+    magic, version, count = HEADER.unpack_from(data, 0)
+    if magic != MAGIC:
+        raise ValueError("Not a pyGraph file")
+    if version > VERSION:
+        raise ValueError("pyGraph file version {} is not supported".format(version))
+
+    view = memoryview(data)
+    sections = {}
+    for index in range(count):
+        name, offset, length = SECTION.unpack_from(data, HEADER.size + SECTION.size * index)
+        sections[name.rstrip(b"\0")] = view[offset:offset + length]
+    return sections
+
+
+class StringTable(object):
+    """
+    List of unique strings, referenced by index
+    """
+    def __init__(self):
+        self.strings = []
+        self._index = {}
+
+    def add(self, string):
+        """
+        Returns:
+            int: the index of the string
+        """
+        index = self._index.get(string)
+        if index is None:
+            index = self._index[string] = len(self.strings)
+            self.strings.append(string)
+        return index
+
+    def toSections(self):
+        """
+        Returns:
+            []: of (section name, data), the utf-8 strings one after another, and the offset of each string
+        """
+        encoded = [string.encode("utf-8") for string in self.strings]
+        return [(b"SOFFSET", _toBytes(_offsets(encoded, "I"))), (b"STRINGS", b"".join(encoded))]
+
+
+class StringColumn(object):
+    """
+    Reads the strings stored by StringTable, decoding each string the first time it is accessed
+    """
+    def __init__(self, sections):
+        self.offsets = _column("I", sections[b"SOFFSET"])
+        self.data = sections[b"STRINGS"]
+        self._strings = {}
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index):
+        string = self._strings.get(index)
+        if string is None:
+            string = self._strings[index] = bytes(self.data[self.offsets[index]:self.offsets[index + 1]]).decode("utf-8")
+        return string
+
+
+class ValueColumn(object):
+    """
+    Reads the values stored by _encodeValues, unpickling each value when it is accessed
+    """
+    def __init__(self, sections, prefix):
+        self.kinds = sections[prefix + b"KIND"]
+        self.floats = _column("d", sections[prefix + b"FLOAT"])
+        self.offsets = _column("Q", sections[prefix + b"OFFSET"])
+        self.blob = sections[prefix + b"BLOB"]
+
+    def __len__(self):
+        return len(self.kinds)
+
+    def __getitem__(self, index):
+        kind = self.kinds[index]
+        if kind == VALUE_FLOAT:
+            return self.floats[index]
+        if kind == VALUE_PICKLE:
+            return pickle.loads(self.blob[self.offsets[index]:self.offsets[index + 1]])
+        return None
+
+
+def _encodeValues(prefix, values):
+    """
+    Encodes a list of values into four sections: the kind of each value, a float column, and the offsets into a
+    blob of pickled values
+
+    Returns:
+        []: of (section name, data)
+    """
+    kinds = bytearray(len(values))
+    floats = array.array("d", bytes(8 * len(values)))
+    offsets = array.array("Q", [0])
+    blobs = []
+    size = 0
+    for index, value in enumerate(values):
+        if value is None:
+            kinds[index] = VALUE_NONE
+        elif type(value) is float:
+            kinds[index] = VALUE_FLOAT
+            floats[index] = value
+        else:
+            kinds[index] = VALUE_PICKLE
+            blob = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+            blobs.append(blob)
+            size += len(blob)
+        offsets.append(size)
+    return [
+        (prefix + b"KIND", bytes(kinds)),
+        (prefix + b"FLOAT", _toBytes(floats)),
+        (prefix + b"OFFSET", _toBytes(offsets)),
+        (prefix + b"BLOB", b"".join(blobs)),
+    ]
+
+
+def _findIsland(parents, index):
+    while parents[index] != index:
+        parents[index] = parents[parents[index]]
+        index = parents[index]
+    return index
+
+
+def _unionIslands(parents, index, otherIndex):
+    root = _findIsland(parents, index)
+    otherRoot = _findIsland(parents, otherIndex)
+    if root != otherRoot:
+        parents[max(root, otherRoot)] = min(root, otherRoot)
+
+
+def _offsets(lists, typecode="i"):
+    """
+    Returns:
+        array: of the offset each list starts at, if the lists were joined together, followed by the total length
+    """
+    offsets = array.array(typecode, [0])
+    for items in lists:
+        offsets.append(offsets[-1] + len(items))
+    return offsets
+
+
+def _align(size):
+    return (size + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def _toBytes(column):
+    """
+    Returns:
+        bytes: of the array, in little endian
+    """
+    if sys.byteorder != "little":
+        column = array.array(column.typecode, column)
+        column.byteswap()
+    return column.tobytes()
+
+
+def _column(typecode, data):
+    """
+    Returns a column of little endian values, read in place from the data when the machine is little endian
+
+    Args:
+        typecode (str): array type code of the values
+        data (memoryview): of the section
+
+    Returns:
+        memoryview/array: of the values
+    """
+    if sys.byteorder == "little":
+        return data.cast(typecode)
+    column = array.array(typecode)
+    column.frombytes(data)
+    column.byteswap()
+    return column
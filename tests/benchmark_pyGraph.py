@@ -0,0 +1,334 @@
+"""
+Benchmarks for pyGraph, these are not unit tests, run them directly:
+
+    python -m pyGraph.tests.benchmark_pyGraph
+    python -m pyGraph.tests.benchmark_pyGraph --shapes chain fanIn --sizes 10 1000000 --output results.json
+
+The results are written as JSON, so the results of two versions can be compared to catch regressions.
+
+Shapes
+- chain: sum nodes daisy chained one after another
+- fanIn: a binary tree of sum nodes, summing all the leaves into one root
+- diamond: diamonds of sum nodes(one node feeding two, feeding one) chained one after another
+- randomDag: sum nodes connected to random nodes created before them
+- containers: containers holding a container holding a chain of negate nodes, chained one after another
+- islands: many small islands of three nodes
+
+Measurements, for each shape and size(the amount of nodes, including the nodes inside of containers)
+- buildTime: seconds to create the nodes and connect them
+- evaluateTime: seconds for the first evaluation of the whole graph
+- incrementalTime: seconds to set a single input value(near the middle of the graph) and evaluate again
+- bytesPerNode: bytes used per node(including its ports and edges), measured with tracemalloc on a separate build
+
+Memory
+- benchmarkMemory measures the bytes used per node and per port, by creating a graph of sum nodes, and ports on a
+  single node
+- benchmarkArrayMemory measures the same graph of sum nodes when stored in an ArrayGraph
+"""
+import argparse
+import json
+import platform
+import random
+import sys
+import time
+import tracemalloc
+
+import pyGraph.Node as mNode
+import pyGraph.Port as mPort
+import pyGraph.Graph as mGraph
+import pyGraph.ArrayGraph as mArrayGraph
+
+DEFAULT_SIZES = (10, 1000, 100000)
+FULL_SIZES = (10, 100, 1000, 10000, 100000, 1000000)
+
+# amount of negate nodes inside each container, of the containers shape
+CONTAINER_CHAIN = 8
+
+
+def buildChain(graph, count):
+    """
+    Each of the builders creates about count nodes in the graph
+
+    Returns:
+        tuple: the input port to change for the incremental evaluation, and an output port to read
+    """
+    nodes = []
+    for i in range(count):
+        node = graph.createNode(mNode.SumNode)
+        if nodes:
+            nodes[-1].getOutputPort("result").connect(node.getInputPort("value1"))
+        nodes.append(node)
+    return nodes[len(nodes) // 2].getInputPort("value2"), nodes[-1].getOutputPort("result")
+
+
+def buildFanIn(graph, count):
+    level = [graph.createNode(mNode.SumNode) for i in range(max(1, (count + 1) // 2))]
+    leaf = level[len(level) // 2]
+    while len(level) > 1:
+        nextLevel = []
+        for i in range(0, len(level) - 1, 2):
+            node = graph.createNode(mNode.SumNode)
+            level[i].getOutputPort("result").connect(node.getInputPort("value1"))
+            level[i + 1].getOutputPort("result").connect(node.getInputPort("value2"))
+            nextLevel.append(node)
+        if len(level) % 2:
+            nextLevel.append(level[-1])
+        level = nextLevel
+    return leaf.getInputPort("value1"), level[0].getOutputPort("result")
+
+
+def buildDiamond(graph, count):
+    top = graph.createNode(mNode.SumNode)
+    lefts = []
+    for i in range(max(1, (count - 1) // 3)):
+        left = graph.createNode(mNode.SumNode)
+        right = graph.createNode(mNode.SumNode)
+        bottom = graph.createNode(mNode.SumNode)
+        top.getOutputPort("result").connect(left.getInputPort("value1"))
+        top.getOutputPort("result").connect(right.getInputPort("value1"))
+        left.getOutputPort("result").connect(bottom.getInputPort("value1"))
+        right.getOutputPort("result").connect(bottom.getInputPort("value2"))
+        top = bottom
+        lefts.append(left)
+    # value2 of the left nodes is the only input in the diamonds that is not connected
+    return lefts[len(lefts) // 2].getInputPort("value2"), top.getOutputPort("result")
+
+
+def buildRandomDag(graph, count, seed=0):
+    randomGenerator = random.Random(seed)
+    nodes = []
+    for i in range(count):
+        node = graph.createNode(mNode.SumNode)
+        if nodes:
+            nodes[randomGenerator.randrange(len(nodes))].getOutputPort("result").connect(node.getInputPort("value1"))
+            if randomGenerator.random() < 0.5:
+                upstream = nodes[randomGenerator.randrange(len(nodes))]
+                upstream.getOutputPort("result").connect(node.getInputPort("value2"))
+        nodes.append(node)
+    # the first node from the middle, whose value2 was not connected
+    for node in nodes[len(nodes) // 2:] + nodes[:len(nodes) // 2]:
+        if not node.getInputPort("value2").isConnected():
+            return node.getInputPort("value2"), nodes[-1].getOutputPort("result")
+    return nodes[0].getInputPort("value1"), nodes[-1].getOutputPort("result")
+
+
+def buildContainers(graph, count):
+    outerNodes = []
+    for i in range(max(1, count // (CONTAINER_CHAIN + 2))):
+        outerNode = graph.createNode(mNode.ContainerNode)
+        outerNode.addInputPort("value")
+        outerNode.addOutputPort("result")
+        innerNode = outerNode.createNode(mNode.ContainerNode)
+        innerNode.addInputPort("value")
+        innerNode.addOutputPort("result")
+
+        # the inside of a container is connected before the container is connected to anything
+        port = innerNode.getInputPort("value")
+        for j in range(CONTAINER_CHAIN):
+            negNode = innerNode.createNode(mNode.NegateNode)
+            port.connect(negNode.getInputPort("value"))
+            port = negNode.getOutputPort("result")
+        port.connect(innerNode.getOutputPort("result"))
+        outerNode.getInputPort("value").connect(innerNode.getInputPort("value"))
+        innerNode.getOutputPort("result").connect(outerNode.getOutputPort("result"))
+
+        if outerNodes:
+            outerNodes[-1].getOutputPort("result").connect(outerNode.getInputPort("value"))
+        outerNodes.append(outerNode)
+    return outerNodes[0].getInputPort("value"), outerNodes[-1].getOutputPort("result")
+
+
+def buildIslands(graph, count):
+    islands = []
+    for i in range(max(1, count // 3)):
+        sumNode_1 = graph.createNode(mNode.SumNode)
+        sumNode_2 = graph.createNode(mNode.SumNode)
+        negNode = graph.createNode(mNode.NegateNode)
+        sumNode_1.getOutputPort("result").connect(sumNode_2.getInputPort("value1"))
+        sumNode_2.getOutputPort("result").connect(negNode.getInputPort("value"))
+        islands.append((sumNode_1, negNode))
+    sumNode, negNode = islands[len(islands) // 2]
+    return sumNode.getInputPort("value1"), negNode.getOutputPort("result")
+
+
+SHAPES = {
+    "chain": buildChain,
+    "fanIn": buildFanIn,
+    "diamond": buildDiamond,
+    "randomDag": buildRandomDag,
+    "containers": buildContainers,
+    "islands": buildIslands,
+}
+
+
+def countNodes(graph):
+    """
+    Returns:
+        int: amount of nodes in the graph, including the nodes inside of containers
+    """
+    count = 0
+    stack = list(graph.nodes)
+    while stack:
+        node = stack.pop()
+        count += 1
+        stack.extend(getattr(node, "internalNodes", []))
+    return count
+
+
+def benchmarkShape(shape, size, memory=True):
+    """
+    Builds a graph of the shape, and measures the time to build it, evaluate it, and evaluate it again after
+    changing a single input
+
+    Args:
+        shape (str): name of the shape, a key of SHAPES
+        size (int): about the amount of nodes to create
+        memory (bool): measure the memory used, with a separate build of the graph
+
+    Returns:
+        dict: of the results
+    """
+    build = SHAPES[shape]
+
+    start = time.perf_counter()
+    graph = mGraph.Graph()
+    inputPort, outputPort = build(graph, size)
+    buildTime = time.perf_counter() - start
+
+    start = time.perf_counter()
+    graph.evaluate()
+    evaluateTime = time.perf_counter() - start
+
+    start = time.perf_counter()
+    inputPort.value = 1.0
+    graph.evaluate()
+    incrementalTime = time.perf_counter() - start
+
+    result = {
+        "benchmark": "shape",
+        "shape": shape,
+        "size": size,
+        "nodes": countNodes(graph),
+        "buildTime": buildTime,
+        "evaluateTime": evaluateTime,
+        "incrementalTime": incrementalTime,
+        "output": outputPort.value,
+    }
+    del graph, inputPort, outputPort
+
+    if memory:
+        tracemalloc.start()
+        before = tracemalloc.get_traced_memory()[0]
+        graph = mGraph.Graph()
+        build(graph, size)
+        used = tracemalloc.get_traced_memory()[0] - before
+        tracemalloc.stop()
+        result["bytesPerNode"] = used / float(countNodes(graph))
+    return result
+
+
+def benchmarkMemory(count=100000):
+    """
+    Creates a graph of daisy chained sum nodes, and measures the memory used
+
+    Args:
+        count (int): amount of nodes to create
+
+    Returns:
+        dict: of the results
+    """
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+
+    graph = mGraph.Graph()
+    previous = None
+    for i in range(count):
+        node = graph.createNode(mNode.SumNode)
+        if previous is not None:
+            previous.getOutputPort("result").connect(node.getInputPort("value1"))
+        previous = node
+
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+
+    node = mNode.Node()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    ports = [mPort.Port("port", node, 0.0) for i in range(count)]
+    portsUsed = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+
+    return {
+        "benchmark": "memory",
+        "nodes": count,
+        "bytesPerNode": used / float(count),
+        "bytesPerPort": portsUsed / float(len(ports)),
+    }
+
+
+def benchmarkArrayMemory(count=100000):
+    """
+    Creates an ArrayGraph of daisy chained sum nodes, and measures the memory used
+
+    Args:
+        count (int): amount of nodes to create
+
+    Returns:
+        dict: of the results
+    """
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+
+    graph = mArrayGraph.ArrayGraph()
+    previous = None
+    for i in range(count):
+        node = graph.createNode(mNode.SumNode)
+        if previous is not None:
+            previous.getOutputPort("result").connect(node.getInputPort("value1"))
+        previous = node
+    graph.evaluate()
+
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return {
+        "benchmark": "arrayMemory",
+        "nodes": count,
+        "bytesPerNode": used / float(count),
+    }
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description="pyGraph benchmarks")
+    parser.add_argument("--shapes", nargs="+", choices=sorted(SHAPES), default=sorted(SHAPES))
+    parser.add_argument("--sizes", nargs="+", type=int, default=None,
+                        help="amount of nodes, defaults to {}".format(" ".join(str(size) for size in DEFAULT_SIZES)))
+    parser.add_argument("--full", action="store_true",
+                        help="run all the sizes from 10 to 1M nodes: {}".format(" ".join(str(s) for s in FULL_SIZES)))
+    parser.add_argument("--no-memory", dest="memory", action="store_false", help="do not measure the memory used")
+    parser.add_argument("--output", help="file to write the JSON results to, defaults to stdout")
+    options = parser.parse_args(args)
+
+    sizes = options.sizes or (FULL_SIZES if options.full else DEFAULT_SIZES)
+    results = []
+    for shape in options.shapes:
+        for size in sizes:
+            results.append(benchmarkShape(shape, size, options.memory))
+    if options.memory:
+        results += [benchmarkMemory(), benchmarkArrayMemory()]
+
+    document = {
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "platform": platform.platform(),
+        "results": results,
+    }
+    if options.output:
+        with open(options.output, "w") as fileHandle:
+            json.dump(document, fileHandle, indent=4)
+    else:
+        json.dump(document, sys.stdout, indent=4)
+        sys.stdout.write("\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,22 @@
 import unittest
+import asyncio
+import concurrent.futures
+import os
+import shutil
+import tempfile
 import pyGraph.Node as mNode
 import pyGraph.Graph as mGraph
+import pyGraph.ArrayGraph as mArrayGraph
+import pyGraph.LazyGraph as mLazyGraph
+import pyGraph.Serialize as mSerialize
+import pyGraph.Profile as mProfile
+import pyGraph.Batch as mBatch
+import pyGraph.tests.benchmark_pyGraph as mBenchmark
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
 
 """
 Test Node, is for testing all node types, making sure that the node itself is working correctly
@@ -76,6 +92,50 @@ class TestNode(unittest.TestCase):
         node.evaluate()
 
         self.assertEqual(node.getOutputPort("result").value, [1,2,3])
+    def test_SlotsLayout(self):
+        """
+        Library nodes and ports have no per instance __dict__, but still pickle with all there attributes
+        """
+        import pickle
+        contNode = mNode.ContainerNode()
+        contNode.addInputPort("value")
+        sumNode = mNode.SumNode()
+        sumNode.getOutputPort("result").connect(contNode.getInputPort("value"))
+        for obj in [sumNode, contNode, sumNode.portsIn[0], contNode.portsIn[0]]:
+            self.assertFalse(hasattr(obj, "__dict__"))
+
+        copy = pickle.loads(pickle.dumps(sumNode))
+        self.assertEqual(copy.type, "SumNode")
+        self.assertEqual(copy.getOutputPort("result").edges[0].name, "value")
+        self.assertEqual(copy.outDegree, 1)
+
+    def test_PortLookup(self):
+        """
+        Ports are found by name from a layout shared by all nodes with the same ports, and port names are unique
+        """
+        sumNode_1 = mNode.SumNode()
+        sumNode_2 = mNode.SumNode()
+        self.assertIs(sumNode_1._portLayout, sumNode_2._portLayout)
+        self.assertIs(sumNode_1.getInputPort("value2"), sumNode_1.portsIn[1])
+        self.assertIsNone(sumNode_1.getInputPort("result"))
+        self.assertIsNone(sumNode_1.addInputPort("value1"))
+
+        newPort = sumNode_2.addInputPort("value3")
+        self.assertIsNot(sumNode_1._portLayout, sumNode_2._portLayout)
+        self.assertIs(sumNode_2.getInputPort("value3"), newPort)
+        self.assertIsNone(sumNode_1.getInputPort("value3"))
+        self.assertTrue(newPort.isDestination())
+        self.assertTrue(sumNode_2.getOutputPort("result").isSource())
+
+        # after the first port, ports are added to the node's own layout in place
+        layout = sumNode_2._portLayout
+        for i in range(4, 1000):
+            sumNode_2.addInputPort("value{}".format(i))
+        self.assertIs(sumNode_2._portLayout, layout)
+        self.assertIs(sumNode_2.getInputPort("value999"), sumNode_2.portsIn[-1])
+        self.assertIs(mNode.SumNode()._portLayout, sumNode_1._portLayout)
+        self.assertEqual(len(sumNode_1._portLayout.inputs), 2)
+
 
 """
 Test pyGraph
@@ -309,6 +369,1302 @@ class TestPyGraph(unittest.TestCase):
         graph.evaluate()
         self.assertEqual(negNode.getOutputPort("result").value, 4)
 
+    def test_CompiledSchedule(self):
+        """
+        The compiled schedule orders nodes so every node comes after the nodes it reads from, and is only
+        rebuilt when the structure of the graph changes
+        """
+        graph = mGraph.Graph()
+        negNode = graph.createNode(mNode.NegateNode)
+        sumNode_1 = graph.createNode(mNode.SumNode)
+        sumNode_2 = graph.createNode(mNode.SumNode)
+
+        sumNode_2.getOutputPort("result").connect(sumNode_1.getInputPort("value1"))
+        sumNode_1.getOutputPort("result").connect(negNode.getInputPort("value"))
+
+        schedule = graph.compile()
+        self.assertEqual(schedule, [sumNode_2, sumNode_1, negNode])
+        self.assertIs(graph.compile(), schedule)
+
+        sumNode_1.getOutputPort("result").disconnect(negNode.getInputPort("value"))
+        self.assertIsNot(graph.compile(), schedule)
+
+    def test_LongChainEvaluation(self):
+        """
+        Evaluating the graph runs the compiled schedule in a loop, so chains longer than the recursion limit evaluate
+        """
+        graph = mGraph.Graph()
+        previous = graph.createNode(mNode.SumNode)
+        previous.getInputPort("value1").value = 1.0
+        for i in range(5000):
+            node = graph.createNode(mNode.SumNode)
+            node.getInputPort("value2").value = 1.0
+            previous.getOutputPort("result").connect(node.getInputPort("value1"))
+            previous = node
+
+        graph.evaluate()
+        self.assertEqual(previous.getOutputPort("result").value, 5001.0)
+
+    def test_DisconnectAllEdges(self):
+        """
+        Disconnecting an output with multiple edges removes the edge from both ports, and keeps the
+        graph heads/tails and node degree counters in sync
+        """
+        graph = mGraph.Graph()
+        negNode = graph.createNode(mNode.NegateNode)
+        sumNode1 = graph.createNode(mNode.SumNode)
+        sumNode2 = graph.createNode(mNode.SumNode)
+
+        negNode.getOutputPort("result").connect(sumNode1.getInputPort("value1"))
+        negNode.getOutputPort("result").connect(sumNode2.getInputPort("value1"))
+        self.assertEqual(negNode.outDegree, 2)
+        self.assertEqual(graph.getNetworkHeads(), [sumNode1, sumNode2])
+        self.assertEqual(graph.getNetworkTails(), [negNode])
+
+        negNode.getOutputPort("result").disconnect()
+        self.assertEqual(negNode.outDegree, 0)
+        self.assertFalse(sumNode1.getInputPort("value1").isConnected())
+        self.assertFalse(sumNode2.getInputPort("value1").isConnected())
+        self.assertFalse(negNode.isConnected())
+        self.assertEqual(len(graph.getNetworkHeads()), 3)
+        self.assertEqual(len(graph.getNetworkTails()), 3)
+
+    def test_BatchValues(self):
+        graph = mGraph.Graph()
+        sumNode = graph.createNode(mNode.SumNode)
+        negNode_1 = graph.createNode(mNode.NegateNode)
+        negNode_2 = graph.createNode(mNode.NegateNode)
+        negNode_1.getOutputPort("result").connect(sumNode.getInputPort("value1"))
+        negNode_2.getOutputPort("result").connect(sumNode.getInputPort("value2"))
+        graph.evaluate()
+
+        with graph.batch():
+            negNode_1.getInputPort("value").value = 1.0
+            negNode_2.getInputPort("value").value = 2.0
+            # propagation is deferred until the batch closes
+            self.assertFalse(sumNode.dirty)
+        self.assertTrue(sumNode.dirty)
+        graph.evaluate()
+        self.assertEqual(sumNode.getOutputPort("result").value, -3.0)
+
+        graph.setValues({negNode_1.getInputPort("value"): 3.0, negNode_2.getInputPort("value"): 4.0}, evaluate=True)
+        self.assertEqual(sumNode.getOutputPort("result").value, -7.0)
+        self.assertFalse(sumNode.dirty)
+
+
+"""
+Test Islands
+- Checks islands are found as edges are added and removed
+- Checks islands can be evaluated on their own, and on a thread/process pool
+"""
+class TestIslands(unittest.TestCase):
+    def createIslands(self, graph, count):
+        """
+        Creates islands of two sum nodes feeding a negate node, returns the negate nodes
+        """
+        negNodes = []
+        for i in range(count):
+            sumNode_1 = graph.createNode(mNode.SumNode)
+            sumNode_2 = graph.createNode(mNode.SumNode)
+            negNode = graph.createNode(mNode.NegateNode)
+            sumNode_1.getOutputPort("result").connect(sumNode_2.getInputPort("value1"))
+            sumNode_2.getOutputPort("result").connect(negNode.getInputPort("value"))
+            sumNode_1.getInputPort("value1").value = i
+            sumNode_2.getInputPort("value2").value = 1.0
+            negNodes.append(negNode)
+        return negNodes
+
+    def test_FindIslands(self):
+        graph = mGraph.Graph()
+        negNodes = self.createIslands(graph, 3)
+        islands = graph.getIslands()
+        self.assertEqual(len(islands), 3)
+        self.assertEqual([island[-1] for island in islands], negNodes)
+
+        # splitting an island in two
+        negNodes[0].getInputPort("value").disconnect()
+        self.assertEqual(len(graph.getIslands()), 4)
+        self.assertEqual(graph.getIsland(negNodes[0]), [negNodes[0]])
+
+    def test_EvaluateIsland(self):
+        graph = mGraph.Graph()
+        negNodes = self.createIslands(graph, 2)
+        graph.evaluate(island=graph.getIsland(negNodes[1]))
+        self.assertEqual(negNodes[1].getOutputPort("result").value, -2.0)
+        self.assertTrue(negNodes[0].dirty)
+        self.assertEqual(negNodes[0].getOutputPort("result").value, None)
+
+    def test_EvaluateIslandsThreadPool(self):
+        graph = mGraph.Graph()
+        negNodes = self.createIslands(graph, 8)
+        with concurrent.futures.ThreadPoolExecutor(4) as executor:
+            graph.evaluateIslands(executor)
+        self.assertEqual([node.getOutputPort("result").value for node in negNodes], [-(i + 1.0) for i in range(8)])
+
+    def test_EvaluateIslandsProcessPool(self):
+        graph = mGraph.Graph()
+        negNodes = self.createIslands(graph, 4)
+        with concurrent.futures.ProcessPoolExecutor(2) as executor:
+            graph.evaluateIslands(executor)
+        self.assertEqual([node.getOutputPort("result").value for node in negNodes], [-(i + 1.0) for i in range(4)])
+        self.assertFalse(any(node.dirty for node in negNodes))
+
+    def test_EvaluateLongIslandProcessPool(self):
+        """
+        Islands are sent to the workers without pickling the nodes, which recurses through long chains
+        """
+        graph = mGraph.Graph()
+        nodes = [graph.createNode(mNode.SumNode) for i in range(3000)]
+        for node, nextNode in zip(nodes, nodes[1:]):
+            node.getOutputPort("result").connect(nextNode.getInputPort("value1"))
+        nodes[0].getInputPort("value1").value = 1.0
+        for node in nodes[1:]:
+            node.getInputPort("value2").value = 1.0
+        # only the dirty nodes are evaluated in the worker
+        graph.evaluate()
+        nodes[-1].getInputPort("value2").value = 2.0
+
+        with concurrent.futures.ProcessPoolExecutor(1) as executor:
+            graph.evaluateIslands(executor)
+        self.assertEqual(nodes[-1].getOutputPort("result").value, 3001.0)
+        self.assertFalse(any(node.dirty for node in nodes))
+
+
+"""
+Test Levels
+- Checks the graph is split into dependency levels
+- Checks evaluating level by level on a thread/process pool gives the same results as evaluate
+- Checks memo caches and early cutoff apply when evaluating level by level on a process pool
+"""
+class TestLevels(unittest.TestCase):
+    def createFanIn(self, graph, width):
+        """
+        Creates a sum node, fed by width negate nodes, each fed by a multiply node
+
+        Returns:
+            mNode.Node: the sum node
+        """
+        sumNode = graph.createNode(mNode.SumNode)
+        for i in range(width):
+            mulNode = graph.createNode(mNode.MultiplyNode)
+            negNode = graph.createNode(mNode.NegateNode)
+            mulNode.getInputPort("value1").value = i
+            mulNode.getInputPort("value2").value = 2
+            mulNode.getOutputPort("result").connect(negNode.getInputPort("value"))
+            port = sumNode.getInputPort("value{}".format(i + 1)) or sumNode.addInputPort("value{}".format(i + 1))
+            negNode.getOutputPort("result").connect(port)
+        return sumNode
+
+    def test_Levels(self):
+        graph = mGraph.Graph()
+        sumNode = self.createFanIn(graph, 4)
+        levels = graph.getLevels()
+        self.assertEqual([len(level) for level in levels], [4, 4, 1])
+        self.assertEqual(levels[-1], [sumNode])
+
+    def test_EvaluateLevelsThreadPool(self):
+        graph = mGraph.Graph()
+        sumNode = self.createFanIn(graph, 6)
+        with concurrent.futures.ThreadPoolExecutor(4) as executor:
+            graph.evaluateLevels(executor)
+        self.assertEqual(sumNode.getOutputPort("result").value, -30)
+
+    def test_EvaluateLevelsProcessPool(self):
+        graph = mGraph.Graph()
+        sumNode = self.createFanIn(graph, 6)
+        with concurrent.futures.ProcessPoolExecutor(2) as executor:
+            graph.evaluateLevels(executor)
+            self.assertEqual(sumNode.getOutputPort("result").value, -30)
+            self.assertFalse(any(node.dirty for node in graph.nodes))
+
+            graph.nodes[3].getInputPort("value2").value = 3
+            graph.evaluateLevels(executor)
+        self.assertEqual(sumNode.getOutputPort("result").value, -31)
+
+    def test_EvaluateLevelsProcessPoolMemoCutoff(self):
+        """
+        The process pool evaluates the same nodes as evaluating the graph serially, with memo caches and early cutoff
+        """
+        graphs = [mGraph.Graph(), mGraph.Graph()]
+        sumNodes = [self.createFanIn(graph, 4) for graph in graphs]
+        memoCaches = [graph.memoize() for graph in graphs]
+        for graph in graphs:
+            graph.setEarlyCutoff()
+
+        with concurrent.futures.ProcessPoolExecutor(2) as executor:
+            for values in [(0, 2), (5, 2), (5, 3)]:
+                for graph in graphs:
+                    # the first multiply node's result stays 0, and the second has been evaluated with 2 before
+                    graph.nodes[1].getInputPort("value2").value = values[0]
+                    graph.nodes[3].getInputPort("value2").value = values[1]
+                graphs[0].evaluate()
+                graphs[1].evaluateLevels(executor)
+                self.assertEqual(sumNodes[1].getOutputPort("result").value, sumNodes[0].getOutputPort("result").value)
+                self.assertEqual(memoCaches[1].getStats(), memoCaches[0].getStats())
+                self.assertFalse(any(node.dirty for node in graphs[1].nodes))
+        self.assertEqual(sumNodes[1].getOutputPort("result").value, -13)
+        self.assertEqual(memoCaches[1].getStats()["hits"], 2)
+
+
+"""
+Test Dirty Scheduler
+- Checks the graph only evaluates the nodes downstream of a changed value
+- Checks dirtiness propagates down very long chains without recursion
+"""
+class TestDirtyScheduler(unittest.TestCase):
+    def test_OnlyDirtyNodesEvaluate(self):
+        graph = mGraph.Graph()
+        constNode = graph.createNode(mNode.ConstantNode)
+        sumNode = graph.createNode(mNode.SumNode)
+        negNode = graph.createNode(mNode.NegateNode)
+        otherNode = graph.createNode(mNode.NegateNode)
+        constNode.getOutputPort("result").connect(sumNode.getInputPort("value1"))
+        sumNode.getOutputPort("result").connect(negNode.getInputPort("value"))
+
+        constNode.getInputPort("value").value = 2.0
+        graph.evaluate()
+        self.assertEqual(negNode.getOutputPort("result").value, -2.0)
+        self.assertFalse(any(node.dirty for node in graph.nodes))
+
+        constNode.getInputPort("value").value = 5.0
+        self.assertTrue(sumNode.getInputPort("value1").dirty)
+        self.assertTrue(negNode.dirty)
+        self.assertFalse(otherNode.dirty)
+        self.assertEqual(graph._dirtyNodes, set([constNode, sumNode, negNode]))
+
+        graph.evaluate()
+        self.assertEqual(negNode.getOutputPort("result").value, -5.0)
+        self.assertEqual(graph._dirtyNodes, set())
+
+    def test_LongChainPropagation(self):
+        graph = mGraph.Graph()
+        nodes = [graph.createNode(mNode.NegateNode) for i in range(5000)]
+        for node, nextNode in zip(nodes, nodes[1:]):
+            node.getOutputPort("result").connect(nextNode.getInputPort("value"))
+        graph.evaluate()
+
+        nodes[0].getInputPort("value").value = 1.0
+        self.assertTrue(nodes[-1].dirty)
+        graph.evaluate()
+        self.assertEqual(nodes[-1].getOutputPort("result").value, 1.0)
+
+    def test_StandaloneChainPropagation(self):
+        nodes = [mNode.NegateNode() for i in range(5000)]
+        for node, nextNode in zip(nodes, nodes[1:]):
+            node.getOutputPort("result").connect(nextNode.getInputPort("value"))
+        for node in nodes:
+            node.evaluate()
+
+        nodes[0].getInputPort("value").value = 1.0
+        self.assertTrue(nodes[-1].dirty)
+
+
+"""
+Test Arrays
+- Checks the arithmetic and vector nodes evaluate batches of samples held in NumPy arrays
+"""
+@unittest.skipIf(numpy is None, "NumPy is not installed")
+class TestArrays(unittest.TestCase):
+    def test_ArithmeticArrays(self):
+        graph = mGraph.Graph()
+        mulNode = graph.createNode(mNode.MultiplyNode)
+        subNode = graph.createNode(mNode.SubtractNode)
+        negNode = graph.createNode(mNode.NegateNode)
+        mulNode.getOutputPort("result").connect(subNode.getInputPort("value1"))
+        subNode.getOutputPort("result").connect(negNode.getInputPort("value"))
+
+        samples = numpy.arange(5.0)
+        result, = graph.evaluateArrays({mulNode.getInputPort("value1"): samples,
+                                        mulNode.getInputPort("value2"): 2.0,
+                                        subNode.getInputPort("value2"): samples}, [negNode.getOutputPort("result")])
+        numpy.testing.assert_array_equal(result, -samples)
+        # inputs are never modified in place
+        numpy.testing.assert_array_equal(mulNode.getInputPort("value1").value, numpy.arange(5.0))
+
+    def test_VectorArrays(self):
+        graph = mGraph.Graph()
+        toVector = graph.createNode(mNode.ScalarToVector)
+        toScalar = graph.createNode(mNode.VectorToScalar)
+        toVector.getOutputPort("result").connect(toScalar.getInputPort("vector"))
+
+        samples = numpy.arange(4.0)
+        graph.evaluateArrays({toVector.getInputPort("x"): samples,
+                              toVector.getInputPort("y"): 1.0,
+                              toVector.getInputPort("z"): samples * 2}, [])
+        self.assertEqual(toVector.getOutputPort("result").value.shape, (4, 3))
+        numpy.testing.assert_array_equal(toScalar.getOutputPort("y").value, numpy.ones(4))
+        numpy.testing.assert_array_equal(toScalar.getOutputPort("z").value, samples * 2)
+
+
+"""
+Test Expression
+- Checks a compiled expression gives the same results as evaluating the graph
+"""
+class TestExpression(unittest.TestCase):
+    def test_CompiledExpression(self):
+        """
+                         --> |negNode| --> |sumNode_2|
+        |mulNode|-------<                      ^
+         |constNode| -->  --> |subNode| -------
+        """
+        graph = mGraph.Graph()
+        constNode = graph.createNode(mNode.ConstantNode)
+        mulNode = graph.createNode(mNode.MultiplyNode)
+        negNode = graph.createNode(mNode.NegateNode)
+        subNode = graph.createNode(mNode.SubtractNode)
+        sumNode = graph.createNode(mNode.SumNode)
+        mulNode.getOutputPort("result").connect(negNode.getInputPort("value"))
+        mulNode.getOutputPort("result").connect(subNode.getInputPort("value1"))
+        constNode.getOutputPort("result").connect(subNode.getInputPort("value2"))
+        negNode.getOutputPort("result").connect(sumNode.getInputPort("value1"))
+        subNode.getOutputPort("result").connect(sumNode.getInputPort("value2"))
+        constNode.getInputPort("value").value = 1.5
+        # computes the same value as negNode
+        negNode_2 = graph.createNode(mNode.NegateNode)
+        mulNode.getOutputPort("result").connect(negNode_2.getInputPort("value"))
+
+        inputs = [mulNode.getInputPort("value1"), mulNode.getInputPort("value2")]
+        outputs = [sumNode.getOutputPort("result"), negNode.getOutputPort("result"), negNode_2.getOutputPort("result")]
+        function = graph.compileExpression(outputs, inputs)
+        # one line per distinct expression
+        self.assertEqual(function.source.count(" = "), 4)
+
+        for values in [(1.0, 2.0), (3.0, -4.5), (0.25, 8)]:
+            graph.setValues(dict(zip(inputs, values)), evaluate=True)
+            self.assertEqual(function(*values), tuple(port.value for port in outputs))
+
+    def test_InlinedContainer(self):
+        """
+        |sumNode| --> |contNode: squareRoot --> |mulNode| --> |negNode| --> result| --> |negNode_2|
+        """
+        graph = mGraph.Graph()
+        sumNode = graph.createNode(mNode.SumNode)
+        contNode = graph.createNode(mNode.ContainerNode)
+        negNode_2 = graph.createNode(mNode.NegateNode)
+        contNode.addInputPort("squareRoot")
+        contNode.addOutputPort("result")
+        mulNode = contNode.createNode(mNode.MultiplyNode)
+        negNode = contNode.createNode(mNode.NegateNode)
+        contNode.getInputPort("squareRoot").connect(mulNode.getInputPort("value1"))
+        contNode.getInputPort("squareRoot").connect(mulNode.getInputPort("value2"))
+        mulNode.getOutputPort("result").connect(negNode.getInputPort("value"))
+        negNode.getOutputPort("result").connect(contNode.getOutputPort("result"))
+        sumNode.getOutputPort("result").connect(contNode.getInputPort("squareRoot"))
+        contNode.getOutputPort("result").connect(negNode_2.getInputPort("value"))
+
+        memoCache = graph.memoize()
+        for value in [3.0, 4.0, 3.0]:
+            sumNode.getInputPort("value1").value = value
+            graph.evaluate()
+            self.assertEqual(negNode_2.getOutputPort("result").value, value * value)
+        # the internal nodes are evaluated by the graph, so they are memoized like any other node
+        self.assertEqual(graph._containerPlans[contNode], [mulNode, negNode])
+        self.assertEqual(memoCache.getStats()["hits"], 4)
+
+        inputs = [sumNode.getInputPort("value1")]
+        function = graph.compileExpression([negNode_2.getOutputPort("result")], inputs)
+        self.assertEqual(function(5.0), (25.0,))
+
+    def test_UnsupportedNode(self):
+        node = mNode.ScalarToVector()
+        with self.assertRaises(ValueError):
+            mGraph.Graph().compileExpression([node.getOutputPort("result")])
+
+
+"""
+Test ArrayGraph
+- Checks nodes stored in columns evaluate the same as a Graph
+- Checks a Graph can be copied into an ArrayGraph
+"""
+class TestArrayGraph(unittest.TestCase):
+    def test_ArrayGraphEvaluation(self):
+        graph = mArrayGraph.ArrayGraph()
+        sumNode_1 = graph.createNode(mNode.SumNode)
+        sumNode_2 = graph.createNode(mNode.SumNode)
+        subNode = graph.createNode(mNode.SubtractNode)
+        negNode = graph.createNode(mNode.NegateNode)
+
+        self.assertTrue(sumNode_1.getOutputPort("result").connect(subNode.getInputPort("value1")))
+        sumNode_2.getOutputPort("result").connect(subNode.getInputPort("value2"))
+        subNode.getOutputPort("result").connect(negNode.getInputPort("value"))
+        self.assertFalse(sumNode_2.getOutputPort("result").connect(subNode.getInputPort("value1")))
+
+        sumNode_1.portsIn[0].value = 1.0
+        sumNode_1.portsIn[1].value = 1.25
+        sumNode_2.portsIn[0].value = 3.0
+        sumNode_2.portsIn[1].value = 2.25
+        graph.evaluate()
+        self.assertEqual(negNode.getOutputPort("result").value, 3)
+        self.assertEqual(graph.getNetworkHeads(), [negNode])
+        self.assertEqual(len(graph.getNetworkTails()), 2)
+
+        sumNode_1.portsIn[0].value = 0.0
+        self.assertTrue(negNode.dirty)
+        self.assertFalse(sumNode_2.dirty)
+        graph.evaluate()
+        self.assertEqual(negNode.getOutputPort("result").value, 4)
+
+        sumNode_2.getOutputPort("result").disconnect()
+        self.assertFalse(subNode.getInputPort("value2").isConnected())
+        self.assertEqual(len(graph.getNetworkHeads()), 2)
+
+    def test_FromGraph(self):
+        graph = mGraph.Graph()
+        nodes = [graph.createNode(mNode.NegateNode) for i in range(10)]
+        for node, nextNode in zip(nodes, nodes[1:]):
+            node.getOutputPort("result").connect(nextNode.getInputPort("value"))
+        nodes[0].getInputPort("value").value = 2.0
+
+        arrayGraph = mArrayGraph.ArrayGraph.fromGraph(graph)
+        arrayGraph.evaluate()
+        graph.evaluate()
+        self.assertEqual(arrayGraph.nodes[-1].getOutputPort("result").value, nodes[-1].getOutputPort("result").value)
+        self.assertEqual([node.type for node in arrayGraph.compile()], ["NegateNode"] * 10)
+
+    def test_ContainerNotSupported(self):
+        with self.assertRaises(ValueError):
+            mArrayGraph.ArrayGraph().createNode(mNode.ContainerNode)
+
+
+"""
+Test Serialize
+- Checks a graph saved to a file loads back with the same nodes, edges and values
+- Checks the contents of a container node are saved and loaded with it
+- Checks a memory mapped graph only creates the islands that are used
+- Checks every node class round trips through JSON lines
+- Checks early cutoff evaluates the nodes that were loaded
+- Checks saving does not evaluate a lazy graph, or save the values of an active context
+"""
+class TestSerialize(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "graph.pyg")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_SaveLoad(self):
+        graph = mGraph.Graph()
+        sumNode = graph.createNode(mNode.SumNode)
+        negNode = graph.createNode(mNode.NegateNode)
+        vecNode = graph.createNode(mNode.ScalarToVector)
+        sumNode.name = "sum"
+        sumNode.getOutputPort("result").connect(negNode.getInputPort("value"))
+        sumNode.getInputPort("value1").value = 2.5
+        sumNode.getInputPort("value2").value = 3
+        vecNode.getInputPort("x").value = [1, 2]
+        graph.evaluate()
+        graph.save(self.path)
+
+        loaded = mGraph.Graph.load(self.path)
+        self.assertEqual([node.type for node in loaded.nodes], ["SumNode", "NegateNode", "ScalarToVector"])
+        self.assertEqual(loaded.nodes[0].name, "sum")
+        self.assertEqual(loaded.nodes[0].getInputPort("value2").value, 3)
+        self.assertEqual(loaded.nodes[2].getInputPort("x").value, [1, 2])
+        self.assertIs(loaded.nodes[1].getInputPort("value").edges[0], loaded.nodes[0].getOutputPort("result"))
+        self.assertEqual(loaded.getNetworkTails(), [loaded.nodes[0], loaded.nodes[2]])
+        self.assertEqual(len(loaded.getIslands()), 2)
+
+        loaded.nodes[0].getInputPort("value1").value = 4.5
+        loaded.evaluate()
+        self.assertEqual(loaded.nodes[1].getOutputPort("result").value, -7.5)
+
+    def test_SaveLoadContainer(self):
+        graph = mGraph.Graph()
+        sumNode = graph.createNode(mNode.SumNode)
+        contNode = graph.createNode(mNode.ContainerNode)
+        contNode.addInputPort("squareRoot")
+        contNode.addOutputPort("result")
+        mulNode = contNode.createNode(mNode.MultiplyNode)
+        contNode.getInputPort("squareRoot").connect(mulNode.getInputPort("value1"))
+        contNode.getInputPort("squareRoot").connect(mulNode.getInputPort("value2"))
+        mulNode.getOutputPort("result").connect(contNode.getOutputPort("result"))
+        sumNode.getOutputPort("result").connect(contNode.getInputPort("squareRoot"))
+        sumNode.getInputPort("value1").value = 3.0
+        graph.save(self.path)
+
+        loaded = mGraph.Graph.load(self.path)
+        self.assertEqual(len(loaded.nodes), 2)
+        loadedCont = loaded.nodes[1]
+        loadedMul = loadedCont.getOutputPort("result").internalEdges[0].node
+        self.assertEqual(loadedMul.type, "MultiplyNode")
+        self.assertIn(loadedMul, loadedCont.internalNodes)
+        self.assertEqual(len(loadedCont.getInputPort("squareRoot").internalEdges), 2)
+        loaded.evaluate()
+        self.assertEqual(loadedCont.getOutputPort("result").value, 9.0)
+
+    def test_LazyLoad(self):
+        graph = mGraph.Graph()
+        negNodes = []
+        for i in range(3):
+            sumNode = graph.createNode(mNode.SumNode)
+            negNode = graph.createNode(mNode.NegateNode)
+            sumNode.getOutputPort("result").connect(negNode.getInputPort("value"))
+            sumNode.getInputPort("value1").value = float(i)
+            negNodes.append(negNode)
+        graph.save(self.path)
+
+        lazy = mLazyGraph.LazyGraph(self.path)
+        self.assertEqual(lazy.getNodeCount(), 6)
+        self.assertEqual(lazy.getIslandCount(), 3)
+        self.assertEqual(lazy.nodes, [])
+
+        negNode = lazy.getNode(3)
+        self.assertEqual(negNode.type, "NegateNode")
+        self.assertEqual(len(lazy.nodes), 2)
+        self.assertEqual(negNode.getInputPort("value").edges[0].node.getInputPort("value1").value, 1.0)
+        lazy.evaluate(island=lazy.getIsland(negNode))
+        self.assertEqual(negNode.getOutputPort("result").value, -1.0)
+        self.assertEqual(len(lazy.nodes), 2)
+
+        lazy.evaluate()
+        self.assertEqual(len(lazy.nodes), 6)
+        self.assertEqual([lazy.getNode(i * 2 + 1).getOutputPort("result").value for i in range(3)], [-0.0, -1.0, -2.0])
+
+    def test_SaveWithoutPulling(self):
+        """
+        Saving reads the values held by the ports, without pulling a lazy graph or reading an active context
+        """
+        graph = mGraph.Graph()
+        sumNode = graph.createNode(mNode.SumNode)
+        negNode = graph.createNode(mNode.NegateNode)
+        sumNode.getOutputPort("result").connect(negNode.getInputPort("value"))
+        sumNode.getInputPort("value1").value = 2.0
+        graph.setLazy()
+        try:
+            data = mSerialize.dumps(graph)
+        finally:
+            graph.setLazy(False)
+        self.assertTrue(sumNode.dirty)
+        self.assertTrue(negNode.dirty)
+        loaded = mSerialize.loads(data, mGraph.Graph)
+        loaded.evaluate()
+        self.assertEqual(loaded.nodes[1].getOutputPort("result").value, -2.0)
+
+        context = graph.createContext({sumNode.getInputPort("value1"): 9.0})
+        with context.activate():
+            data = mSerialize.dumps(graph)
+        loaded = mSerialize.loads(data, mGraph.Graph)
+        self.assertEqual(loaded.nodes[0].getInputPort("value1").value, 2.0)
+
+    def test_LoadCutoff(self):
+        """
+        |sumNode| --> |negNode|, only the sum node has been evaluated when the graph is saved
+        """
+        graph = mGraph.Graph()
+        sumNode = graph.createNode(mNode.SumNode)
+        negNode = graph.createNode(mNode.NegateNode)
+        sumNode.getOutputPort("result").connect(negNode.getInputPort("value"))
+        graph.pull(sumNode.getOutputPort("result"))
+        graph.save(self.path)
+        jsonPath = os.path.join(self.directory, "graph.ndjson")
+        graph.saveJson(jsonPath)
+
+        # the loaded nodes were never evaluated, so they are not cut off
+        for loaded in (mGraph.Graph.load(self.path), mGraph.Graph.loadJson(jsonPath)):
+            loaded.setEarlyCutoff()
+            loaded.evaluate()
+            self.assertEqual(loaded.nodes[1].getOutputPort("result").value, -0.0)
+        lazy = mLazyGraph.LazyGraph(self.path)
+        lazy.setEarlyCutoff()
+        lazy.evaluate()
+        self.assertEqual(lazy.getNode(1).getOutputPort("result").value, -0.0)
+
+    def test_JsonRoundTrip(self):
+        graph = mGraph.Graph()
+        classes = [mNode.SumNode, mNode.NegateNode, mNode.SubtractNode, mNode.MultiplyNode, mNode.ConstantNode,
+                   mNode.ArrayNode, mNode.IntNode, mNode.FloatNode, mNode.MatrixNode, mNode.ScalarToVector,
+                   mNode.VectorToScalar]
+        nodes = [graph.createNode(cls) for cls in classes]
+        nodes[0].getOutputPort("result").connect(nodes[1].getInputPort("value"))
+        nodes[9].getOutputPort("result").connect(nodes[10].getInputPort("vector"))
+        nodes[0].getInputPort("value1").value = 2.5
+        nodes[6].getInputPort("value").value = 3
+        nodes[6].getInputPort("value").defaultValue = 1
+        nodes[8].getInputPort("value").value = ((1.0, 0.0), (0.0, 1.0))
+        nodes[5].getInputPort("value").value = {"weights": [1, 2]}
+        contNode = graph.createNode(mNode.ContainerNode)
+        contNode.addInputPort("value", 4.0)
+        contNode.addOutputPort("result")
+        negNode = contNode.createNode(mNode.NegateNode)
+        contNode.getInputPort("value").connect(negNode.getInputPort("value"))
+        negNode.getOutputPort("result").connect(contNode.getOutputPort("result"))
+        graph.saveJson(self.path)
+
+        with open(self.path) as fileHandle:
+            lines = fileHandle.read().splitlines()
+        self.assertEqual(len(lines), 1 + len(nodes) + 2 + 4)
+
+        loaded = mGraph.Graph.loadJson(self.path)
+        self.assertEqual([node.type for node in loaded.nodes], [node.type for node in graph.nodes])
+        self.assertEqual(loaded.nodes[6].getInputPort("value").value, 3)
+        self.assertEqual(loaded.nodes[6].getInputPort("value").defaultValue, 1)
+        self.assertEqual(loaded.nodes[8].getInputPort("value").value, ((1.0, 0.0), (0.0, 1.0)))
+        self.assertEqual(loaded.nodes[5].getInputPort("value").value, {"weights": [1, 2]})
+        self.assertEqual(loaded.nodes[11].getInputPort("value").defaultValue, 4.0)
+        self.assertEqual(len(loaded.nodes[11].getInputPort("value").internalEdges), 1)
+
+        self.assertEqual(list(mSerialize.iterJson(loaded)), lines)
+
+        loaded.evaluate()
+        self.assertEqual(loaded.nodes[1].getOutputPort("result").value, -2.5)
+        self.assertEqual(loaded.nodes[11].getOutputPort("result").value, -4.0)
+
+
+"""
+Test Memo
+- Checks nodes evaluated with inputs they have seen before restore there outputs from the cache
+- Checks the cache is bounded, and can be used for a single node
+"""
+class TestMemo(unittest.TestCase):
+    def createChain(self, graph):
+        sumNode = graph.createNode(mNode.SumNode)
+        mulNode = graph.createNode(mNode.MultiplyNode)
+        negNode = graph.createNode(mNode.NegateNode)
+        sumNode.getOutputPort("result").connect(mulNode.getInputPort("value1"))
+        mulNode.getOutputPort("result").connect(negNode.getInputPort("value"))
+        mulNode.getInputPort("value2").value = 2.0
+        return sumNode, negNode
+
+    def test_MemoizedEvaluation(self):
+        graph = mGraph.Graph()
+        memoCache = graph.memoize(size=16)
+        sumNode, negNode = self.createChain(graph)
+        results = []
+        for value in [1.0, 2.0, 1.0, 2.0, 1.0]:
+            sumNode.getInputPort("value1").value = value
+            graph.evaluate()
+            results.append(negNode.getOutputPort("result").value)
+        self.assertEqual(results, [-2.0, -4.0, -2.0, -4.0, -2.0])
+        self.assertFalse(negNode.dirty)
+        self.assertEqual(memoCache.getStats()["misses"], 6)
+        self.assertEqual(memoCache.getStats()["hits"], 9)
+
+        # a full cache drops the least recently used result
+        memoCache.size = 4
+        sumNode.getInputPort("value1").value = 3.0
+        graph.evaluate()
+        self.assertEqual(len(memoCache), 4)
+
+    def test_MemoizedNode(self):
+        graph = mGraph.Graph()
+        sumNode, negNode = self.createChain(graph)
+        memoCache = graph.memoize(size=2, node=negNode)
+        for value in [1.0, 1.0, 2.0]:
+            sumNode.getInputPort("value1").value = value
+            graph.evaluate()
+        self.assertEqual(negNode.getOutputPort("result").value, -4.0)
+        self.assertEqual(memoCache.getStats()["hits"], 1)
+        self.assertEqual(memoCache.getStats()["misses"], 2)
+        self.assertIsNone(graph.memoize(None, node=negNode))
+
+
+class CountingNegateNode(mNode.NegateNode):
+    """
+    Negate node counting how many times it computed its result
+    """
+    __slots__ = ()
+    evaluations = 0
+
+    def evaluate(self):
+        if self.dirty:
+            CountingNegateNode.evaluations += 1
+        super(CountingNegateNode, self).evaluate()
+
+
+"""
+Test Early Cutoff
+- Checks nodes reading from outputs that did not change are not evaluated
+- Checks outputs are compared with the comparator given
+- Checks nodes that were connected or rewired are evaluated
+"""
+class TestEarlyCutoff(unittest.TestCase):
+    def setUp(self):
+        CountingNegateNode.evaluations = 0
+
+    def createChain(self, graph):
+        sumNode = graph.createNode(mNode.SumNode)
+        mulNode = graph.createNode(mNode.MultiplyNode)
+        negNode_1 = graph.createNode(CountingNegateNode)
+        negNode_2 = graph.createNode(CountingNegateNode)
+        sumNode.getOutputPort("result").connect(mulNode.getInputPort("value1"))
+        mulNode.getOutputPort("result").connect(negNode_1.getInputPort("value"))
+        negNode_1.getOutputPort("result").connect(negNode_2.getInputPort("value"))
+        graph.evaluate()
+        return sumNode, mulNode, negNode_2
+
+    def test_EarlyCutoff(self):
+        graph = mGraph.Graph()
+        graph.setEarlyCutoff()
+        sumNode, mulNode, negNode = self.createChain(graph)
+        self.assertEqual(CountingNegateNode.evaluations, 2)
+
+        # multiplying by 0, the result does not change
+        sumNode.getInputPort("value1").value = 5.0
+        self.assertTrue(negNode.dirty)
+        graph.evaluate()
+        self.assertEqual(CountingNegateNode.evaluations, 2)
+        self.assertFalse(negNode.dirty)
+        self.assertFalse(graph._dirtyNodes)
+
+        mulNode.getInputPort("value2").value = 2.0
+        graph.evaluate()
+        self.assertEqual(CountingNegateNode.evaluations, 4)
+        self.assertEqual(negNode.getOutputPort("result").value, 10.0)
+
+        graph.setEarlyCutoff(False)
+        sumNode.getInputPort("value1").value = 5.0
+        graph.evaluate()
+        self.assertEqual(CountingNegateNode.evaluations, 6)
+        # rewiring is only tracked while early cutoff is enabled
+        sumNode.getOutputPort("result").disconnect()
+        self.assertFalse(graph._rewiredNodes)
+
+    def test_CutoffConnections(self):
+        """
+        |constNode_1| --> |negNode|    |constNode_2|
+        """
+        graph = mGraph.Graph()
+        graph.setEarlyCutoff()
+        constNode_1 = graph.createNode(mNode.ConstantNode)
+        constNode_1.getInputPort("value").value = 5.0
+        graph.evaluate()
+
+        # a new node connected to an output that did not change is still evaluated
+        negNode = graph.createNode(mNode.NegateNode)
+        constNode_1.getOutputPort("result").connect(negNode.getInputPort("value"))
+        graph.evaluate()
+        self.assertEqual(negNode.getOutputPort("result").value, -5.0)
+
+        # rewiring to an output holding a different value
+        constNode_2 = graph.createNode(mNode.ConstantNode)
+        constNode_2.getInputPort("value").value = 7.0
+        graph.evaluate()
+        negNode.getInputPort("value").disconnect()
+        constNode_2.getOutputPort("result").connect(negNode.getInputPort("value"))
+        graph.evaluate()
+        self.assertEqual(negNode.getOutputPort("result").value, -7.0)
+
+        constNode_2.getInputPort("value").value = 7.0
+        asyncio.run(graph.evaluateAsync())
+        negNode.getInputPort("value").disconnect()
+        constNode_1.getOutputPort("result").connect(negNode.getInputPort("value"))
+        asyncio.run(graph.evaluateAsync())
+        self.assertEqual(negNode.getOutputPort("result").value, -5.0)
+
+    def test_CloseComparator(self):
+        graph = mGraph.Graph()
+        graph.setEarlyCutoff(comparator=mGraph.getCloseComparator(absTolerance=1e-6))
+        sumNode, mulNode, negNode = self.createChain(graph)
+        mulNode.getInputPort("value2").value = 1.0
+        graph.evaluate()
+        self.assertEqual(CountingNegateNode.evaluations, 2)
+
+        sumNode.getInputPort("value2").value = 1e-9
+        graph.evaluate()
+        self.assertEqual(CountingNegateNode.evaluations, 2)
+        self.assertEqual(negNode.getOutputPort("result").value, 0.0)
+
+        self.assertTrue(mGraph.valuesEqual([1.0, 2.0], [1.0, 2.0]))
+        self.assertFalse(mGraph.valuesEqual(1, 1.0))
+
+
+"""
+Test Container Templates
+- Checks containers do not share there internal nodes
+- Checks instances of a template evaluate with there own values, and can be given there own internal nodes
+- Checks nested containers are inlined into the graph's evaluation
+- Checks instances of a template have to be materialized before they are compiled into an expression
+- Checks instances of templates with long chains of internal nodes can be materialized
+"""
+class TestContainerTemplates(unittest.TestCase):
+    def createSquareContainer(self):
+        contNode = mNode.ContainerNode()
+        contNode.addInputPort("value")
+        contNode.addOutputPort("result")
+        mulNode = contNode.createNode(mNode.MultiplyNode)
+        contNode.getInputPort("value").connect(mulNode.getInputPort("value1"))
+        contNode.getInputPort("value").connect(mulNode.getInputPort("value2"))
+        mulNode.getOutputPort("result").connect(contNode.getOutputPort("result"))
+        return contNode
+
+    def test_SeparateInternalNodes(self):
+        contNode_1 = self.createSquareContainer()
+        contNode_2 = mNode.ContainerNode()
+        self.assertEqual(len(contNode_1.internalNodes), 1)
+        self.assertEqual(contNode_2.internalNodes, [])
+
+    def test_TemplateInstances(self):
+        template = mNode.ContainerTemplate(self.createSquareContainer())
+        graph = mGraph.Graph()
+        sumNode = graph.createNode(mNode.SumNode)
+        instances = [graph.createNode(template) for i in range(100)]
+        for index, instance in enumerate(instances):
+            self.assertEqual(instance.internalNodes, [])
+            self.assertIs(instance._portLayout, instances[0]._portLayout)
+            instance.getInputPort("value").value = float(index)
+        sumNode.getOutputPort("result").connect(instances[0].getInputPort("value"))
+        sumNode.getInputPort("value1").value = 5.0
+        graph.evaluate()
+        self.assertEqual(instances[0].getOutputPort("result").value, 25.0)
+        self.assertEqual([instance.getOutputPort("result").value for instance in instances[1:]],
+                         [float(index * index) for index in range(1, 100)])
+
+        # the internal nodes of a materialized instance can be edited without changing the template
+        instance = instances[1]
+        instance.materialize()
+        mulNode = instance.internalNodes[0]
+        self.assertIsNot(mulNode, template.container.internalNodes[0])
+        self.assertIs(mulNode.getInputPort("value1").edges[0], instance.getInputPort("value"))
+        negNode = instance.createNode(mNode.NegateNode)
+        mulNode.getOutputPort("result").disconnect()
+        mulNode.getOutputPort("result").connect(negNode.getInputPort("value"))
+        negNode.getOutputPort("result").connect(instance.getOutputPort("result"))
+        instance.getInputPort("value").value = 3.0
+        instances[2].getInputPort("value").value = 3.0
+        graph.evaluate()
+        self.assertEqual(instance.getOutputPort("result").value, -9.0)
+        self.assertEqual(instances[2].getOutputPort("result").value, 9.0)
+
+    def test_MaterializeLongChain(self):
+        """
+        The internal nodes are copied without following there edges recursively
+        """
+        contNode = mNode.ContainerNode()
+        contNode.addInputPort("value")
+        contNode.addOutputPort("result")
+        port = contNode.getInputPort("value")
+        for i in range(1001):
+            negNode = contNode.createNode(mNode.NegateNode)
+            port.connect(negNode.getInputPort("value"))
+            port = negNode.getOutputPort("result")
+        port.connect(contNode.getOutputPort("result"))
+        template = mNode.ContainerTemplate(contNode)
+
+        graph = mGraph.Graph()
+        instance = graph.createNode(template)
+        instance.getInputPort("value").value = 2.0
+        instance.materialize()
+        self.assertEqual(len(instance.internalNodes), 1001)
+        self.assertIsNot(instance.internalNodes[0], contNode.internalNodes[0])
+        self.assertIs(instance.getInputPort("value").internalEdges[0], instance.internalNodes[0].getInputPort("value"))
+        graph.evaluate()
+        self.assertEqual(instance.getOutputPort("result").value, -2.0)
+
+    def test_CompileTemplateInstance(self):
+        template = mNode.ContainerTemplate(self.createSquareContainer())
+        graph = mGraph.Graph()
+        instance = graph.createNode(template)
+        outputs = [instance.getOutputPort("result")]
+        inputs = [instance.getInputPort("value")]
+        with self.assertRaises(ValueError):
+            graph.compileExpression(outputs, inputs)
+
+        instance.materialize()
+        function = graph.compileExpression(outputs, inputs)
+        self.assertEqual(function(3.0), (9.0,))
+
+    def test_NestedContainers(self):
+        """
+        |sumNode| --> |outerNode: value --> |innerNode: x*x| --> |negNode| --> result|
+        """
+        graph = mGraph.Graph()
+        sumNode = graph.createNode(mNode.SumNode)
+        outerNode = graph.createNode(mNode.ContainerNode)
+        outerNode.addInputPort("value")
+        outerNode.addOutputPort("result")
+        innerNode = self.createSquareContainer()
+        outerNode.addNode(innerNode)
+        negNode = outerNode.createNode(mNode.NegateNode)
+        outerNode.getInputPort("value").connect(innerNode.getInputPort("value"))
+        innerNode.getOutputPort("result").connect(negNode.getInputPort("value"))
+        negNode.getOutputPort("result").connect(outerNode.getOutputPort("result"))
+        sumNode.getOutputPort("result").connect(outerNode.getInputPort("value"))
+
+        sumNode.getInputPort("value1").value = 4.0
+        graph.evaluate()
+        self.assertEqual(outerNode.getOutputPort("result").value, -16.0)
+        self.assertEqual(graph._containerPlans[outerNode], [innerNode, negNode])
+        self.assertIn(innerNode, graph._containerPlans)
+
+        function = graph.compileExpression([outerNode.getOutputPort("result")], [sumNode.getInputPort("value1")])
+        self.assertEqual(function(3.0), (-9.0,))
+
+
+class FailingNode(mNode.NegateNode):
+    """
+    Negate node that raises when it is evaluated
+    """
+    __slots__ = ()
+
+    def evaluate(self):
+        raise ZeroDivisionError("failed")
+
+
+"""
+Test Profile
+- Checks the evaluation of each node is recorded while the graph is profiled
+- Checks the stats can be exported as a table and Chrome trace events
+- Checks errors raised by nodes are not hidden by the profiler
+"""
+class TestProfile(unittest.TestCase):
+    def test_ProfiledEvaluation(self):
+        graph = mGraph.Graph()
+        sumNode = graph.createNode(mNode.SumNode)
+        contNode = graph.createNode(mNode.ContainerNode)
+        contNode.addInputPort("value")
+        contNode.addOutputPort("result")
+        negNode = contNode.createNode(mNode.NegateNode)
+        contNode.getInputPort("value").connect(negNode.getInputPort("value"))
+        negNode.getOutputPort("result").connect(contNode.getOutputPort("result"))
+        sumNode.getOutputPort("result").connect(contNode.getInputPort("value"))
+        graph.memoize()
+
+        with graph.profile() as profiler:
+            for value in [1.0, 2.0, 1.0]:
+                sumNode.getInputPort("value1").value = value
+                graph.evaluate()
+        self.assertIsNone(graph.profiler)
+
+        self.assertEqual(profiler.getEvaluationOrder(), [sumNode, contNode, negNode] * 3)
+        stats = profiler.stats[contNode]
+        self.assertEqual(stats.calls, 3)
+        self.assertLess(stats.selfTime, stats.totalTime)
+        self.assertEqual(profiler.stats[negNode].cacheHits, 1)
+        self.assertEqual(profiler.stats[sumNode].cacheHits, 1)
+
+        table = profiler.getTable().splitlines()
+        self.assertEqual(len(table), 4)
+        self.assertTrue(table[0].startswith("Node"))
+        events = profiler.getChromeTrace()["traceEvents"]
+        self.assertEqual(len(events), 12)
+        self.assertEqual(len([event for event in events if event["name"] == "Graph.evaluate"]), 3)
+        self.assertTrue(all(event["ph"] == "X" for event in events))
+
+    def test_ProfiledSkips(self):
+        graph = mGraph.Graph()
+        graph.setEarlyCutoff()
+        sumNode = graph.createNode(mNode.SumNode)
+        mulNode = graph.createNode(mNode.MultiplyNode)
+        negNode = graph.createNode(mNode.NegateNode)
+        sumNode.getOutputPort("result").connect(mulNode.getInputPort("value1"))
+        mulNode.getOutputPort("result").connect(negNode.getInputPort("value"))
+        graph.evaluate()
+
+        profiler = mProfile.Profiler(trace=False)
+        graph.profiler = profiler
+        sumNode.getInputPort("value1").value = 1.0
+        graph.evaluate()
+        graph.evaluate(island=graph.getIsland(negNode))
+        self.assertEqual(profiler.stats[negNode].cutoffSkips, 1)
+        self.assertEqual(profiler.stats[negNode].cleanSkips, 1)
+        self.assertEqual(profiler.stats[mulNode].calls, 1)
+        self.assertEqual(profiler.events, [])
+
+    def test_ProfiledError(self):
+        graph = mGraph.Graph()
+        sumNode = graph.createNode(mNode.SumNode)
+        failNode = graph.createNode(FailingNode)
+        sumNode.getOutputPort("result").connect(failNode.getInputPort("value"))
+
+        with graph.profile() as profiler:
+            self.assertRaises(ZeroDivisionError, graph.evaluate)
+        stats = profiler.stats[failNode]
+        self.assertEqual((stats.calls, stats.cacheHits), (1, 0))
+        self.assertEqual(profiler.getEvaluationOrder(), [sumNode, failNode])
+
+
+class FetchNode(mNode.NegateNode):
+    """
+    Negate node that waits on asyncio, as a node fetching its data would, counting how many are waiting at once
+    """
+    __slots__ = ()
+    waiting = 0
+    maxWaiting = 0
+
+    async def evaluate(self):
+        if self.dirty:
+            self.evaluateConnection()
+            FetchNode.waiting += 1
+            FetchNode.maxWaiting = max(FetchNode.maxWaiting, FetchNode.waiting)
+            await asyncio.sleep(0.01)
+            FetchNode.waiting -= 1
+            self.portsOut[0].value = -self.portsIn[0].value
+            self.dirty = False
+
+
+"""
+Test Async
+- Checks async nodes are awaited, and independent upstream nodes wait at the same time
+- Checks synchronous nodes are evaluated with them as normal
+- Checks async nodes raise an error when the graph is evaluated synchronously
+"""
+class TestAsync(unittest.TestCase):
+    def setUp(self):
+        FetchNode.waiting = 0
+        FetchNode.maxWaiting = 0
+
+    def test_EvaluateAsync(self):
+        """
+        |fetchNode_1| --> |sumNode| --> |negNode|
+        |fetchNode_2| -->
+        """
+        graph = mGraph.Graph()
+        fetchNode_1 = graph.createNode(FetchNode)
+        fetchNode_2 = graph.createNode(FetchNode)
+        sumNode = graph.createNode(mNode.SumNode)
+        negNode = graph.createNode(mNode.NegateNode)
+        fetchNode_1.getOutputPort("result").connect(sumNode.getInputPort("value1"))
+        fetchNode_2.getOutputPort("result").connect(sumNode.getInputPort("value2"))
+        sumNode.getOutputPort("result").connect(negNode.getInputPort("value"))
+        fetchNode_1.getInputPort("value").value = 2.0
+        fetchNode_2.getInputPort("value").value = 3.0
+
+        asyncio.run(graph.evaluateAsync())
+        self.assertEqual(negNode.getOutputPort("result").value, 5.0)
+        self.assertEqual(FetchNode.maxWaiting, 2)
+        self.assertFalse(any(node.dirty for node in graph.nodes))
+
+        # only the changed network is evaluated again
+        FetchNode.maxWaiting = 0
+        fetchNode_2.getInputPort("value").value = 1.0
+        asyncio.run(graph.evaluateAsync())
+        self.assertEqual(negNode.getOutputPort("result").value, 3.0)
+        self.assertEqual(FetchNode.maxWaiting, 1)
+
+    def test_EvaluateAsyncSynchronous(self):
+        graph = mGraph.Graph()
+        sumNode = graph.createNode(mNode.SumNode)
+        negNode = graph.createNode(mNode.NegateNode)
+        sumNode.getOutputPort("result").connect(negNode.getInputPort("value"))
+        sumNode.getInputPort("value1").value = 4.0
+
+        with graph.profile() as profiler:
+            asyncio.run(graph.evaluateAsync())
+        self.assertEqual(negNode.getOutputPort("result").value, -4.0)
+        self.assertEqual(profiler.getEvaluationOrder(), [sumNode, negNode])
+
+    def test_EvaluateAsyncNodeSynchronously(self):
+        """
+        The synchronous evaluations would drop the coroutine, leaving the async node dirty
+        """
+        graph = mGraph.Graph()
+        fetchNode = graph.createNode(FetchNode)
+        fetchNode.getInputPort("value").value = 2.0
+
+        self.assertRaises(TypeError, graph.evaluate)
+        with concurrent.futures.ThreadPoolExecutor(2) as executor:
+            self.assertRaises(TypeError, graph.evaluateLevels, executor)
+        with concurrent.futures.ProcessPoolExecutor(1) as executor:
+            self.assertRaises(TypeError, graph.evaluateIslands, executor)
+        self.assertTrue(fetchNode.dirty)
+
+        asyncio.run(graph.evaluateAsync())
+        self.assertEqual(fetchNode.getOutputPort("result").value, -2.0)
+
+
+"""
+Test Contexts
+- Checks contexts evaluate there own values, without changing the graph
+- Checks many contexts can be evaluated at the same time on a thread pool
+"""
+class TestContexts(unittest.TestCase):
+    def createGraph(self):
+        """
+        |sumNode| --> |contNode: negNode| --> |mulNode|
+        """
+        graph = mGraph.Graph()
+        sumNode = graph.createNode(mNode.SumNode)
+        contNode = graph.createNode(mNode.ContainerNode)
+        contNode.addInputPort("value")
+        contNode.addOutputPort("result")
+        negNode = contNode.createNode(mNode.NegateNode)
+        contNode.getInputPort("value").connect(negNode.getInputPort("value"))
+        negNode.getOutputPort("result").connect(contNode.getOutputPort("result"))
+        mulNode = graph.createNode(mNode.MultiplyNode)
+        sumNode.getOutputPort("result").connect(contNode.getInputPort("value"))
+        contNode.getOutputPort("result").connect(mulNode.getInputPort("value1"))
+        sumNode.getInputPort("value1").value = 1.0
+        mulNode.getInputPort("value2").value = 2.0
+        return graph, sumNode, mulNode
+
+    def test_Context(self):
+        graph, sumNode, mulNode = self.createGraph()
+        valuePort = sumNode.getInputPort("value1")
+        resultPort = mulNode.getOutputPort("result")
+
+        context = graph.createContext({valuePort: 3.0})
+        self.assertEqual(resultPort.value, -2.0)
+        self.assertEqual(context.getValue(valuePort), 3.0)
+        self.assertIn(mulNode, context.dirtyNodes)
+        self.assertFalse(mulNode.dirty)
+
+        context.evaluate()
+        self.assertEqual(context.getValue(resultPort), -6.0)
+        self.assertEqual(context.dirtyNodes, set())
+        # the graph keeps its own values
+        self.assertEqual(resultPort.value, -2.0)
+        self.assertEqual(valuePort.value, 1.0)
+        self.assertEqual(graph._dirtyNodes, set())
+
+        # ports set while the context is active go to the context
+        with context.activate():
+            mulNode.getInputPort("value2").value = 10.0
+            self.assertTrue(mulNode.dirty)
+            self.assertFalse(sumNode.dirty)
+        context.evaluate()
+        self.assertEqual(context.getValue(resultPort), -30.0)
+        self.assertEqual(mulNode.getInputPort("value2").value, 2.0)
+
+        context.reset()
+        self.assertEqual(context.getValue(resultPort), -2.0)
+
+    def test_EvaluateContexts(self):
+        graph, sumNode, mulNode = self.createGraph()
+        valuePort = sumNode.getInputPort("value1")
+        contexts = [graph.createContext({valuePort: float(i)}) for i in range(50)]
+
+        with concurrent.futures.ThreadPoolExecutor(4) as executor:
+            graph.evaluateContexts(contexts, executor)
+        for i, context in enumerate(contexts):
+            self.assertEqual(context.getValue(mulNode.getOutputPort("result")), -2.0 * i)
+        self.assertEqual(mulNode.getOutputPort("result").value, -2.0)
+
+        with concurrent.futures.ProcessPoolExecutor(1) as executor:
+            self.assertRaises(TypeError, graph.evaluateContexts, contexts, executor)
+
+
+"""
+Test Batch
+- Checks the graph is evaluated for each row on the worker processes, without changing the graph
+"""
+class TestBatch(unittest.TestCase):
+    def test_Map(self):
+        """
+        |sumNode| --> |negNode|
+        """
+        graph = mGraph.Graph()
+        sumNode = graph.createNode(mNode.SumNode)
+        negNode = graph.createNode(mNode.NegateNode)
+        sumNode.getOutputPort("result").connect(negNode.getInputPort("value"))
+        inputs = [sumNode.getInputPort("value1"), sumNode.getInputPort("value2")]
+        outputs = [negNode.getOutputPort("result"), sumNode.getOutputPort("result")]
+
+        with mBatch.BatchRunner(graph, inputs, outputs, processes=2) as runner:
+            rows = runner.map([(float(i), 1.0) for i in range(100)])
+            self.assertEqual(rows, [(-i - 1.0, i + 1.0) for i in range(100)])
+            self.assertEqual(runner.map([]), [])
+            self.assertRaises(ValueError, runner.map, [(1.0,)])
+
+            if numpy is not None:
+                rows = runner.map(numpy.ones((10, 2)))
+                self.assertEqual(rows.shape, (10, 2))
+                self.assertTrue((rows == [-2.0, 2.0]).all())
+
+        self.assertEqual(inputs[0].value, 0.0)
+        self.assertRaises(ValueError, mBatch.BatchRunner, graph, [mNode.SumNode().getInputPort("value1")], outputs)
+
+
+"""
+Test Pull
+- Checks pulling a port only evaluates the dirty nodes upstream of it
+- Checks reading an output port of a lazy graph pulls it
+- Checks streaming inputs through the graph only evaluates what changed
+"""
+class TestPull(unittest.TestCase):
+    def createGraph(self):
+        """
+        |sumNode| --> |negNode_1|
+                  --> |negNode_2|
+        |mulNode|
+        """
+        graph = mGraph.Graph()
+        sumNode = graph.createNode(mNode.SumNode)
+        negNode_1 = graph.createNode(mNode.NegateNode)
+        negNode_2 = graph.createNode(mNode.NegateNode)
+        mulNode = graph.createNode(mNode.MultiplyNode)
+        sumNode.getOutputPort("result").connect(negNode_1.getInputPort("value"))
+        sumNode.getOutputPort("result").connect(negNode_2.getInputPort("value"))
+        sumNode.getInputPort("value1").value = 2.0
+        return graph, sumNode, negNode_1, negNode_2, mulNode
+
+    def test_Pull(self):
+        graph, sumNode, negNode_1, negNode_2, mulNode = self.createGraph()
+
+        with graph.profile() as profiler:
+            self.assertEqual(graph.pull(negNode_1.getOutputPort("result")), -2.0)
+        self.assertEqual(profiler.getEvaluationOrder(), [sumNode, negNode_1])
+        self.assertTrue(negNode_2.dirty)
+        self.assertTrue(mulNode.dirty)
+        self.assertEqual(graph._dirtyNodes, set([negNode_2, mulNode]))
+
+        # a clean port is not evaluated again, and an input port pulls the port connected to it
+        with graph.profile() as profiler:
+            self.assertEqual(graph.pull(negNode_1.getOutputPort("result")), -2.0)
+            self.assertEqual(graph.pull(negNode_2.getInputPort("value")), 2.0)
+        self.assertEqual(profiler.getEvaluationOrder(), [])
+
+        graph.evaluate()
+        self.assertEqual(negNode_2.getOutputPort("result").value, -2.0)
+        self.assertRaises(ValueError, graph.pull, mNode.SumNode().getOutputPort("result"))
+
+        # an input connected to a node outside of the graph
+        sumNode = mNode.SumNode()
+        sumNode.getOutputPort("result").connect(mulNode.getInputPort("value1"))
+        sumNode.getInputPort("value1").value = 3.0
+        self.assertEqual(graph.pull(mulNode.getInputPort("value1")), 3.0)
+        self.assertFalse(sumNode.dirty)
+        self.assertTrue(mulNode.dirty)
+
+    def test_Stream(self):
+        graph, sumNode, negNode_1, negNode_2, mulNode = self.createGraph()
+        valuePort = sumNode.getInputPort("value1")
+        resultPort = negNode_1.getOutputPort("result")
+
+        frames = iter([1.0, 2.0, 2.0, 3.0])
+        results = graph.stream(({valuePort: frame} for frame in frames), [resultPort])
+        with graph.profile() as profiler:
+            self.assertEqual(next(results), {resultPort: -1.0})
+            self.assertEqual(next(results), {resultPort: -2.0})
+            self.assertEqual(len(profiler.getEvaluationOrder()), 4)
+            # the same value does not dirty the graph
+            self.assertEqual(next(results), {resultPort: -2.0})
+            self.assertEqual(len(profiler.getEvaluationOrder()), 4)
+        self.assertEqual(list(results), [{resultPort: -3.0}])
+        self.assertTrue(negNode_2.dirty)
+
+    def test_Lazy(self):
+        graph, sumNode, negNode_1, negNode_2, mulNode = self.createGraph()
+        graph.setLazy()
+        try:
+            self.assertEqual(negNode_2.getOutputPort("result").value, -2.0)
+            self.assertFalse(sumNode.dirty)
+            self.assertTrue(negNode_1.dirty)
+
+            sumNode.getInputPort("value2").value = 3.0
+            self.assertEqual(negNode_1.getOutputPort("result").value, -5.0)
+            self.assertTrue(negNode_2.dirty)
+        finally:
+            graph.setLazy(False)
+        self.assertEqual(negNode_2.getOutputPort("result").value, -2.0)
+
+
+"""
+Test Benchmarks
+- Checks each of the benchmark shapes builds and evaluates, so the benchmarks keep working as the graph changes
+"""
+class TestBenchmarks(unittest.TestCase):
+    def test_Shapes(self):
+        for shape in mBenchmark.SHAPES:
+            result = mBenchmark.benchmarkShape(shape, 30)
+            self.assertEqual(result["shape"], shape)
+            self.assertTrue(25 <= result["nodes"] <= 30, shape)
+            self.assertIn("bytesPerNode", result)
+
+        result = mBenchmark.benchmarkShape("chain", 30, memory=False)
+        self.assertEqual(result["output"], 1.0)
+        self.assertNotIn("bytesPerNode", result)
+
 
 if __name__ == "__main__":
     unittest.main()
\ No newline at end of file